@@ -1,8 +1,9 @@
 from __future__ import annotations
+import multiprocessing
 import os
-import re
-import socket
+import queue
 import threading
+import time
 from dataclasses import dataclass
 from datetime import date, datetime
 from typing import Dict, List, Optional, Tuple
@@ -11,13 +12,45 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
 import pandas as pd
-from dotenv import load_dotenv
-import mysql.connector
 
-from pathlib import Path
-import sys
-
-LAST_ENV_PATH = None  # para debug
+import encerramento_core
+from encerramento_core import (
+    CACHE_PLANILHAS,
+    COMPANY_PRESETS,
+    ErroConexao,
+    FilaImportacao,
+    LeitorEmBlocos,
+    MOTORES_INSERCAO,
+    OperacaoCancelada,
+    POLITICAS_COMMIT,
+    POOL_CONEXOES,
+    POLITICAS_DUPLICADOS,
+    POLITICAS_DUPLICADOS_STREAMING,
+    PoliticaCommit,
+    RelatorioRejeicoes,
+    TarefaImportacao,
+    abrir_diario,
+    colunas_disponiveis,
+    conectar_ao_mysql,
+    constantes_de,
+    definir_notificador_erro,
+    exportar_lote,
+    exportar_lotes,
+    formas_cnjs,
+    formatos_exportacao_disponiveis,
+    inserir_em_lotes,
+    inserir_em_streaming,
+    listar_abas,
+    listar_colunas_exportaveis,
+    listar_lotes_por_periodo,
+    montar_registros,
+    motor_insercao_padrao,
+    obter_config_banco,
+    politica_duplicados,
+    preparar_planilha,
+    registros_em_blocos,
+    validar_colunas_para_insercao,
+)
 
 # =========================
 # Paleta e Temas (TTK)
@@ -118,694 +151,204 @@ def apply_style(root: tk.Tk, theme: str):
     return pal
 
 # =========================
-# Config & Banco
+# UI Tkinter
 # =========================
-def carregar_variaveis_ambiente():
-    global LAST_ENV_PATH
-    load_dotenv(override=False)
-
-    paths: List[Path] = []
-    try:
-        if getattr(sys, 'frozen', False):
-            base_dir = Path(sys.executable).parent
-            meipass = Path(getattr(sys, '_MEIPASS', base_dir))
-            paths += [base_dir / '.env', meipass / '.env']
+class CanalProgresso:
+    """Canal de progresso entre uma thread de trabalho e a janela Tk.
+
+    O worker chama `publicar()` quantas vezes quiser; só o valor mais recente fica guardado.
+    A thread do Tk lê esse valor via `after()` no máximo `max_por_segundo` vezes por segundo,
+    calcula linhas/s e ETA e chama `ao_atualizar(feito, total, taxa, eta, detalhe)`.
+    `finalizar(fn)` agenda `fn` na thread do Tk depois da última atualização.
+    """
+
+    def __init__(self, widget: tk.Misc, ao_atualizar, max_por_segundo: int = 8):
+        self._widget = widget
+        self._ao_atualizar = ao_atualizar
+        self._intervalo_ms = max(1, int(1000 / max(1, max_por_segundo)))
+        self._lock = threading.Lock()
+        self._ultimo: Optional[Tuple[int, int, str]] = None
+        self._final = None
+        self._inicio = time.monotonic()
+        self._amostra: Optional[Tuple[float, int]] = None
+        self._taxa = 0.0
+
+    # ---- lado do worker ----
+    def publicar(self, feito: int, total: int, detalhe: str = ''):
+        with self._lock:
+            self._ultimo = (feito, total, detalhe)
+
+    def finalizar(self, fn):
+        with self._lock:
+            self._final = fn
+
+    # ---- lado do Tk ----
+    def iniciar(self):
+        self._inicio = time.monotonic()
+        self._widget.after(self._intervalo_ms, self._bombear)
+
+    def _bombear(self):
+        with self._lock:
+            ultimo, self._ultimo = self._ultimo, None
+            final = self._final
+        if ultimo is not None:
+            self._entregar(*ultimo)
+        if final is not None:
+            final()
+            return
+        self._widget.after(self._intervalo_ms, self._bombear)
+
+    def _entregar(self, feito: int, total: int, detalhe: str):
+        agora = time.monotonic()
+        if self._amostra is None:
+            decorrido = agora - self._inicio
+            instantanea = feito / decorrido if decorrido > 0 else 0.0
+            self._taxa = instantanea
         else:
-            base_dir = Path(__file__).parent
-            paths += [base_dir / '.env']
-    except Exception:
-        pass
-
-    paths.append(Path.cwd() / '.env')
-
-    for p in paths:
-        if p.exists():
-            load_dotenv(dotenv_path=p, override=True)
-            LAST_ENV_PATH = str(p)
-            break
-
-def obter_config_banco() -> dict:
-    carregar_variaveis_ambiente()
-    cfg = {
-        'host': os.getenv('DB_HOST', ''),
-        'user': os.getenv('DB_USER', ''),
-        'password': os.getenv('DB_PASSWORD', ''),
-        'database': os.getenv('DB_DATABASE', ''),
-        'port': int(os.getenv('DB_PORT', '3306')),
-        'timeout': int(os.getenv('DB_TIMEOUT', '15')),
-    }
-
-    auth_plugin = os.getenv('DB_AUTH_PLUGIN', '').strip()
-    if auth_plugin:
-        cfg['auth_plugin'] = auth_plugin
-    ssl_ca = os.getenv('DB_SSL_CA', '').strip()
-    ssl_cert = os.getenv('DB_SSL_CERT', '').strip()
-    ssl_key = os.getenv('DB_SSL_KEY', '').strip()
-    if ssl_ca:
-        cfg['ssl_ca'] = ssl_ca
-    if ssl_cert:
-        cfg['ssl_cert'] = ssl_cert
-    if ssl_key:
-        cfg['ssl_key'] = ssl_key
-    return cfg
-
-colunas_encerramento = [
-    'cnj',
-    'valor_causa', 'valor_final_causa',
-    'data_fase', 'fase',
-    'data_status', 'status',
-    'data_resultado', 'tipo_resultado',
-    'parecer_processo',
-    'verificado_encerramento',
-    'encerramento_exportado',
-    'cod_lote', 'cod_usuario_exportador',
-    'carteira', 'cliente',
-    'cod_status', 'cod_fase',
-    'justificativa',
-    'cod_usuario_encerrador',
-    'cod_usuario_envio',
-    'data_exportacao',
-    'dataEnvio',
-    'data_submit',
-    'dataAtualizacao', 'codUsuarioAtualizacao',
-    'codMotivo', 'motivo',
-    'encerrado', 'exportado',
-]
-
-RENAME_MAP = {
-    'Nº do Processo CNJ': 'cnj',
-    'Cliente': 'cliente',
-    'Valor da Causa': 'valor_causa',
-    'Valor Final da Causa': 'valor_final_causa',
-    'Data da Fase': 'data_fase',
-    'Fase': 'fase',
-    'Data do Status': 'data_status',
-    'Status': 'status',
-    'Data do Resultado': 'data_resultado',
-    'Tipo de Resultado': 'tipo_resultado',
-    'Parecer do Processo': 'parecer_processo',
-}
-
-TODAY_STR = datetime.now().strftime('%d/%m/%Y')
-COMPANY_PRESETS: Dict[str, Dict[str, object]] = {
-    'STONE MIDDLE': {
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'STONE MIDDLE {TODAY_STR}',
-        'carteira': '58',
-    },
-    'STONE PASSIVO': {
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'STONE PASSIVO {TODAY_STR}',
-        'carteira': '49',
-    },
-    'AMBEV CIVEL':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'AMBEV CIVEL {TODAY_STR}',
-        'carteira': '1',
-    },
-    'AMBEV TRABALHISTA':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'AMBEV TRABALHISTA {TODAY_STR}',
-        'carteira': '36',
-    },
-    'ANCAR':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'ANCAR {TODAY_STR}',
-        'carteira': '3',
-    },
-    'ATIVOS':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'ATIVOS {TODAY_STR}',
-        'carteira': '44',
-    },
-    'BRE - TRAB GERAL':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'BRE - TRAB GERAL {TODAY_STR}',
-        'carteira': '33',
-    },
-    'BRE - CIVEL GERAL':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'BRE - CIVEL GERAL {TODAY_STR}',
-        'carteira': '33',
-    },
-
-    'CB - TRAB':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'CB - TRAB {TODAY_STR}',
-        'carteira': '33',
-    },
-
-    'CB - CIVEL':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'CB - CIVEL {TODAY_STR}',
-        'carteira': '33',
-    },
-
-    'IMC - TRAB':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'IMC - TRAB {TODAY_STR}',
-        'carteira': '33',
-    },
-
-    'IMC - CIVEL':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'IMC - CIVEL {TODAY_STR}',
-        'carteira': '33',
-    },
-
-    'CAGECE':{
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'CAGECE {TODAY_STR}',
-        'carteira': '6',
-    },
-
-
-    'CIVEL':{
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'CIVEL {TODAY_STR}',
-            'carteira': '42',
-    },
-
-    'CIVEL -  CACAU SHOW':{
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'CIVEL -  CACAU SHOW {TODAY_STR}',
-            'carteira': '42',
-    },
-
-    'COBRANÇA JUDICIAL': {
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'COBRANÇA JUDICIAL {TODAY_STR}',
-        'carteira': '41',
-    },
-
-    'CONTRATOS': {
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'CONTRATOS  {TODAY_STR}',
-        'carteira': '51',
-    },
-
-    'DIREITO MUNICIPAL': {
-        'dataEnvio': TODAY_STR,
-        'cod_usuario_envio': '222',
-        'cod_lote': f'DIREITO MUNICIPAL  {TODAY_STR}',
-        'carteira': '54',
-    },
-
-    'DIREITO PENAL': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'DIREITO PENAL  {TODAY_STR}',
-            'carteira': '56',
-        },
-
-    'DIREITO TRIBUTARIO': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'DIREITO TRIBUTARIO  {TODAY_STR}',
-            'carteira': '46',
-    },
-
-    'EDUCACIONAL - CIVEL': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'EDUCACIONAL - CIVEL  {TODAY_STR}',
-            'carteira': '39',
-    },
-
-    'EDUCACIONAL - TRAB': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'EDUCACIONAL - TRAB  {TODAY_STR}',
-            'carteira': '39',
-    },
-
-   'EGP': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'EGP  {TODAY_STR}',
-            'carteira': '108',
-    },
-
-    'ENEL RJ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'ENEL RJ  {TODAY_STR}',
-            'carteira': '101',
-    },
-
-    'ESTRATEGICOS': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'ESTRATEGICOS  {TODAY_STR}',
-            'carteira': '45',
-    },
-
-    'IMOBILIARIO - CONTENCIOSO ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'IMOBILIARIO CONTENCIOSO {TODAY_STR}',
-            'carteira': '43',
-    },
-
-    'TLSA - IMOBILIARIO': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'TLSA - IMOBILIARIO{TODAY_STR}',
-            'carteira': '112',
-    },
-
-
-'ISGH - CIVEL': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'ISGH -CIVEL{TODAY_STR}',
-            'carteira': '38',
-    },
-
-'ISGH - TRABALHISTA': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'ISGH - TRABALHISTA {TODAY_STR}',
-            'carteira': '47',
-    },
-
-'LICITAÇÕES': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'LICITAÇÕES {TODAY_STR}',
-            'carteira': '53',
-    },
-
-'MOVIDA PASSIVO': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'MOVIDA PASSIVO {TODAY_STR}',
-            'carteira': '62',
-    },
-
-'NOTREDAME - CIVEL': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'NOTREDAME CIVEL {TODAY_STR}',
-            'carteira': '21',
-    },
-'NOTREDAME - ESTRATEGICO': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'NOTREDAME ESTRATEGICO{TODAY_STR}',
-            'carteira': '52',
-    },
-'NOTREDAME - TRABALHISTA ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'NOTREDAME TRABALHISTA{TODAY_STR}',
-            'carteira': '48',
-    },
-'DEXCO':{
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'DEXCO {TODAY_STR}',
-            'carteira': '48',
-},
-
-'ORIGINAL ATIVO':{
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'ORIGINAL ATIVO {TODAY_STR}',
-            'carteira': '61',
-},
-
-'ORIGINAL PASSIVO ':{
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'ORIGINAL PASSIVO {TODAY_STR}',
-            'carteira': '60',
-},
-
-'PAGUE MENOS - CIVEL ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'PAGUE MENOS CIVEL{TODAY_STR}',
-            'carteira': '29',
-    },
-
-'PAGUE MENOS - TRABALHISTA ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'PAGUE MENOS - TRABALHISTA{TODAY_STR}',
-            'carteira': '35',
-    },
-
-'PICPAY PASSIVO  ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'PICPAY PASSIVO{TODAY_STR}',
-            'carteira': '63',
-    },
-
-'PICPAY ATIVO  ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'PICPAY ATIVO{TODAY_STR}',
-            'carteira': '66',
-    },
-
-'PORTO SEGURO ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'PORTO SEGURO{TODAY_STR}',
-            'carteira': '27',
-    },
-
-'PUBLICO ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'PUBLICO{TODAY_STR}',
-            'carteira': '55',
-    },
-
-'RD ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'RD{TODAY_STR}',
-            'carteira': '59',
-    },
-
-'SERVIÇOS ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'SERVIÇOS{TODAY_STR}',
-            'carteira': '32',
-    },
-
-'SOLAR BR - CIVEL': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'SOLAR BR - CIVEL{TODAY_STR}',
-            'carteira': '31',
-    },
-
-'SOLAR BR - TRABALHISTA ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'SOLAR BR - TRABALHISTA {TODAY_STR}',
-            'carteira': '37',
-    },
-
-'TLSA - CIVEL ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'TLSA - CIVEL {TODAY_STR}',
-            'carteira': '28',
-    },
-
-'TLSA - TRAB ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'TLSA - TRAB {TODAY_STR}',
-            'carteira': '34',
-    },
-
-'TRABALHISTA - GERAL': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'TRABALHISTA - GERAL {TODAY_STR}',
-            'carteira': '40',
-    },
-
-
-'VALE CIVEL': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'VALE CIVEL {TODAY_STR}',
-            'carteira': '30',
-    },
-
-'VERZANI': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'VERZANI {TODAY_STR}',
-            'carteira': '57',
-    },
-
-'RJ E FALENCIA ': {
-            'dataEnvio': TODAY_STR,
-            'cod_usuario_envio': '222',
-            'cod_lote': f'RJ E FALENCIA  {TODAY_STR}',
-            'carteira': '64',
-    },
-
-}
-COMMON_DEFAULTS = {
-    'verificado_encerramento': 0,
-    'encerramento_exportado': 0,
-    'encerrado': None,
-    'exportado': 0,
-}
-
-
-def aplicar_presets(df: pd.DataFrame, empresa: str) -> pd.DataFrame:
-    df = df.copy()
-    preset = COMPANY_PRESETS.get(empresa, {})
-    for k_def, v_def in COMMON_DEFAULTS.items():
-        if k_def not in df.columns:
-            df[k_def] = v_def
-
-    for col in ['cod_lote', 'cod_usuario_envio', 'carteira']:
-        val = preset.get(col)
-        if val is not None:
-            df[col] = val
-
-    data_envio = preset.get('dataEnvio')
-    if data_envio:
-        try:
-            dt = pd.to_datetime(data_envio, dayfirst=True, errors='coerce')
-            df['data_exportacao'] = dt.dt.date if isinstance(dt, pd.Series) else dt.date()
-        except Exception:
-            df['data_exportacao'] = date.today()
-    else:
-        if 'data_exportacao' not in df.columns:
-            df['data_exportacao'] = None
-    return df
-
-def teste_tcp(host: str, port: int, timeout: float = 3.0) -> Tuple[bool, str]:
-    try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return True, ""
-    except Exception as e:
-        return False, str(e)
-
-def conectar_ao_mysql() -> Tuple[Optional[object], Optional[object]]:
-    cfg = obter_config_banco()
-    ok, err = teste_tcp(cfg['host'], cfg['port'], timeout=min(cfg.get('timeout', 15), 5))
-    if not ok:
-        messagebox.showerror(
-            'Rede/Porta fechada',
-            f"Não foi possível abrir TCP para {cfg['host']}:{cfg['port']}\n"
-            f"Motivo: {err}\n\nVerifique firewall/NAT/segurança do servidor e se o MySQL está escutando."
-        )
-        return None, None
-
-    def base_kwargs_connector():
-        kw = dict(
-            host=cfg['host'],
-            user=cfg['user'],
-            password=cfg['password'],
-            database=cfg['database'],
-            port=cfg['port'],
-            connection_timeout=cfg.get('timeout', 15),
-            use_pure=True,
-        )
-        for k in ('ssl_ca', 'ssl_cert', 'ssl_key'):
-            if k in cfg:
-                kw[k] = cfg[k]
-        return kw
-
-    try:
-        conn = mysql.connector.connect(**base_kwargs_connector())
-        return conn, conn.cursor()
-    except mysql.connector.Error as err1:
-        msg1 = str(err1).lower()
-        if 'authentication plugin' in msg1 and 'mysql_native_password' in msg1 and 'not supported' in msg1:
-            try:
-                import pymysql
-            except ImportError:
-                messagebox.showerror(
-                    'Dependência ausente',
-                    'PyMySQL não está instalado.\n\nRode:\n'
-                    '"C:\\Users\\Renan Farias\\AppData\\Local\\Programs\\Python\\Python313\\python.exe" -m pip install PyMySQL'
-                )
-                return None, None
-            try:
-                ssl_params = None
-                if 'ssl_ca' in cfg or 'ssl_cert' in cfg or 'ssl_key' in cfg:
-                    ssl_params = {}
-                    if 'ssl_ca' in cfg:   ssl_params['ca']   = cfg['ssl_ca']
-                    if 'ssl_cert' in cfg: ssl_params['cert'] = cfg['ssl_cert']
-                    if 'ssl_key' in cfg:  ssl_params['key']  = cfg['ssl_key']
-
-                conn = pymysql.connect(
-                    host=cfg['host'],
-                    user=cfg['user'],
-                    password=cfg['password'],
-                    database=cfg['database'],
-                    port=cfg['port'],
-                    connect_timeout=cfg.get('timeout', 15),
-                    ssl=ssl_params
-                )
-                return conn, conn.cursor()
-            except Exception as err2:
-                messagebox.showerror(
-                    'Erro PyMySQL',
-                    f'Falha no fallback PyMySQL:\n{err2}\n\n'
-                    f'Host={cfg.get("host")}\nDB={cfg.get("database")}\nPort={cfg.get("port")}\n'
-                    f'.env usado: {LAST_ENV_PATH or "NÃO ENCONTRADO"}'
-                )
-                return None, None
-        messagebox.showerror(
-            'Erro MySQL',
-            f"{err1}\n\nHost={cfg.get('host')}\nDB={cfg.get('database')}\nPort={cfg.get('port')}\n"
-            f".env usado: {LAST_ENV_PATH or 'NÃO ENCONTRADO'}"
-        )
-        return None, None
-    except Exception as e:
-        messagebox.showerror('Erro inesperado', str(e))
-        return None, None
-
-def _parse_data_series(s: pd.Series) -> pd.Series:
-    s = pd.to_datetime(s, errors='coerce', dayfirst=True)
-    return s.dt.date
-
-def formatar_datas_e_numeros(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    for campo in ['valor_causa', 'valor_final_causa']:
-        if campo in df.columns:
-            df[campo] = pd.to_numeric(df[campo], errors='coerce').fillna(0.0)
-    for c in list(df.columns):
-        if isinstance(c, str) and c.startswith('data_'):
-            df[c] = _parse_data_series(df[c])
-    if 'dataAtualizacao' in df.columns:
-        df['dataAtualizacao'] = _parse_data_series(df['dataAtualizacao'])
-    if 'data_submit' in df.columns:
-        df['data_submit'] = _parse_data_series(df['data_submit'])
-    if 'cnj' in df.columns:
-        df['cnj'] = df['cnj'].astype(str).str.strip()
-    for c in ['fase', 'status', 'tipo_resultado', 'parecer_processo', 'cliente', 'justificativa', 'motivo', 'cod_lote']:
-        if c in df.columns:
-            df[c] = df[c].astype(str).str.strip()
-    return df
-
-def validar_colunas_para_insercao(df: pd.DataFrame) -> Tuple[bool, List[str]]:
-    faltando = [c for c in colunas_encerramento if c not in df.columns]
-    return (len(faltando) == 0), faltando
-
-def montar_registros(df: pd.DataFrame) -> List[Tuple]:
-    registros: List[Tuple] = []
-    for _, row in df.iterrows():
-        vals: List[object] = []
-        for coluna in colunas_encerramento:
-            v = row.get(coluna, None)
-            if pd.isna(v):
-                vals.append(None)
-            else:
-                vals.append(v)
-        registros.append(tuple(vals))
-    return registros
-
-def verificar_cnjs_existentes(cnjs: List[str]) -> List[str]:
-    """Verifica quais CNJs já existem no banco."""
-    conn, cur = conectar_ao_mysql()
-    if not conn:
-        return []
-    try:
-        if not cnjs:
-            return []
-        placeholders = ", ".join(["%s"] * len(cnjs))
-        sql = f"SELECT DISTINCT cnj FROM encerramento WHERE cnj IN ({placeholders})"
-        cur.execute(sql, cnjs)
-        existentes = [row[0] for row in cur.fetchall()]
-        return existentes
-    except Exception as e:
-        messagebox.showerror('Erro', f'Falha ao verificar CNJs existentes:\n{e}')
-        return []
-    finally:
-        try:
-            cur.close()
-            conn.close()
-        except Exception:
-            pass
-
-
-def inserir_em_lotes(registros: List[Tuple], lote: int = 500, progress_cb=None) -> Tuple[int, List[str]]:
-    """Retorna (total_inserido, lista_cnjs_duplicados)."""
-    conn, cur = conectar_ao_mysql()
-    if not conn:
-        return 0, []
+            t_ant, feito_ant = self._amostra
+            if agora > t_ant:
+                instantanea = (feito - feito_ant) / (agora - t_ant)
+                # média móvel exponencial para o número não ficar pulando
+                self._taxa = 0.3 * instantanea + 0.7 * self._taxa
+        self._amostra = (agora, feito)
+        eta = (total - feito) / self._taxa if self._taxa > 0 and total > feito else None
+        self._ao_atualizar(feito, total, self._taxa, eta, detalhe)
+
+def formatar_eta(segundos: Optional[float]) -> str:
+    if segundos is None:
+        return '--:--'
+    segundos = int(segundos)
+    h, resto = divmod(segundos, 3600)
+    m, s = divmod(resto, 60)
+    return f'{h:d}:{m:02d}:{s:02d}' if h else f'{m:02d}:{s:02d}'
+
+class GradeVirtual(ttk.Frame):
+    """Tabela com rolagem virtual sobre um DataFrame.
+
+    O Treeview só tem as linhas que cabem na tela; ao rolar, os mesmos itens recebem os
+    valores da nova janela do DataFrame. Assim 200 mil linhas abrem na hora e o custo
+    de cada rolagem é proporcional só à área visível.
+    """
+
+    def __init__(self, parent, pal: Dict[str, str], **kwargs):
+        super().__init__(parent, **kwargs)
+        self._df: Optional[pd.DataFrame] = None
+        self._inicio = 0
+        self._itens: List[str] = []
+
+        self.tree = ttk.Treeview(self, style="Custom.Treeview", show='headings', selectmode='browse')
+        self._scroll_y = ttk.Scrollbar(self, orient='vertical', command=self._on_scrollbar)
+        self._scroll_x = ttk.Scrollbar(self, orient='horizontal', command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self._scroll_x.set)
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self._scroll_y.grid(row=0, column=1, sticky='ns')
+        self._scroll_x.grid(row=1, column=0, sticky='ew')
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
 
-    # Extrair CNJs (primeiro campo de cada tupla)
-    cnjs_todos = [reg[0] for reg in registros if reg[0]]
-    cnjs_duplicados = verificar_cnjs_existentes(cnjs_todos)
-    cnjs_duplicados_set = set(cnjs_duplicados)
+        # Listras (tags)
+        self.tree.tag_configure('oddrow', background=pal["row_odd"])
+        self.tree.tag_configure('evenrow', background=pal["row_even"])
+
+        self.tree.bind('<Configure>', lambda _e: self._renderizar())
+        self.tree.bind('<MouseWheel>', self._on_roda)
+        self.tree.bind('<Button-4>', lambda _e: self._rolar(-3))
+        self.tree.bind('<Button-5>', lambda _e: self._rolar(3))
+        self.tree.bind('<Prior>', lambda _e: self._rolar(-self._visiveis()) or 'break')
+        self.tree.bind('<Next>', lambda _e: self._rolar(self._visiveis()) or 'break')
+        self.tree.bind('<Home>', lambda _e: self._ir_para(0) or 'break')
+        self.tree.bind('<End>', lambda _e: self._ir_para(self._total()) or 'break')
+
+    # ---- API ----
+    def definir_dados(self, df: Optional[pd.DataFrame]):
+        self._df = df
+        self._inicio = 0
+        for col in self.tree['columns']:
+            self.tree.heading(col, text='')
+        cols = colunas_disponiveis(df) if df is not None else []
+        self.tree['columns'] = cols
+        # Cabeçalhos
+        for c in cols:
+            self.tree.heading(c, text=c, anchor='w')
+            self.tree.column(c, width=150, stretch=True, anchor='w')
+        self._renderizar()
 
-    # Filtrar registros que não estão duplicados
-    registros_validos = [reg for reg in registros if reg[0] not in cnjs_duplicados_set]
+    def limpar(self):
+        self.definir_dados(None)
 
-    if not registros_validos:
-        return 0, cnjs_duplicados
+    # ---- rolagem ----
+    def _total(self) -> int:
+        return 0 if self._df is None else len(self._df)
 
-    try:
-        cols = ", ".join(colunas_encerramento)
-        ph = ", ".join(["%s"] * len(colunas_encerramento))
-        sql = f"INSERT INTO encerramento ({cols}) VALUES ({ph})"
-        total = 0
-        for i in range(0, len(registros_validos), lote):
-            chunk = registros_validos[i:i + lote]
-            cur.executemany(sql, chunk)
-            conn.commit()
-            total += cur.rowcount or 0
-            if progress_cb:
-                progress_cb(min(total, len(registros_validos)), len(registros))
-        return total, cnjs_duplicados
-    except mysql.connector.Error as err:
+    def _visiveis(self) -> int:
         try:
-            conn.rollback()
-        except Exception:
-            pass
-        messagebox.showerror('Erro MySQL', f'Falha ao inserir registros:\n{err}')
-        return 0, cnjs_duplicados
-    finally:
-        try:
-            cur.close()
-            conn.close()
-        except Exception:
-            pass
+            altura_linha = int(ttk.Style(self).lookup('Custom.Treeview', 'rowheight') or 26)
+        except (tk.TclError, ValueError):
+            altura_linha = 26
+        # desconta a linha de cabeçalho
+        return max(1, self.tree.winfo_height() // altura_linha - 1)
+
+    def _ir_para(self, inicio: int):
+        maximo = max(0, self._total() - self._visiveis())
+        inicio = min(max(0, int(inicio)), maximo)
+        if inicio != self._inicio:
+            self._inicio = inicio
+            self._renderizar()
+
+    def _rolar(self, linhas: int):
+        self._ir_para(self._inicio + linhas)
+
+    def _on_roda(self, event):
+        passos = -int(event.delta / 120) if event.delta else 0
+        self._rolar(passos * 3)
+        return 'break'
+
+    def _on_scrollbar(self, acao, valor, unidade=None):
+        if acao == 'moveto':
+            self._ir_para(float(valor) * self._total())
+        elif acao == 'scroll':
+            passo = self._visiveis() if unidade == 'pages' else 1
+            self._rolar(int(valor) * passo)
+
+    # ---- desenho ----
+    def _renderizar(self):
+        total = self._total()
+        n = min(self._visiveis(), total)
+        fim = self._inicio + n
+
+        while len(self._itens) < n:
+            self._itens.append(self.tree.insert('', 'end'))
+        if len(self._itens) > n:
+            self.tree.delete(*self._itens[n:])
+            del self._itens[n:]
+
+        if n:
+            janela = self._df.iloc[self._inicio:fim]
+            colunas = []
+            for c in range(janela.shape[1]):
+                serie = janela.iloc[:, c]
+                valores = serie.to_numpy(dtype=object)
+                nulos = serie.isna().to_numpy()
+                colunas.append(["" if nulo else str(v) for v, nulo in zip(valores, nulos)])
+            # constantes do preset: um valor para todas as linhas, sem coluna no DataFrame
+            for valor in [v for c, v in constantes_de(self._df).items() if c not in self._df.columns]:
+                colunas.append([""] * n if valor is None else [str(valor)] * n)
+            for k, (iid, valores) in enumerate(zip(self._itens, zip(*colunas))):
+                tag = 'evenrow' if (self._inicio + k) % 2 == 0 else 'oddrow'
+                self.tree.item(iid, values=valores, tags=(tag,))
+
+        if total:
+            self._scroll_y.set(self._inicio / total, fim / total)
+        else:
+            self._scroll_y.set(0, 1)
 
-# =========================
-# UI Tkinter
-# =========================
 @dataclass()
 class AppState:
     path: Optional[str] = None
     df: Optional[pd.DataFrame] = None
     empresa: str = ''
     sheet_name: Optional[str] = None
+    duplicados: str = ''
 
 class MigracoesApp(tk.Tk):
     def __init__(self):
@@ -818,8 +361,14 @@ class MigracoesApp(tk.Tk):
         self.pal = apply_style(self, self.theme.get())
 
         self.state = AppState()
+        self._preview_cancelar: Optional[threading.Event] = None
         self.create_widgets()
         self.bind_theme_switch()
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
+        self._fila_ui: queue.SimpleQueue = queue.SimpleQueue()
+        self._drenar_fila_ui()
+        definir_notificador_erro(lambda titulo, msg: self.na_ui(lambda: messagebox.showerror(titulo, msg)))
+        self._atualizar_status_pool()
 
     def bind_theme_switch(self):
         def on_change(*_):
@@ -903,6 +452,32 @@ class MigracoesApp(tk.Tk):
             command=self.on_send
         ).pack(side='left', padx=8)
 
+        # Envio direto da planilha em blocos, sem carregar tudo em memória
+        self.var_streaming = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            actions,
+            text='Envio em blocos (planilhas grandes)',
+            variable=self.var_streaming
+        ).pack(side='left', padx=8)
+
+        # Motor de inserção (padrão vem do DB_INSERT_ENGINE do .env)
+        ttk.Label(actions, text='Motor:').pack(side='left', padx=(8, 4))
+        self.cmb_motor = ttk.Combobox(actions, values=list(MOTORES_INSERCAO), state='readonly', width=12)
+        self.cmb_motor.set(motor_insercao_padrao())
+        self.cmb_motor.pack(side='left')
+
+        # Política de commit (padrão vem do DB_COMMIT_POLICY do .env)
+        ttk.Label(actions, text='Commit:').pack(side='left', padx=(8, 4))
+        self.cmb_commit = ttk.Combobox(actions, values=list(POLITICAS_COMMIT), state='readonly', width=7)
+        self.cmb_commit.set(PoliticaCommit.de(None).modo)
+        self.cmb_commit.pack(side='left')
+
+        # CNJ repetido dentro da planilha (padrão vem do CNJ_DUPLICADOS do ambiente)
+        ttk.Label(actions, text='Repetidos:').pack(side='left', padx=(8, 4))
+        self.cmb_duplicados = ttk.Combobox(actions, values=list(POLITICAS_DUPLICADOS), state='readonly', width=11)
+        self.cmb_duplicados.set(politica_duplicados())
+        self.cmb_duplicados.pack(side='left')
+
         # NOVO BOTÃO: consulta/exclusão por lote
         ttk.Button(
             actions,
@@ -911,6 +486,14 @@ class MigracoesApp(tk.Tk):
             command=self.open_consulta_lote_window
         ).pack(side='right', padx=8)
 
+        # Fila com vários arquivos processados em paralelo
+        ttk.Button(
+            actions,
+            text='Fila de importação...',
+            style="Ghost.TButton",
+            command=self.open_fila_window
+        ).pack(side='right')
+
         # Botão já existente: Admin Encerramento
         ttk.Button(
             actions,
@@ -920,8 +503,8 @@ class MigracoesApp(tk.Tk):
         ).pack(side='right')
 
         # LISTA (Treeview)
-        self.tree = ttk.Treeview(self, style="Custom.Treeview", show='headings')
-        self.tree.pack(fill='both', expand=True, padx=14, pady=(0, 10))
+        self.grade = GradeVirtual(self, self.pal)
+        self.grade.pack(fill='both', expand=True, padx=14, pady=(0, 10))
 
         # Barra de status
         self.status_bar = ttk.Frame(self, padding=(14, 8), style="Card.TFrame")
@@ -930,6 +513,11 @@ class MigracoesApp(tk.Tk):
         self.lbl_status.pack(side='left')
         self.pb = ttk.Progressbar(self.status_bar, mode='determinate', length=320, style="Thin.Horizontal.TProgressbar")
         self.pb.pack(side='right')
+        self.lbl_pool = ttk.Label(self.status_bar, text='', style='Status.TLabel')
+        self.lbl_pool.pack(side='right', padx=(0, 14))
+        # só aparece enquanto uma pré-visualização está sendo lida
+        self.btn_cancelar = ttk.Button(self.status_bar, text='Cancelar', style='Ghost.TButton',
+                                       command=self.on_cancel_preview)
 
     def on_clear(self):
         """Limpa todos os campos da tela principal."""
@@ -943,17 +531,12 @@ class MigracoesApp(tk.Tk):
         # Limpa combobox de empresa
         self.cmb_empresa.set('')
 
-        # Reseta o estado interno
+        # Cancela pré-visualização em andamento e reseta o estado interno
+        self.on_cancel_preview()
         self.state = AppState()
 
-        # Limpa a Treeview
-        try:
-            for col in self.tree['columns']:
-                self.tree.heading(col, text='')
-            self.tree['columns'] = ()
-        except Exception:
-            pass
-        self.tree.delete(*self.tree.get_children())
+        # Limpa a grade
+        self.grade.limpar()
 
         # Reseta barra de progresso
         self.pb['value'] = 0
@@ -965,7 +548,7 @@ class MigracoesApp(tk.Tk):
         """Janela auxiliar para excluir linhas e exportar por cod_lote."""
         win = tk.Toplevel(self)
         win.title("Administração da tabela encerramento")
-        win.geometry("720x460")
+        win.geometry("760x760")
         win.configure(bg=self.pal["bg"])
 
         container = ttk.Frame(win, padding=16, style="Card.TFrame")
@@ -1002,7 +585,10 @@ class MigracoesApp(tk.Tk):
                 return
 
             try:
-                cur.execute("DELETE FROM encerramento WHERE cnj = %s", (cnj,))
+                # o CNJ pode estar gravado na máscara ou só com os dígitos: apaga as duas grafias
+                formas = list(formas_cnjs([cnj]))
+                cur.execute(f"DELETE FROM encerramento WHERE cnj IN ({', '.join(['%s'] * len(formas))})",
+                            formas)
                 deleted = cur.rowcount or 0
                 conn.commit()
                 messagebox.showinfo(
@@ -1044,7 +630,7 @@ class MigracoesApp(tk.Tk):
 
         ttk.Label(
             frame_exp,
-            text="Selecione um cod_lote para gerar um Excel apenas com esses processos.",
+            text="Selecione um cod_lote para exportar apenas esses processos (Excel, CSV ou Parquet).",
             style="Subtle.TLabel"
         ).grid(row=0, column=0, columnspan=3, sticky="w", pady=(0, 8))
 
@@ -1072,6 +658,7 @@ class MigracoesApp(tk.Tk):
                 cmb_cod_lote["values"] = valores
                 if valores:
                     cmb_cod_lote.set(valores[0])
+                lotes_disponiveis[:] = valores
             except Exception as e:
                 messagebox.showerror(
                     "Erro ao carregar cod_lote",
@@ -1084,8 +671,66 @@ class MigracoesApp(tk.Tk):
                 except Exception:
                     pass
 
+        lotes_disponiveis: List[str] = []
         carregar_cod_lotes()
 
+        estado_exportacao = {'cancelar': None, 'cancelar_lotes': None, 'colunas': None}
+
+        ttk.Label(frame_exp, text="Formato:", style="TLabel").grid(row=2, column=0, sticky="w", pady=4)
+        linha_formato = ttk.Frame(frame_exp, style="Card.TFrame")
+        linha_formato.grid(row=2, column=1, padx=8, pady=4, sticky="w")
+        cmb_formato = ttk.Combobox(linha_formato, state="readonly", width=10, values=formatos_exportacao_disponiveis())
+        cmb_formato.set("xlsx")
+        cmb_formato.pack(side="left")
+        lbl_colunas = ttk.Label(linha_formato, text="Colunas: todas", style="Subtle.TLabel")
+
+        def on_escolher_colunas():
+            try:
+                todas = listar_colunas_exportaveis()
+            except Exception as e:
+                messagebox.showerror("Erro ao listar colunas", f"Falha ao ler as colunas da tabela:\n{e}")
+                return
+            dlg = tk.Toplevel(win)
+            dlg.title("Colunas da exportação")
+            dlg.configure(bg=self.pal["bg"])
+            dlg.transient(win)
+            lst = tk.Listbox(dlg, selectmode="multiple", height=min(len(todas), 20), exportselection=False)
+            for i, col in enumerate(todas):
+                lst.insert("end", col)
+                if estado_exportacao['colunas'] is None or col in estado_exportacao['colunas']:
+                    lst.selection_set(i)
+            lst.pack(fill="both", expand=True, padx=12, pady=(12, 6))
+
+            def aplicar():
+                escolhidas = [todas[i] for i in lst.curselection()]
+                if not escolhidas:
+                    messagebox.showwarning("Atenção", "Selecione ao menos uma coluna.", parent=dlg)
+                    return
+                completo = len(escolhidas) == len(todas)
+                estado_exportacao['colunas'] = None if completo else escolhidas
+                lbl_colunas.configure(
+                    text="Colunas: todas" if completo else f"Colunas: {len(escolhidas)} de {len(todas)}"
+                )
+                dlg.destroy()
+
+            botoes = ttk.Frame(dlg, style="Card.TFrame")
+            botoes.pack(fill="x", padx=12, pady=(0, 12))
+            ttk.Button(botoes, text="Todas", style="Ghost.TButton",
+                       command=lambda: lst.selection_set(0, "end")).pack(side="left")
+            ttk.Button(botoes, text="Nenhuma", style="Ghost.TButton",
+                       command=lambda: lst.selection_clear(0, "end")).pack(side="left", padx=6)
+            ttk.Button(botoes, text="OK", style="Primary.TButton", command=aplicar).pack(side="right")
+
+        ttk.Button(linha_formato, text="Colunas...", style="Ghost.TButton",
+                   command=on_escolher_colunas).pack(side="left", padx=(8, 6))
+        lbl_colunas.pack(side="left")
+
+        TIPOS_ARQUIVO = {
+            "xlsx": ("Arquivo Excel", "*.xlsx"),
+            "csv": ("CSV (UTF-8)", "*.csv"),
+            "parquet": ("Apache Parquet", "*.parquet"),
+        }
+
         def on_export_lote():
             cod_lote_sel = cmb_cod_lote.get().strip()
             if not cod_lote_sel:
@@ -1095,67 +740,416 @@ class MigracoesApp(tk.Tk):
                 )
                 return
 
+            formato = cmb_formato.get() or "xlsx"
+            colunas = estado_exportacao['colunas']
             path = filedialog.asksaveasfilename(
-                title=f"Salvar planilha do cod_lote {cod_lote_sel}",
-                defaultextension=".xlsx",
-                filetypes=[("Arquivo Excel", "*.xlsx")]
+                title=f"Salvar o cod_lote {cod_lote_sel} ({formato})",
+                defaultextension=f".{formato}",
+                filetypes=[TIPOS_ARQUIVO[formato]]
             )
             if not path:
                 return
 
-            def worker():
-                conn, cur = conectar_ao_mysql()
-                if not conn:
-                    return
-                try:
-                    cur.execute(
-                        "SELECT * FROM encerramento WHERE cod_lote = %s",
-                        (cod_lote_sel,)
-                    )
-                    rows = cur.fetchall()
-                    col_names = [desc[0] for desc in cur.description]
-                except Exception as e:
-                    self.after(0, lambda: messagebox.showerror(
-                        "Erro ao consultar tabela",
-                        f"Falha ao buscar dados da tabela encerramento para o cod_lote {cod_lote_sel}:\n{e}"
-                    ))
-                    try:
-                        cur.close()
-                        conn.close()
-                    except Exception:
-                        pass
+            cancelar = threading.Event()
+            estado_exportacao['cancelar'] = cancelar
+            btn_exportar.state(['disabled'])
+            btn_cancelar_exp.grid()
+            pb_exp['value'] = 0
+            lbl_exp.configure(text=f"Exportando {cod_lote_sel}...")
+
+            def atualizar(feito, total, taxa, eta, _detalhe):
+                if not win.winfo_exists():
                     return
+                pb_exp['maximum'] = max(total, 1)
+                pb_exp['value'] = feito
+                lbl_exp.configure(
+                    text=f"{feito}/{total} linha(s) · {taxa:,.0f} linhas/s · ETA {formatar_eta(eta)}"
+                )
 
-                try:
-                    cur.close()
-                    conn.close()
-                except Exception:
-                    pass
+            def terminar(texto: str):
+                estado_exportacao['cancelar'] = None
+                if win.winfo_exists():
+                    btn_exportar.state(['!disabled'])
+                    btn_cancelar_exp.grid_remove()
+                    lbl_exp.configure(text=texto)
 
+            canal = CanalProgresso(self, atualizar)
+
+            def worker():
                 try:
-                    df = pd.DataFrame(rows, columns=col_names)
-                    df.to_excel(path, index=False)
-                    self.after(0, lambda: messagebox.showinfo(
-                        "Exportação concluída",
-                        f"Arquivo gerado com {len(df)} linha(s) do cod_lote {cod_lote_sel}:\n{path}"
+                    linhas = exportar_lote(cod_lote_sel, path, formato=formato, colunas=colunas,
+                                           progress_cb=canal.publicar, cancelar=cancelar)
+                except OperacaoCancelada:
+                    canal.finalizar(lambda: terminar("Exportação cancelada."))
+                    return
+                except ErroConexao as e:
+                    canal.finalizar(lambda e=e: (
+                        terminar(""),
+                        messagebox.showerror(e.titulo, e.mensagem)
                     ))
+                    return
                 except Exception as e:
-                    self.after(0, lambda: messagebox.showerror(
-                        "Erro ao salvar Excel",
-                        f"Falha ao salvar o arquivo Excel:\n{e}"
+                    canal.finalizar(lambda e=e: (
+                        terminar(""),
+                        messagebox.showerror(
+                            "Erro ao exportar",
+                            f"Falha ao exportar o cod_lote {cod_lote_sel}:\n{e}"
+                        )
                     ))
+                    return
+                canal.finalizar(lambda: (
+                    terminar(f"✔ {linhas} linha(s) exportadas."),
+                    messagebox.showinfo(
+                        "Exportação concluída",
+                        f"Arquivo gerado com {linhas} linha(s) do cod_lote {cod_lote_sel}:\n{path}"
+                    )
+                ))
 
+            canal.iniciar()
             threading.Thread(target=worker, daemon=True).start()
 
-        ttk.Button(
+        def on_cancel_export():
+            if estado_exportacao['cancelar'] is not None:
+                estado_exportacao['cancelar'].set()
+                lbl_exp.configure(text="Cancelando...")
+
+        btn_exportar = ttk.Button(
             frame_exp,
-            text="Exportar para Excel (cod_lote selecionado)",
+            text="Exportar cod_lote selecionado",
             style="Ghost.TButton",
             command=on_export_lote
-        ).grid(row=1, column=2, padx=8, pady=4, sticky="w")
+        )
+        btn_exportar.grid(row=1, column=2, padx=8, pady=4, sticky="w")
+
+        pb_exp = ttk.Progressbar(frame_exp, mode="determinate")
+        pb_exp.grid(row=3, column=0, columnspan=2, sticky="ew", pady=(8, 0))
+        btn_cancelar_exp = ttk.Button(frame_exp, text="Cancelar", style="Ghost.TButton", command=on_cancel_export)
+        btn_cancelar_exp.grid(row=3, column=2, padx=8, pady=(8, 0), sticky="w")
+        btn_cancelar_exp.grid_remove()
+        lbl_exp = ttk.Label(frame_exp, text="", style="Subtle.TLabel")
+        lbl_exp.grid(row=4, column=0, columnspan=3, sticky="w", pady=(4, 0))
+
+        def on_close_admin():
+            # fechar a janela no meio da exportação também cancela (o arquivo parcial é descartado)
+            for chave in ('cancelar', 'cancelar_lotes'):
+                if estado_exportacao[chave] is not None:
+                    estado_exportacao[chave].set()
+            win.destroy()
+
+        win.protocol("WM_DELETE_WINDOW", on_close_admin)
 
         frame_exp.columnconfigure(1, weight=1)
 
+        # ========================
+        # 3) Exportação de vários cod_lote
+        # ========================
+        self.section_title(container, "📦 Exportar vários cod_lote (em paralelo)")
+
+        frame_lotes = ttk.Frame(container, style="Card.TFrame")
+        frame_lotes.pack(fill="both", expand=True)
+
+        ttk.Label(
+            frame_lotes,
+            text="Selecione os lotes (Ctrl/Shift para vários) ou marque os de um período de data_exportacao. "
+                 "Usa o formato e as colunas escolhidos acima.",
+            style="Subtle.TLabel",
+            wraplength=680
+        ).grid(row=0, column=0, columnspan=4, sticky="w", pady=(0, 8))
+
+        lst_lotes = tk.Listbox(frame_lotes, selectmode="extended", height=8, exportselection=False)
+        lst_lotes.grid(row=1, column=0, columnspan=3, sticky="nsew")
+        sb_lotes = ttk.Scrollbar(frame_lotes, orient="vertical", command=lst_lotes.yview)
+        sb_lotes.grid(row=1, column=3, sticky="ns")
+        lst_lotes.configure(yscrollcommand=sb_lotes.set)
+        for valor in lotes_disponiveis:
+            lst_lotes.insert("end", valor)
+
+        linha_periodo = ttk.Frame(frame_lotes, style="Card.TFrame")
+        linha_periodo.grid(row=2, column=0, columnspan=4, sticky="w", pady=(8, 4))
+        ttk.Label(linha_periodo, text="De:", style="TLabel").pack(side="left")
+        ent_de = ttk.Entry(linha_periodo, width=12)
+        ent_de.pack(side="left", padx=(4, 10))
+        ttk.Label(linha_periodo, text="Até:", style="TLabel").pack(side="left")
+        ent_ate = ttk.Entry(linha_periodo, width=12)
+        ent_ate.pack(side="left", padx=(4, 10))
+        hoje = date.today()
+        ent_de.insert(0, hoje.replace(day=1).strftime("%d/%m/%Y"))
+        ent_ate.insert(0, hoje.strftime("%d/%m/%Y"))
+
+        def on_selecionar_periodo():
+            try:
+                inicio = datetime.strptime(ent_de.get().strip(), "%d/%m/%Y").date()
+                fim = datetime.strptime(ent_ate.get().strip(), "%d/%m/%Y").date()
+            except ValueError:
+                messagebox.showwarning("Atenção", "Informe as datas no formato dd/mm/aaaa.")
+                return
+            if fim < inicio:
+                messagebox.showwarning("Atenção", "A data final é anterior à inicial.")
+                return
+            try:
+                do_periodo = set(listar_lotes_por_periodo(inicio, fim))
+            except Exception as e:
+                messagebox.showerror("Erro ao buscar lotes", f"Falha ao buscar os lotes do período:\n{e}")
+                return
+            lst_lotes.selection_clear(0, "end")
+            for i, valor in enumerate(lotes_disponiveis):
+                if valor in do_periodo:
+                    lst_lotes.selection_set(i)
+            lbl_lotes.configure(text=f"{len(do_periodo)} lote(s) no período.")
+
+        ttk.Button(linha_periodo, text="Selecionar período", style="Ghost.TButton",
+                   command=on_selecionar_periodo).pack(side="left")
+
+        var_zip = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame_lotes, text="Um único .zip (particionado por cod_lote)", variable=var_zip).grid(
+            row=3, column=0, columnspan=2, sticky="w", pady=4
+        )
+
+        def on_export_lotes():
+            selecionados = [lotes_disponiveis[i] for i in lst_lotes.curselection()]
+            if not selecionados:
+                messagebox.showwarning("Atenção", "Selecione ao menos um cod_lote.")
+                return
+            formato = cmb_formato.get() or "xlsx"
+            colunas = estado_exportacao['colunas']
+            zip_unico = var_zip.get()
+            if zip_unico:
+                destino = filedialog.asksaveasfilename(
+                    title=f"Salvar {len(selecionados)} lote(s) em .zip",
+                    defaultextension=".zip",
+                    filetypes=[("Arquivo zip", "*.zip")]
+                )
+            else:
+                destino = filedialog.askdirectory(title=f"Pasta para os {len(selecionados)} arquivo(s)")
+            if not destino:
+                return
+
+            cancelar = threading.Event()
+            estado_exportacao['cancelar_lotes'] = cancelar
+            btn_exportar_lotes.state(['disabled'])
+            btn_cancelar_lotes.grid()
+            pb_lotes['value'] = 0
+            lbl_lotes.configure(text=f"Exportando {len(selecionados)} lote(s)...")
+
+            def atualizar(feito, total, taxa, eta, detalhe):
+                if not win.winfo_exists():
+                    return
+                pb_lotes['maximum'] = max(total, 1)
+                pb_lotes['value'] = feito
+                lbl_lotes.configure(
+                    text=f"{detalhe} · {feito}/{total} linha(s) · {taxa:,.0f} linhas/s · ETA {formatar_eta(eta)}"
+                )
+
+            def terminar(texto: str):
+                estado_exportacao['cancelar_lotes'] = None
+                if win.winfo_exists():
+                    btn_exportar_lotes.state(['!disabled'])
+                    btn_cancelar_lotes.grid_remove()
+                    lbl_lotes.configure(text=texto)
+
+            canal = CanalProgresso(self, atualizar)
+
+            def worker():
+                try:
+                    resultados = exportar_lotes(selecionados, destino, formato=formato, colunas=colunas,
+                                                zip_unico=zip_unico, progress_cb=canal.publicar, cancelar=cancelar)
+                except OperacaoCancelada:
+                    canal.finalizar(lambda: terminar("Exportação cancelada."))
+                    return
+                except ErroConexao as e:
+                    canal.finalizar(lambda e=e: (
+                        terminar(""),
+                        messagebox.showerror(e.titulo, e.mensagem)
+                    ))
+                    return
+                except Exception as e:
+                    canal.finalizar(lambda e=e: (
+                        terminar(""),
+                        messagebox.showerror("Erro ao exportar", f"Falha na exportação dos lotes:\n{e}")
+                    ))
+                    return
+
+                falhas = [r for r in resultados if r.erro]
+                linhas = sum(r.linhas for r in resultados)
+                texto = f"✔ {len(resultados) - len(falhas)} lote(s), {linhas} linha(s) exportadas."
+                if falhas:
+                    detalhes = "\n".join(f"• {r.cod_lote}: {r.erro}" for r in falhas[:10])
+                    canal.finalizar(lambda: (
+                        terminar(texto + f" {len(falhas)} falharam."),
+                        messagebox.showwarning(
+                            "Exportação concluída com falhas",
+                            f"{len(falhas)} de {len(resultados)} lote(s) falharam:\n{detalhes}"
+                        )
+                    ))
+                else:
+                    canal.finalizar(lambda: (
+                        terminar(texto),
+                        messagebox.showinfo("Exportação concluída", f"{texto}\n{destino}")
+                    ))
+
+            canal.iniciar()
+            threading.Thread(target=worker, daemon=True).start()
+
+        def on_cancel_lotes():
+            if estado_exportacao['cancelar_lotes'] is not None:
+                estado_exportacao['cancelar_lotes'].set()
+                lbl_lotes.configure(text="Cancelando...")
+
+        btn_exportar_lotes = ttk.Button(frame_lotes, text="Exportar selecionados", style="Primary.TButton",
+                                        command=on_export_lotes)
+        btn_exportar_lotes.grid(row=3, column=2, columnspan=2, sticky="e", pady=4)
+
+        pb_lotes = ttk.Progressbar(frame_lotes, mode="determinate")
+        pb_lotes.grid(row=4, column=0, columnspan=2, sticky="ew", pady=(8, 0))
+        btn_cancelar_lotes = ttk.Button(frame_lotes, text="Cancelar", style="Ghost.TButton", command=on_cancel_lotes)
+        btn_cancelar_lotes.grid(row=4, column=2, padx=8, pady=(8, 0), sticky="w")
+        btn_cancelar_lotes.grid_remove()
+        lbl_lotes = ttk.Label(frame_lotes, text="", style="Subtle.TLabel")
+        lbl_lotes.grid(row=5, column=0, columnspan=4, sticky="w", pady=(4, 0))
+
+        frame_lotes.columnconfigure(0, weight=1)
+        frame_lotes.rowconfigure(1, weight=1)
+
+    def open_fila_window(self):
+        """Janela para enfileirar vários (arquivo, aba, empresa) e importá-los em paralelo."""
+        win = tk.Toplevel(self)
+        win.title("Fila de importação")
+        win.geometry("1000x520")
+        win.configure(bg=self.pal["bg"])
+
+        container = ttk.Frame(win, padding=16, style="Card.TFrame")
+        container.pack(fill="both", expand=True, padx=14, pady=14)
+
+        self.section_title(container, "🗂️ Fila de importação (vários arquivos)")
+
+        fila = FilaImportacao(processos=2, conexoes=3)
+        item_tarefa: Dict[str, TarefaImportacao] = {}
+
+        # ========================
+        # Adicionar arquivos
+        # ========================
+        add_frame = ttk.Frame(container, style="Card.TFrame")
+        add_frame.pack(fill="x", pady=(0, 10))
+
+        ttk.Label(add_frame, text="Empresa:", style="TLabel").grid(row=0, column=0, sticky="w", pady=4)
+        cmb_empresa = ttk.Combobox(add_frame, values=list(COMPANY_PRESETS.keys()), state='readonly', width=30)
+        cmb_empresa.grid(row=0, column=1, padx=8, pady=4, sticky="w")
+        if self.cmb_empresa.get():
+            cmb_empresa.set(self.cmb_empresa.get())
+
+        ttk.Label(add_frame, text="Aba (vazio = primeira):", style="TLabel").grid(row=0, column=2, sticky="w", pady=4)
+        ent_aba = ttk.Entry(add_frame, width=20)
+        ent_aba.grid(row=0, column=3, padx=8, pady=4, sticky="w")
+
+        # ========================
+        # Lista (Treeview)
+        # ========================
+        lista_frame = ttk.Frame(container, style="Card.TFrame")
+        lista_frame.pack(fill="both", expand=True)
+
+        colunas = ("arquivo", "empresa", "aba", "estado", "lidas", "inseridas", "duplicados", "taxa")
+        titulos = ("Arquivo", "Empresa", "Aba", "Estado", "Lidas", "Inseridas", "Duplicados", "Linhas/s")
+        tree = ttk.Treeview(lista_frame, style="Custom.Treeview", columns=colunas,
+                            show="headings", selectmode="extended")
+        tree.pack(side="left", fill="both", expand=True)
+        scroll_y = ttk.Scrollbar(lista_frame, orient="vertical", command=tree.yview)
+        scroll_y.pack(side="right", fill="y")
+        tree.configure(yscrollcommand=scroll_y.set)
+        for col, titulo in zip(colunas, titulos):
+            tree.heading(col, text=titulo, anchor="w")
+            tree.column(col, width=220 if col == "arquivo" else 100, anchor="w", stretch=True)
+        tree.tag_configure('oddrow', background=self.pal["row_odd"])
+        tree.tag_configure('evenrow', background=self.pal["row_even"])
+
+        def valores(t: TarefaImportacao):
+            return (
+                os.path.basename(t.path), t.empresa.strip(), t.sheet if t.sheet != 0 else "(primeira)",
+                t.estado if not t.erro else f"{t.estado}: {t.erro}",
+                t.lidas, t.inseridas, len(t.duplicados), f"{t.linhas_por_segundo:,.0f}",
+            )
+
+        def adicionar_arquivos():
+            empresa = cmb_empresa.get()
+            if not empresa:
+                messagebox.showwarning("Atenção", "Selecione a empresa dos arquivos.", parent=win)
+                return
+            paths = filedialog.askopenfilenames(
+                parent=win,
+                title='Selecione as planilhas',
+                filetypes=[('Arquivos Excel', '*.xlsx *.xls')]
+            )
+            aba = ent_aba.get().strip() or 0
+            for path in paths:
+                tarefa = fila.adicionar(path, empresa, aba)
+                tag = 'evenrow' if len(item_tarefa) % 2 == 0 else 'oddrow'
+                iid = tree.insert("", "end", values=valores(tarefa), tags=(tag,))
+                item_tarefa[iid] = tarefa
+
+        ttk.Button(add_frame, text="Adicionar arquivos...", style="Ghost.TButton",
+                   command=adicionar_arquivos).grid(row=0, column=4, padx=8, pady=4)
+        add_frame.columnconfigure(4, weight=1)
+
+        # ========================
+        # Ações
+        # ========================
+        buttons_frame = ttk.Frame(container, style="Card.TFrame")
+        buttons_frame.pack(fill="x", pady=(10, 0))
+        lbl_total = ttk.Label(buttons_frame, text="", style="Subtle.TLabel")
+        lbl_total.pack(side="left")
+
+        def remover_selecionados():
+            for iid in tree.selection():
+                tarefa = item_tarefa.get(iid)
+                if tarefa is not None and tarefa.estado == 'pendente':
+                    fila.tarefas.remove(tarefa)
+                    item_tarefa.pop(iid)
+                    tree.delete(iid)
+
+        def atualizar():
+            for iid, tarefa in item_tarefa.items():
+                tree.item(iid, values=valores(tarefa))
+            if fila.inicio is not None:
+                lbl_total.configure(
+                    text=f"Total: {fila.inseridas} inseridos · {fila.linhas_por_segundo:,.0f} linhas/s"
+                )
+
+        def acompanhar():
+            if not win.winfo_exists():
+                return
+            atualizar()
+            if btn_iniciar.instate(['disabled']):
+                win.after(300, acompanhar)
+
+        def finalizar():
+            if not win.winfo_exists():
+                return
+            atualizar()
+            btn_iniciar.state(['!disabled'])
+            messagebox.showinfo("Fila concluída", fila.resumo(), parent=win)
+
+        def iniciar():
+            if not any(t.estado == 'pendente' for t in fila.tarefas):
+                messagebox.showwarning("Atenção", "Adicione arquivos à fila primeiro.", parent=win)
+                return
+            fila.motor = self.cmb_motor.get() or None
+            fila.commit = self.cmb_commit.get() or None
+            fila.duplicados = self.cmb_duplicados.get() or None
+            btn_iniciar.state(['disabled'])
+
+            def worker():
+                try:
+                    fila.executar()
+                except Exception as e:
+                    self.na_ui(lambda e=e: messagebox.showerror("Erro na fila", str(e), parent=win))
+                self.na_ui(finalizar)
+            threading.Thread(target=worker, daemon=True).start()
+            acompanhar()
+
+        btn_iniciar = ttk.Button(buttons_frame, text="Iniciar fila", style="Primary.TButton", command=iniciar)
+        btn_iniciar.pack(side="right")
+        ttk.Button(buttons_frame, text="Remover selecionados", style="Ghost.TButton",
+                   command=remover_selecionados).pack(side="right", padx=8)
+
     def open_consulta_lote_window(self):
         """Janela para consultar processos por cod_lote e excluir 1+ CNJs selecionados."""
         win = tk.Toplevel(self)
@@ -1415,27 +1409,44 @@ class MigracoesApp(tk.Tk):
         self.state.path = path
         self.ent_path.delete(0, tk.END)
         self.ent_path.insert(0, path)
-        try:
-            xl = pd.ExcelFile(path)
-            sheets = xl.sheet_names
-            self.cmb_sheet['values'] = sheets
-            if sheets:
-                self.cmb_sheet.set(sheets[0])
-                self.state.sheet_name = sheets[0]
-        except Exception as e:
-            messagebox.showerror('Erro', f'Não foi possível ler as abas:\n{e}')
+        self.cmb_sheet.set('')
+        self.cmb_sheet['values'] = []
+        self.set_status('🟦 Lendo abas da planilha...')
+
+        def worker():
+            try:
+                sheets = listar_abas(path)
+            except Exception as e:
+                self.na_ui(lambda e=e: (
+                    self.set_status('🔴 Erro ao ler abas.'),
+                    messagebox.showerror('Erro', f'Não foi possível ler as abas:\n{e}')
+                ))
+                return
+            self.na_ui(lambda: self._finish_select_file(path, sheets))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _finish_select_file(self, path: str, sheets: List[str]):
+        if self.state.path != path:
+            return  # outro arquivo foi escolhido enquanto este era lido
+        self.cmb_sheet['values'] = sheets
+        if sheets:
+            self.cmb_sheet.set(sheets[0])
+            self.state.sheet_name = sheets[0]
+        self.set_status(f'🟢 {len(sheets)} aba(s) encontradas.')
 
     def on_test_conn(self):
         cfg = obter_config_banco()
         messagebox.showinfo(
             "Conexão",
             f"Host={cfg['host']}\nUser={cfg['user']}\nDB={cfg['database']}\n"
-            f"Timeout={cfg.get('timeout', 15)}s\n.env: {LAST_ENV_PATH or 'NÃO ENCONTRADO'}"
+            f"Timeout={cfg.get('timeout', 15)}s\n.env: {encerramento_core.LAST_ENV_PATH or 'NÃO ENCONTRADO'}"
         )
         self.set_status('🟦 Testando conexão...')
+        # relê o .env e descarta conexões antigas do pool
+        POOL_CONEXOES.redefinir()
         def worker():
             conn, cur = conectar_ao_mysql()
-            self.after(0, lambda: self._finish_test_conn(conn, cur))
+            self.na_ui(lambda: self._finish_test_conn(conn, cur))
         threading.Thread(target=worker, daemon=True).start()
 
     def _finish_test_conn(self, conn, cur):
@@ -1463,65 +1474,164 @@ class MigracoesApp(tk.Tk):
         if not empresa:
             messagebox.showwarning('Atenção', 'Selecione a empresa para aplicar os presets.')
             return
-        try:
-            self.set_status('🟦 Lendo planilha...')
-            df = pd.read_excel(self.state.path, sheet_name=sheet)
-            df = df.rename(columns=RENAME_MAP)
-            df = aplicar_presets(df, empresa)
-            df = formatar_datas_e_numeros(df)
-
-            for col in colunas_encerramento:
-                if col not in df.columns:
-                    df[col] = None
-
-            ok, faltando = validar_colunas_para_insercao(df)
-            if not ok and faltando:
-                messagebox.showwarning(
-                    'Colunas ausentes',
-                    f'Estas colunas irão como NULL: {faltando[:20]}'
-                    + ('...' if len(faltando) > 20 else '')
-                )
 
-            self.state.df = df
-            self.state.empresa = empresa
-            self._render_preview(df)
-            self.set_status(f'🟢 Pré-visualização OK – {len(df)} linhas.')
-        except KeyError as ke:
-            messagebox.showerror('Erro de coluna', f'Coluna ausente na planilha: {ke}')
-            self.set_status('🔴 Erro na pré-visualização.')
-        except Exception as e:
-            messagebox.showerror('Erro', f'Falha ao pré-visualizar:\n{e}')
-            self.set_status('🔴 Erro na pré-visualização.')
+        # um novo clique substitui a leitura anterior, que é cancelada
+        if self._preview_cancelar is not None:
+            self._preview_cancelar.set()
+        cancelar = threading.Event()
+        self._preview_cancelar = cancelar
+        path = self.state.path
+        duplicados = self.cmb_duplicados.get() or None
 
-    def _render_preview(self, df: pd.DataFrame, max_rows: int = 300):
-        # Reset
-        for col in self.tree['columns']:
-            self.tree.heading(col, text='')
-        self.tree.delete(*self.tree.get_children())
+        self.pb['value'] = 0
+        self.set_status('🟦 Abrindo planilha...')
+        self.btn_cancelar.pack(side='right', padx=(0, 8))
+        canal = CanalProgresso(self, self._atualizar_progresso_preview)
 
-        show_df = df.copy().head(max_rows)
-        cols = list(show_df.columns)
-        self.tree['columns'] = cols
-        # Cabeçalhos
-        for c in cols:
-            self.tree.heading(c, text=c, anchor='w')
-            self.tree.column(c, width=150, stretch=True, anchor='w')
+        def verificar(etapa: str, feito: int = 0, total: int = 0):
+            if cancelar.is_set():
+                raise OperacaoCancelada()
+            canal.publicar(feito, total, etapa)
 
-        # Listras (tags)
-        self.tree.tag_configure('oddrow', background=self.pal["row_odd"])
-        self.tree.tag_configure('evenrow', background=self.pal["row_even"])
+        def worker():
+            try:
+                leitor = LeitorEmBlocos(path, sheet, tamanho_bloco=5000, cache=CACHE_PLANILHAS)
+                verificar(f'Abrindo planilha ({leitor.motor})...')
+                t0 = time.perf_counter()
+                blocos: List[pd.DataFrame] = []
+                lidas = 0
+                for bloco in leitor:
+                    lidas += len(bloco)
+                    blocos.append(bloco)
+                    verificar(f'Lendo linhas ({leitor.motor})...', lidas, max(leitor.total_estimado or 0, lidas))
+                df = pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame()
+                blocos.clear()
+                leitura = (leitor.motor, time.perf_counter() - t0)
+                if leitor.motor != 'cache':
+                    verificar('Guardando no cache...', lidas, lidas)
+                    CACHE_PLANILHAS.guardar(path, sheet, leitor.colunas, df)
+                df = preparar_planilha(df, empresa, ao_etapa=lambda etapa: verificar(etapa, lidas, lidas),
+                                       duplicados=duplicados)
+            except OperacaoCancelada:
+                canal.finalizar(lambda: None)
+                return
+            except KeyError as ke:
+                canal.finalizar(lambda ke=ke: self._falha_preview(cancelar, 'Erro de coluna', f'Coluna ausente na planilha: {ke}'))
+                return
+            except Exception as e:
+                canal.finalizar(lambda e=e: self._falha_preview(cancelar, 'Erro', f'Falha ao pré-visualizar:\n{e}'))
+                return
+            canal.finalizar(lambda: self._finish_preview(cancelar, df, empresa, sheet, leitura, duplicados))
 
-        for idx, (_, row) in enumerate(show_df.iterrows()):
-            values = [("" if pd.isna(row[c]) else str(row[c])) for c in cols]
-            tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
-            self.tree.insert('', 'end', values=values, tags=(tag,))
+        canal.iniciar()
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_cancel_preview(self):
+        if self._preview_cancelar is not None:
+            self._preview_cancelar.set()
+            self._preview_cancelar = None
+        self.btn_cancelar.pack_forget()
+        self.pb['value'] = 0
+        self.set_status('🟡 Pré-visualização cancelada.')
+
+    def _atualizar_progresso_preview(self, feito, total, taxa, eta, detalhe):
+        if total:
+            self.pb['maximum'] = total
+            self.pb['value'] = feito
+            self.set_status(f'🟦 {detalhe} {feito}/{total} linhas · {taxa:,.0f} linhas/s')
+        else:
+            self.set_status(f'🟦 {detalhe}')
+
+    def _falha_preview(self, cancelar: threading.Event, titulo: str, msg: str):
+        if cancelar.is_set():
+            return
+        self._preview_cancelar = None
+        self.btn_cancelar.pack_forget()
+        messagebox.showerror(titulo, msg)
+        self.set_status('🔴 Erro na pré-visualização.')
+
+    def _finish_preview(self, cancelar: threading.Event, df: pd.DataFrame, empresa: str, sheet,
+                        leitura: Tuple[str, float], duplicados: Optional[str]):
+        if cancelar.is_set():
+            return  # substituída por outra leitura ou cancelada
+        self._preview_cancelar = None
+        self.btn_cancelar.pack_forget()
+
+        ok, faltando = validar_colunas_para_insercao(df)
+        if not ok and faltando:
+            messagebox.showwarning(
+                'Colunas ausentes',
+                f'Estas colunas irão como NULL: {faltando[:20]}'
+                + ('...' if len(faltando) > 20 else '')
+            )
+
+        invalidas = df.attrs.get('datas_invalidas') or {}
+        if invalidas:
+            messagebox.showwarning(
+                'Datas não reconhecidas',
+                'Estas células de data não puderam ser lidas e irão como NULL:\n'
+                + '\n'.join(f'• {coluna}: {n} célula(s)' for coluna, n in invalidas.items())
+            )
+
+        rejeitados = df.attrs.get('cnjs_rejeitados')
+        repetidos = df.attrs.get('cnjs_repetidos')
+        if rejeitados or repetidos:
+            self._oferecer_relatorio_rejeicoes(RelatorioRejeicoes.juntar(r for r in (rejeitados, repetidos) if r))
+
+        self.state.df = df
+        self.state.empresa = empresa
+        self.state.sheet_name = sheet
+        self.state.duplicados = politica_duplicados(duplicados)
+        self._render_preview(df)
+        motor, segundos = leitura
+        aviso = f' · ⚠ {sum(invalidas.values())} data(s) inválida(s)' if invalidas else ''
+        if rejeitados:
+            aviso += f' · ⚠ {len(rejeitados)} CNJ(s) rejeitado(s)'
+        if repetidos:
+            aviso += f' · {len(repetidos)} linha(s) com CNJ repetido retirada(s)'
+        self.set_status(f'🟢 Pré-visualização OK – {len(df)} linhas · leitor {motor} em {segundos:.1f}s{aviso}.')
+
+    def _oferecer_relatorio_rejeicoes(self, relatorio: RelatorioRejeicoes):
+        resumo = '\n'.join(f'• {motivo}: {n} linha(s)' for motivo, n in relatorio.por_motivo().items())
+        if not messagebox.askyesno(
+            'Linhas retiradas',
+            f'{len(relatorio)} linha(s) não serão enviadas:\n{resumo}\n\n'
+            'Deseja salvar o relatório dessas linhas?'
+        ):
+            return
+        path = filedialog.asksaveasfilename(
+            title='Salvar relatório de linhas retiradas',
+            defaultextension='.xlsx',
+            filetypes=[('Planilha Excel', '*.xlsx'), ('CSV', '*.csv')]
+        )
+        if not path:
+            return
+        try:
+            relatorio.salvar(path)
+        except Exception as e:
+            messagebox.showerror('Erro', f'Não foi possível salvar o relatório:\n{e}')
+
+    def _render_preview(self, df: pd.DataFrame):
+        self.grade.definir_dados(df)
 
     def on_send(self):
+        if self.var_streaming.get():
+            self._send_streaming()
+            return
+
         if self.state.df is None or self.state.df.empty:
             messagebox.showwarning('Atenção', 'Faça a pré-visualização antes de enviar.')
             return
 
-        missing = [c for c in colunas_encerramento if c not in self.state.df.columns]
+        if politica_duplicados(self.cmb_duplicados.get() or None) != self.state.duplicados:
+            messagebox.showwarning(
+                'Atenção',
+                'A política de CNJs repetidos mudou depois da pré-visualização.\n'
+                'Refaça a pré-visualização antes de enviar.'
+            )
+            return
+
+        _ok, missing = validar_colunas_para_insercao(self.state.df)
         if missing:
             if not messagebox.askyesno(
                 'Colunas faltando',
@@ -1531,32 +1641,146 @@ class MigracoesApp(tk.Tk):
             ):
                 return
 
-        df = self.state.df.copy()
-        registros = montar_registros(df)
+        registros = montar_registros(self.state.df)
+        motor = self.cmb_motor.get() or None
+        commit = self.cmb_commit.get() or None
 
         self.pb['value'] = 0
         self.pb['maximum'] = len(registros)
         self.set_status('🟦 Enviando ao banco...')
 
-        def progress_cb(done, total):
-            self.pb['value'] = done
-            self.set_status(f'🟦 Inserindo... {done}/{total}')
+        canal = CanalProgresso(self, self._atualizar_progresso_envio)
+
+        path, sheet, empresa = self.state.path, self.state.sheet_name or 0, self.state.empresa
+        repetidos = self.state.duplicados
 
         def worker():
-            total = inserir_em_lotes(registros, lote=500, progress_cb=progress_cb)
-            self.after(0, lambda: (
-                self.set_status(f'🟢 Concluído. Inseridos {total} registros.'),
-                messagebox.showinfo('Finalizado', f'Inseridos {total} registros.')
-            ))
+            try:
+                diario = abrir_diario(path, sheet, empresa, total=len(registros), duplicados=repetidos)
+                total, duplicados = inserir_em_lotes(registros, progress_cb=canal.publicar, motor=motor,
+                                                     diario=diario, commit=commit)
+            except Exception as e:
+                canal.finalizar(lambda e=e: (
+                    self.set_status('🔴 Erro no envio.'),
+                    messagebox.showerror('Erro', f'Falha ao enviar a planilha:\n{e}')
+                ))
+                return
+            canal.finalizar(lambda: self._finish_send(total, duplicados))
+        canal.iniciar()
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _send_streaming(self):
+        """Lê a planilha em blocos e envia cada bloco assim que fica pronto."""
+        if not self.state.path:
+            messagebox.showwarning('Atenção', 'Selecione uma planilha primeiro.')
+            return
+        empresa = self.cmb_empresa.get()
+        if not empresa:
+            messagebox.showwarning('Atenção', 'Selecione a empresa para aplicar os presets.')
+            return
+        sheet = self.cmb_sheet.get() or 0
+        repetidos = politica_duplicados(self.cmb_duplicados.get() or None)
+        if repetidos not in POLITICAS_DUPLICADOS_STREAMING:
+            messagebox.showwarning(
+                'Política de repetidos',
+                f"No envio em blocos só é possível manter a primeira linha de cada CNJ ('primeira') "
+                f"ou todas ('manter'): um bloco já enviado não pode ser desfeito.\n\n"
+                f"Troque a política '{repetidos}' ou desmarque o envio em blocos."
+            )
+            return
+
+        # openpyxl em streaming mantém a memória constante (calamine leria a aba inteira)
+        leitor = LeitorEmBlocos(self.state.path, sheet, tamanho_bloco=5000, motor='openpyxl',
+                                cache=CACHE_PLANILHAS)
+        motor = self.cmb_motor.get() or None
+        commit = self.cmb_commit.get() or None
+        self.pb['value'] = 0
+        self.pb['maximum'] = 1
+        self.set_status('🟦 Enviando ao banco em blocos...')
+
+        canal = CanalProgresso(self, self._atualizar_progresso_envio)
+        blocos_rejeitados: List[RelatorioRejeicoes] = []
+
+        def progress_cb(done, lidos):
+            total = max(leitor.total_estimado or 0, lidos)
+            canal.publicar(lidos, total, f'{done} inseridos')
+
+        def worker():
+            try:
+                total, duplicados = inserir_em_streaming(
+                    registros_em_blocos(leitor, empresa, ao_rejeitar=blocos_rejeitados.append,
+                                        duplicados=repetidos),
+                    progress_cb=progress_cb, motor=motor,
+                    diario=abrir_diario(leitor.path, sheet, empresa, duplicados=repetidos), commit=commit
+                )
+            except Exception as e:
+                canal.finalizar(lambda e=e: (
+                    self.set_status('🔴 Erro no envio em blocos.'),
+                    messagebox.showerror('Erro', f'Falha ao ler/enviar a planilha:\n{e}')
+                ))
+                return
+            rejeitados = RelatorioRejeicoes.juntar(blocos_rejeitados)
+            canal.finalizar(lambda: self._finish_send(total, duplicados, rejeitados))
+        canal.iniciar()
         threading.Thread(target=worker, daemon=True).start()
 
+    def _finish_send(self, total: int, duplicados: List[str], rejeitados: Optional[RelatorioRejeicoes] = None):
+        msg = f'Inseridos {total} registros.'
+        if duplicados:
+            msg += f' {len(duplicados)} CNJ(s) já existiam e foram ignorados.'
+        self.set_status(f'🟢 Concluído. {msg}')
+        messagebox.showinfo('Finalizado', msg)
+        if rejeitados:
+            self._oferecer_relatorio_rejeicoes(rejeitados)
+
+    def on_close(self):
+        POOL_CONEXOES.fechar_todas()
+        self.destroy()
+
     # Util
     def set_status(self, text: str):
         self.lbl_status.configure(text=text)
 
+    def na_ui(self, fn):
+        """Agenda `fn` na thread do Tk. Pode ser chamado de qualquer thread."""
+        if threading.current_thread() is threading.main_thread():
+            fn()
+        else:
+            self._fila_ui.put(fn)
+
+    def _drenar_fila_ui(self):
+        while True:
+            try:
+                fn = self._fila_ui.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn()
+            except Exception as e:
+                messagebox.showerror('Erro', str(e))
+        self.after(50, self._drenar_fila_ui)
+
+    def _atualizar_progresso_envio(self, feito, total, taxa, eta, detalhe):
+        self.pb['maximum'] = max(total, 1)
+        self.pb['value'] = feito
+        self.set_status(
+            f'🟦 Inserindo... {feito}/{total} · {taxa:,.0f} linhas/s · ETA {formatar_eta(eta)}'
+            + (f' · {detalhe}' if detalhe else '')
+        )
+
+    def _atualizar_status_pool(self):
+        st = POOL_CONEXOES.estatisticas()
+        if st['criadas']:
+            self.lbl_pool.configure(
+                text=f"🔌 Pool: {st['em_uso']} em uso · {st['livres']} livre(s) · "
+                     f"{st['abertas']}/{st['maximo']} abertas · {st['reaproveitadas']} reuso(s)"
+            )
+        self.after(1000, self._atualizar_status_pool)
+
 # ==============================
 # Main
 # ==============================
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # a fila de importação usa processos (necessário no executável)
     app = MigracoesApp()
     app.mainloop()
@@ -0,0 +1,83 @@
+"""Benchmark da normalização/validação de CNJ: uma linha por vez em Python x vetorizada.
+
+Uso: python benchmarks/bench_cnj.py [linhas]
+"""
+from __future__ import annotations
+
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from comum import cronometrar
+
+import encerramento_core as app
+
+_CIENTIFICA = re.compile(r'\d+(?:\.\d+)?[eE]\+?\d+')
+_SEPARADORES = re.compile(r'[\s./-]')
+
+
+def normalizar_cnj_linha(valor):
+    """Implementação direta (uma célula por vez), mantida aqui como referência de resultado."""
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return None, app.MOTIVO_CNJ_VAZIO
+    texto = str(valor).strip()
+    if texto.lower() in ('', 'nan', 'none'):
+        return None, app.MOTIVO_CNJ_VAZIO
+    if _CIENTIFICA.fullmatch(texto):
+        return None, app.MOTIVO_CNJ_EXCEL
+    if texto.count('.') == 1 and texto.endswith('.0'):
+        texto = texto[:-2]
+    digitos = _SEPARADORES.sub('', texto)
+    if len(texto) > app.LARGURA_CNJ or not digitos.isascii() or not digitos.isdigit() or not 14 <= len(digitos) <= 20:
+        return None, app.MOTIVO_CNJ_FORMATO
+    d = digitos.zfill(20)
+    if 98 - int(d[:7] + d[9:] + '00') % 97 != int(d[7:9]):
+        return None, app.MOTIVO_CNJ_DIGITO
+    return f'{d[:7]}-{d[7:9]}.{d[9:13]}.{d[13]}.{d[14:16]}.{d[16:]}', None
+
+
+def gerar_cnjs(n: int) -> pd.Series:
+    """Mistura de formatos vista nas planilhas: máscara, só dígitos, float do Excel e lixo."""
+    rng = np.random.default_rng(7)
+    numeros = rng.integers(0, 10_000_000, n)
+    origens = rng.integers(0, 10_000, n)
+    valores = []
+    for i, (num, org) in enumerate(zip(numeros, origens)):
+        dd = 98 - int(f'{num:07d}2023805{org:04d}00') % 97
+        cnj = f'{num:07d}-{dd:02d}.2023.8.05.{org:04d}'
+        tipo = i % 20
+        if tipo == 0:
+            cnj = cnj.replace('-', '').replace('.', '')
+        elif tipo == 1:
+            cnj = f'{int(cnj.replace("-", "").replace(".", ""))}.0'
+        elif tipo == 2:
+            cnj = cnj[:8] + f'{(dd + 1) % 100:02d}' + cnj[10:]
+        elif tipo == 3:
+            cnj = f'{float(cnj.replace("-", "").replace(".", "")):.14e}'
+        elif tipo == 4:
+            cnj = ''
+        valores.append(cnj)
+    return pd.Series(valores, dtype='str')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    cnjs = gerar_cnjs(n)
+    print(f'{n} CNJs (máscara, só dígitos, float do Excel, dígito errado e vazios)')
+
+    t_linha, antigo = cronometrar(lambda: [normalizar_cnj_linha(v) for v in cnjs], repeticoes=1)
+    t_vetor, (canonico, motivo) = cronometrar(lambda: app.normalizar_cnjs(cnjs))
+
+    esperado_cnj, esperado_motivo = zip(*antigo)
+    assert list(canonico.astype(object).where(canonico.notna(), None)) == list(esperado_cnj), 'CNJs divergem'
+    assert list(motivo.astype(object).where(motivo.notna(), None)) == list(esperado_motivo), 'motivos divergem'
+    print(f'rejeitados: {motivo.notna().sum()} ({motivo.value_counts().to_dict()})')
+    print(f'linha a linha: {t_linha:8.3f}s  {n / t_linha:12,.0f} CNJs/s')
+    print(f'vetorizada:    {t_vetor:8.3f}s  {n / t_vetor:12,.0f} CNJs/s')
+    print(f'ganho:         {t_linha / t_vetor:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Benchmark da conversão de datas: inferência por célula (implementação antiga) x formato detectado.
+
+Uso: python benchmarks/bench_datas.py [linhas]
+"""
+from __future__ import annotations
+
+import sys
+
+import pandas as pd
+
+from comum import cronometrar, gerar_planilha_bruta
+
+import encerramento_core as app
+
+
+def parse_data_antigo(s: pd.Series) -> pd.Series:
+    """Versão original, mantida aqui apenas como referência de desempenho."""
+    s = pd.to_datetime(s, errors='coerce', dayfirst=True)
+    return s.dt.date
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    bruta = gerar_planilha_bruta(n)
+    colunas = ['Data da Fase', 'Data do Status', 'Data do Resultado']
+    print(f'{n} linhas x {len(colunas)} colunas de data (texto dd/mm/aaaa)')
+
+    t_antigo, antigo = cronometrar(lambda: [parse_data_antigo(bruta[c]) for c in colunas], repeticoes=1)
+    t_novo, novo = cronometrar(lambda: [app._parse_data_series(bruta[c])[0] for c in colunas])
+
+    for a, b in zip(antigo, novo):
+        assert a.astype(object).equals(b), 'as duas implementações divergem'
+    celulas = n * len(colunas)
+    print(f'inferência:        {t_antigo:8.3f}s  {celulas / t_antigo:12,.0f} células/s')
+    print(f'formato detectado: {t_novo:8.3f}s  {celulas / t_novo:12,.0f} células/s')
+    print(f'ganho:             {t_antigo / t_novo:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
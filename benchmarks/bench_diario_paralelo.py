@@ -0,0 +1,106 @@
+"""Benchmark do diário (DiarioEnvio) num envio com várias conexões: implementação antiga x mapa de bits.
+
+Repete, sem banco, as chamadas que `inserir_em_lotes` faz ao diário com `conexoes` > 1: os
+registros são divididos por `_particionar_por_cnj` e cada conexão confirma seus chunks com
+`registrar(pos[confirmadas:ate])`, o que deixa as posições intercaladas no diário. No meio do
+envio, uma "queda" e a retomada (`pendentes(0, n)`) de um diário novo lido do disco.
+
+Uso: python benchmarks/bench_diario_paralelo.py [linhas] [conexoes] [chunk]
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from comum import gerar_planilha_preparada
+
+import encerramento_core as app
+
+
+class DiarioAntigo:
+    """Versão original (lista de faixas, JSON inteiro regravado a cada chunk), só como referência."""
+
+    def __init__(self, chave: str, total: Optional[int] = None, pasta: Optional[Path] = None):
+        self.total = total
+        self.caminho = Path(pasta) / f'{chave}.json'
+        self.faixas: List[List[int]] = []
+        self._lock = threading.Lock()
+        if self.caminho.exists():
+            with open(self.caminho, encoding='utf-8') as f:
+                self.faixas = [list(f) for f in json.load(f).get('faixas', [])]
+
+    def _salvar(self):
+        tmp = self.caminho.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'total': self.total, 'faixas': self.faixas, 'atualizado': datetime.now().isoformat()}, f)
+        os.replace(tmp, self.caminho)
+
+    def ja_confirmado(self, posicao: int) -> bool:
+        return any(ini <= posicao < fim for ini, fim in self.faixas)
+
+    def pendentes(self, inicio: int, fim: int) -> List[int]:
+        return [p for p in range(inicio, fim) if not self.ja_confirmado(p)]
+
+    def registrar(self, posicoes: Iterable[int]):
+        novas = sorted(posicoes)
+        if not novas:
+            return
+        with self._lock:
+            faixas = self.faixas + [[p, p + 1] for p in novas]
+            faixas.sort()
+            unidas: List[List[int]] = []
+            for ini, fim in faixas:
+                if unidas and ini <= unidas[-1][1]:
+                    unidas[-1][1] = max(unidas[-1][1], fim)
+                else:
+                    unidas.append([ini, fim])
+            self.faixas = unidas
+            self._salvar()
+
+
+def simular_envio(classe, registros, conexoes: int, chunk: int, pasta: Path):
+    """Confirma a partição 0 inteira e metade das demais, "cai" e retoma com um diário relido do disco."""
+    n = len(registros)
+    particoes = app._particionar_por_cnj(registros, conexoes)
+    diario = classe('bench', total=n, pasta=pasta)
+    t0 = time.perf_counter()
+    # a partição 0 anda mais rápido que as demais: é o que mais fragmenta as faixas
+    for k, indices in enumerate(particoes):
+        ate_onde = len(indices) if k == 0 and len(particoes) > 1 else len(indices) // 2
+        for ini in range(0, ate_onde, chunk):
+            diario.registrar(indices[ini:min(ini + chunk, ate_onde)])
+    t_registrar = time.perf_counter() - t0
+    faixas = len(diario.faixas)
+
+    t0 = time.perf_counter()
+    retomado = classe('bench', total=n, pasta=pasta)
+    pendentes = retomado.pendentes(0, n)
+    t_retomada = time.perf_counter() - t0
+    return t_registrar, t_retomada, faixas, pendentes
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    conexoes = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    chunk = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    registros = app.montar_registros(gerar_planilha_preparada(n))
+    print(f'{n} registros, {conexoes} conexões, chunks de {chunk}')
+
+    resultados = {}
+    for nome, classe in (('antigo', DiarioAntigo), ('mapa de bits', app.DiarioEnvio)):
+        with tempfile.TemporaryDirectory() as pasta:
+            t_reg, t_ret, faixas, pendentes = simular_envio(classe, registros, conexoes, chunk, Path(pasta))
+        resultados[nome] = pendentes
+        print(f'{nome:13s} registrar: {t_reg:8.2f}s  retomada: {t_ret:8.2f}s  ({faixas} faixas no diário)')
+    assert resultados['antigo'] == resultados['mapa de bits'], 'as duas implementações divergem'
+
+
+if __name__ == '__main__':
+    main()
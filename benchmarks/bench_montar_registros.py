@@ -0,0 +1,49 @@
+"""Benchmark de montar_registros: iterrows (implementação antiga) x coluna a coluna.
+
+Uso: python benchmarks/bench_montar_registros.py [linhas]
+"""
+from __future__ import annotations
+
+import sys
+from typing import List, Tuple
+
+import pandas as pd
+
+from comum import cronometrar, gerar_planilha_preparada
+
+import encerramento_core as app
+
+
+def montar_registros_iterrows(df: pd.DataFrame) -> List[Tuple]:
+    """Versão original, mantida aqui apenas como referência de desempenho."""
+    registros: List[Tuple] = []
+    for _, row in df.iterrows():
+        vals: List[object] = []
+        for coluna in app.colunas_encerramento:
+            v = row.get(coluna, None)
+            if pd.isna(v):
+                vals.append(None)
+            else:
+                vals.append(v)
+        registros.append(tuple(vals))
+    return registros
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 80_000
+    df = gerar_planilha_preparada(n)
+    print(f'{n} linhas x {len(app.colunas_encerramento)} colunas')
+
+    # a versão antiga não conhece as constantes do preset: recebe o DataFrame já expandido
+    completo = app.expandir_constantes(df)
+    t_antigo, antigo = cronometrar(lambda: montar_registros_iterrows(completo), repeticoes=1)
+    t_novo, novo = cronometrar(lambda: app.montar_registros(df))
+
+    assert antigo == novo, 'as duas implementações divergem'
+    print(f'iterrows:         {t_antigo:8.3f}s  {n / t_antigo:12,.0f} linhas/s')
+    print(f'coluna a coluna:  {t_novo:8.3f}s  {n / t_novo:12,.0f} linhas/s')
+    print(f'ganho:            {t_antigo / t_novo:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark das políticas de commit do envio: por chunk x a cada N linhas x uma transação só.
+
+Precisa do MySQL configurado no .env (mesmo do aplicativo) e de permissão de CREATE/DROP:
+os registros vão para uma tabela de rascunho `encerramento_bench` (cópia da estrutura de
+`encerramento`, via TABELA_DESTINO), apagada no fim. Nada é gravado na tabela real.
+Os COMMITs contados são os de `_ControleCommit.commits`.
+
+Uso: python benchmarks/bench_politica_commit.py [linhas] [lote]
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+from comum import gerar_planilha_preparada
+
+import encerramento_core as app
+
+TABELA = 'encerramento_bench'
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    lote = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    registros = app.montar_registros(gerar_planilha_preparada(n))
+
+    conn, cur = app.conectar_ao_mysql()
+    if not conn:
+        print('Sem conexão com o MySQL (.env); benchmark não executado.')
+        sys.exit(1)
+
+    cur.execute(f'DROP TABLE IF EXISTS {TABELA}')
+    cur.execute(f'CREATE TABLE {TABELA} LIKE encerramento')
+    tabela_original, app.TABELA_DESTINO = app.TABELA_DESTINO, TABELA
+
+    cenarios = [
+        ('chunk', app.PoliticaCommit('chunk')),
+        ('grupo 5.000', app.PoliticaCommit('grupo', linhas=5_000, segundos=60)),
+        ('grupo 20.000', app.PoliticaCommit('grupo', linhas=20_000, segundos=60)),
+        ('lote', app.PoliticaCommit('lote')),
+    ]
+    print(f'{n} linhas, chunks de {lote}')
+    try:
+        for nome, politica in cenarios:
+            cur.execute(f'TRUNCATE TABLE {TABELA}')
+            controle = app._ControleCommit(politica)
+            t0 = time.perf_counter()
+            inseridos, cur, _ = app._gravar_com_retentativas(conn, cur, registros, lote, 'executemany',
+                                                             controle=controle)
+            segundos = time.perf_counter() - t0
+            print(f'{nome:14s} {segundos:8.2f}s  {inseridos / segundos:10,.0f} linhas/s  {controle.commits:5d} COMMITs')
+    finally:
+        app.TABELA_DESTINO = tabela_original
+        cur.execute(f'DROP TABLE IF EXISTS {TABELA}')
+        cur.close()
+        conn.close()
+        app.POOL_CONEXOES.fechar_todas()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Utilitários compartilhados pelos benchmarks (dados sintéticos e cronômetro)."""
+from __future__ import annotations
+
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+
+def gerar_planilha_bruta(n: int, semente: int = 42) -> pd.DataFrame:
+    """DataFrame com os cabeçalhos originais da planilha de encerramento (antes do RENAME_MAP)."""
+    rng = np.random.default_rng(semente)
+    base = date(2020, 1, 1)
+    datas = [(base + timedelta(days=int(d))).strftime('%d/%m/%Y') for d in rng.integers(0, 1800, n)]
+    # dígito verificador de verdade (módulo 97): CNJs inválidos seriam rejeitados na preparação
+    cnjs = [f'{i:07d}-{98 - int(f"{i:07d}2023805{i % 10000:04d}00") % 97:02d}.2023.8.05.{i % 10000:04d}'
+            for i in range(n)]
+    df = pd.DataFrame({
+        'Nº do Processo CNJ': cnjs,
+        'Cliente': rng.choice(['STONE', 'AMBEV', 'ANCAR', 'CAGECE'], n),
+        'Valor da Causa': rng.uniform(0, 1e6, n).round(2),
+        'Valor Final da Causa': rng.uniform(0, 1e6, n).round(2),
+        'Data da Fase': datas,
+        'Fase': rng.choice(['Conhecimento', 'Recursal', 'Execução', 'Arquivado'], n),
+        'Data do Status': datas,
+        'Status': rng.choice(['Ativo', 'Encerrado', 'Suspenso'], n),
+        'Data do Resultado': datas,
+        'Tipo de Resultado': rng.choice(['Acordo', 'Procedente', 'Improcedente', None], n),
+        'Parecer do Processo': rng.choice(['Favorável', 'Desfavorável', 'Neutro'], n),
+    })
+    # alguns vazios, como nas planilhas reais
+    df.loc[df.sample(frac=0.05, random_state=semente).index, 'Valor Final da Causa'] = np.nan
+    df.loc[df.sample(frac=0.05, random_state=semente + 1).index, 'Data do Resultado'] = None
+    return df
+
+
+def gerar_planilha_preparada(n: int, empresa: str = 'STONE MIDDLE', semente: int = 42) -> pd.DataFrame:
+    """DataFrame no formato de `AppState.df` após a pré-visualização."""
+    import encerramento_core as app
+
+    return app.preparar_planilha(gerar_planilha_bruta(n, semente), empresa)
+
+
+def cronometrar(fn: Callable[[], object], repeticoes: int = 3) -> Tuple[float, object]:
+    """Melhor tempo (s) de `repeticoes` execuções e o resultado da última."""
+    melhor = float('inf')
+    resultado = None
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        resultado = fn()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor, resultado
@@ -0,0 +1,338 @@
+"""Importador de encerramentos em linha de comando (sem interface gráfica).
+
+Usa o mesmo pipeline da janela (RENAME_MAP, presets, formatação, montar_registros,
+inserir_em_lotes) sem importar o tkinter, para rodar em servidor/agendador.
+
+Uso:
+    python encerramento_cli.py import --file planilha.xlsx --sheet Plan1 --empresa "STONE MIDDLE"
+    python encerramento_cli.py batch --job "a.xlsx;STONE MIDDLE" --job "b.xlsx;ANCAR;Plan1"
+    python encerramento_cli.py watch --pasta D:/entrada/encerramentos
+    python encerramento_cli.py export --cod-lote 3 --saida lote3.parquet --colunas cnj,status,data_status
+    python encerramento_cli.py export --de 01/09/2025 --ate 30/09/2025 --formato csv --zip --saida setembro.zip
+
+Códigos de saída: 0 = ok, 1 = falha na leitura ou no banco, 2 = argumentos inválidos.
+"""
+from __future__ import annotations
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+
+import pandas as pd
+
+import encerramento_core as core
+
+SAIDA_OK = 0
+SAIDA_FALHA = 1
+SAIDA_USO = 2
+
+
+def resolver_empresa(nome: str) -> Optional[str]:
+    """Acha a chave de COMPANY_PRESETS ignorando espaços nas pontas e maiúsculas/minúsculas."""
+    if nome in core.COMPANY_PRESETS:
+        return nome
+    alvo = nome.strip().casefold()
+    for chave in core.COMPANY_PRESETS:
+        if chave.strip().casefold() == alvo:
+            return chave
+    return None
+
+
+class RelatorioProgresso:
+    """Imprime o progresso no stderr no máximo a cada `intervalo` segundos."""
+
+    def __init__(self, intervalo: float = 2.0):
+        self.intervalo = intervalo
+        self.inicio = time.monotonic()
+        self._ultimo = 0.0
+
+    def __call__(self, feito: int, total: int):
+        agora = time.monotonic()
+        if agora - self._ultimo < self.intervalo and feito < total:
+            return
+        self._ultimo = agora
+        decorrido = max(agora - self.inicio, 1e-9)
+        print(f'  {feito}/{total} linhas · {feito / decorrido:,.0f} linhas/s', file=sys.stderr)
+
+
+def cmd_import(args) -> int:
+    empresa = resolver_empresa(args.empresa)
+    if empresa is None:
+        print(f'Empresa desconhecida: {args.empresa!r}. Use o comando "empresas" para listar.', file=sys.stderr)
+        return SAIDA_USO
+
+    erros: List[str] = []
+
+    def notificar(titulo, mensagem):
+        erros.append(titulo)
+        print(f'ERRO [{titulo}] {mensagem}', file=sys.stderr)
+
+    core.definir_notificador_erro(notificar)
+    sheet = args.sheet if args.sheet is not None else 0
+    if args.streaming and core.politica_duplicados(args.duplicados) not in core.POLITICAS_DUPLICADOS_STREAMING:
+        print(f'--streaming só aceita --duplicados {" ou ".join(core.POLITICAS_DUPLICADOS_STREAMING)} '
+              f'(um bloco já enviado não pode ser desfeito); recebido: {core.politica_duplicados(args.duplicados)}.',
+              file=sys.stderr)
+        return SAIDA_USO
+
+    t0 = time.perf_counter()
+    try:
+        if args.streaming:
+            leitor = core.LeitorEmBlocos(args.file, sheet, tamanho_bloco=args.bloco, motor='openpyxl',
+                                         cache=core.CACHE_PLANILHAS)
+            progresso = RelatorioProgresso()
+            lidas = [0]
+            blocos_rejeitados: List[core.RelatorioRejeicoes] = []
+
+            def progress_cb(feito, lidos):
+                lidas[0] = lidos
+                progresso(feito, max(leitor.total_estimado or 0, lidos))
+
+            total, duplicados = core.inserir_em_streaming(
+                core.registros_em_blocos(leitor, empresa, ao_rejeitar=blocos_rejeitados.append,
+                                         duplicados=args.duplicados), lote=args.lote,
+                progress_cb=progress_cb, motor=args.motor, commit=args.commit,
+                diario=core.abrir_diario(args.file, sheet, empresa, duplicados=args.duplicados)
+            )
+            n_lidas = lidas[0]
+            t_leitura = None
+            rejeitados = core.RelatorioRejeicoes.juntar(blocos_rejeitados)
+        else:
+            leitor = core.LeitorEmBlocos(args.file, sheet, tamanho_bloco=args.bloco, cache=core.CACHE_PLANILHAS)
+            blocos = list(leitor)
+            df = pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame()
+            del blocos
+            if leitor.motor != 'cache':
+                core.CACHE_PLANILHAS.guardar(args.file, sheet, leitor.colunas, df)
+            df = core.preparar_planilha(df, empresa, duplicados=args.duplicados)
+            for coluna, n in df.attrs.get('datas_invalidas', {}).items():
+                print(f'AVISO: {n} data(s) não reconhecida(s) em {coluna} (irão como NULL).', file=sys.stderr)
+            rejeitados = core.RelatorioRejeicoes.juntar(
+                r for r in (df.attrs.get('cnjs_rejeitados'), df.attrs.get('cnjs_repetidos')) if r is not None)
+            registros = core.montar_registros(df)
+            n_lidas = len(registros)
+            t_leitura = time.perf_counter() - t0
+            print(f'Planilha lida: {n_lidas} linhas em {t_leitura:.1f}s (leitor {leitor.motor}).', file=sys.stderr)
+            total, duplicados = core.inserir_em_lotes(
+                registros, lote=args.lote, progress_cb=RelatorioProgresso(), motor=args.motor, commit=args.commit,
+                conexoes=args.conexoes,
+                diario=core.abrir_diario(args.file, sheet, empresa, total=n_lidas, duplicados=args.duplicados)
+            )
+    except Exception as e:
+        print(f'ERRO ao ler/enviar a planilha: {e}', file=sys.stderr)
+        return SAIDA_FALHA
+    finally:
+        core.POOL_CONEXOES.fechar_todas()
+
+    for motivo, n in rejeitados.por_motivo().items():
+        print(f'AVISO: {n} linha(s) retirada(s) do envio: {motivo}.', file=sys.stderr)
+    if args.rejeitados and len(rejeitados):
+        try:
+            rejeitados.salvar(args.rejeitados)
+            print(f'Relatório de rejeitadas gravado em {args.rejeitados}', file=sys.stderr)
+        except OSError as e:
+            print(f'ERRO ao gravar {args.rejeitados}: {e}', file=sys.stderr)
+
+    decorrido = time.perf_counter() - t0
+    print(f'Empresa:      {empresa.strip()}')
+    print(f'Linhas lidas: {n_lidas}')
+    print(f'Rejeitadas:   {len(rejeitados)}')
+    print(f'Inseridas:    {total}')
+    print(f'Duplicadas:   {len(duplicados)}')
+    print(f'Tempo total:  {decorrido:.1f}s ({n_lidas / decorrido if decorrido else 0:,.0f} linhas/s)')
+    if t_leitura is not None:
+        envio = decorrido - t_leitura
+        print(f'Envio:        {envio:.1f}s ({total / envio if envio else 0:,.0f} linhas/s)')
+    return SAIDA_FALHA if erros else SAIDA_OK
+
+
+def cmd_batch(args) -> int:
+    fila = core.FilaImportacao(processos=args.processos, conexoes=args.conexoes, lote=args.lote, motor=args.motor,
+                               commit=args.commit, duplicados=args.duplicados)
+    for job in args.job:
+        partes = [p.strip() for p in job.split(';')]
+        if len(partes) not in (2, 3) or not partes[0]:
+            print(f'--job inválido: {job!r} (use "arquivo;empresa[;aba]")', file=sys.stderr)
+            return SAIDA_USO
+        empresa = resolver_empresa(partes[1])
+        if empresa is None:
+            print(f'Empresa desconhecida em --job {job!r}.', file=sys.stderr)
+            return SAIDA_USO
+        fila.adicionar(partes[0], empresa, partes[2] if len(partes) == 3 and partes[2] else 0)
+
+    ultimo = [0.0]
+
+    def ao_atualizar(_tarefa):
+        agora = time.monotonic()
+        if agora - ultimo[0] >= 2.0:
+            ultimo[0] = agora
+            andamento = ', '.join(f'{t.estado}:{t.inseridas}' for t in fila.tarefas)
+            print(f'  [{andamento}] {fila.linhas_por_segundo:,.0f} linhas/s', file=sys.stderr)
+
+    fila.ao_atualizar = ao_atualizar
+    try:
+        fila.executar()
+    finally:
+        core.POOL_CONEXOES.fechar_todas()
+    print(fila.resumo())
+    return SAIDA_FALHA if any(t.estado == 'falhou' for t in fila.tarefas) else SAIDA_OK
+
+
+def cmd_watch(args) -> int:
+    def ao_terminar(tarefa):
+        nome = os.path.basename(tarefa.path)
+        if tarefa.estado == 'concluida':
+            print(f'{nome}: {tarefa.inseridas} inseridos, {len(tarefa.duplicados)} duplicados '
+                  f'({tarefa.segundos:.1f}s)', flush=True)
+        else:
+            print(f'{nome}: FALHOU – {tarefa.erro}', flush=True)
+
+    monitor = core.MonitorPasta(args.pasta, processos=args.processos, conexoes=args.conexoes, lote=args.lote,
+                                motor=args.motor, intervalo=args.intervalo, estabilidade=args.estabilidade,
+                                ao_terminar=ao_terminar, commit=args.commit, duplicados=args.duplicados)
+    def parar(*_):
+        print('Parando: aguardando as importações em andamento...', file=sys.stderr)
+        monitor.parar()
+
+    signal.signal(signal.SIGINT, parar)
+    signal.signal(signal.SIGTERM, parar)
+    print(f'Vigiando {monitor.pasta} (Ctrl+C para parar)...', file=sys.stderr)
+    try:
+        monitor.executar()
+    finally:
+        core.POOL_CONEXOES.fechar_todas()
+    return SAIDA_OK
+
+
+def _data_br(texto: str):
+    try:
+        return datetime.strptime(texto, '%d/%m/%Y').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'data inválida: {texto!r} (use dd/mm/aaaa)')
+
+
+def cmd_export(args) -> int:
+    colunas = [c.strip() for c in args.colunas.split(',') if c.strip()] if args.colunas else None
+    if (args.de is None) != (args.ate is None):
+        print('Use --de e --ate juntos.', file=sys.stderr)
+        return SAIDA_USO
+    try:
+        lotes = list(args.cod_lote or [])
+        if args.de is not None:
+            lotes += core.listar_lotes_por_periodo(args.de, args.ate)
+        if not lotes:
+            print('Nenhum cod_lote para exportar (use --cod-lote ou --de/--ate).', file=sys.stderr)
+            return SAIDA_USO
+
+        if len(lotes) == 1 and not args.zip and not os.path.isdir(args.saida):
+            linhas = core.exportar_lote(lotes[0], args.saida, formato=args.formato, colunas=colunas,
+                                        progress_cb=RelatorioProgresso())
+            print(f'{linhas} linha(s) do cod_lote {lotes[0]} gravadas em {args.saida}')
+            return SAIDA_OK
+
+        progresso = RelatorioProgresso()
+        resultados = core.exportar_lotes(lotes, args.saida, formato=args.formato or 'xlsx', colunas=colunas,
+                                         zip_unico=args.zip, paralelos=args.paralelos,
+                                         progress_cb=lambda feitas, total, _detalhe: progresso(feitas, total))
+    except Exception as e:
+        print(f'ERRO ao exportar: {e}', file=sys.stderr)
+        return SAIDA_FALHA
+    finally:
+        core.POOL_CONEXOES.fechar_todas()
+
+    for r in resultados:
+        situacao = f'FALHOU – {r.erro}' if r.erro else f'{r.linhas} linha(s) -> {r.arquivo}'
+        print(f'{r.cod_lote}: {situacao}')
+    return SAIDA_FALHA if any(r.erro for r in resultados) else SAIDA_OK
+
+
+def cmd_empresas(_args) -> int:
+    for chave in core.COMPANY_PRESETS:
+        print(chave.strip())
+    return SAIDA_OK
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='encerramento', description='Importador de encerramentos (linha de comando).')
+    parser.add_argument('-v', '--verbose', action='store_true', help='mostra o log detalhado')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_imp = sub.add_parser('import', help='importa uma planilha para a tabela encerramento')
+    p_imp.add_argument('--file', required=True, help='caminho da planilha (.xlsx/.xls)')
+    p_imp.add_argument('--sheet', help='nome da aba (padrão: primeira)')
+    p_imp.add_argument('--empresa', required=True, help='chave de COMPANY_PRESETS')
+    p_imp.add_argument('--motor', choices=list(core.MOTORES_INSERCAO), help='motor de inserção (padrão: DB_INSERT_ENGINE)')
+    p_imp.add_argument('--lote', type=int, help='linhas por INSERT (padrão: ajuste automático)')
+    p_imp.add_argument('--commit', choices=list(core.POLITICAS_COMMIT),
+                       help='quando confirmar: chunk, grupo ou lote (padrão: DB_COMMIT_POLICY)')
+    p_imp.add_argument('--conexoes', type=int,
+                       help='conexões enviando em paralelo (padrão: DB_INSERT_CONNECTIONS; ignorado com --streaming)')
+    p_imp.add_argument('--bloco', type=int, default=5000, help='linhas por bloco de leitura (padrão: 5000)')
+    p_imp.add_argument('--streaming', action='store_true', help='lê e envia em blocos, com memória constante')
+    p_imp.add_argument('--duplicados', choices=list(core.POLITICAS_DUPLICADOS),
+                       help='CNJ repetido na planilha (padrão: CNJ_DUPLICADOS do ambiente ou primeira)')
+    p_imp.add_argument('--rejeitados', help='grava as linhas retiradas (CNJ inválido ou repetido) neste .csv/.xlsx')
+    p_imp.set_defaults(func=cmd_import)
+
+    p_bat = sub.add_parser('batch', help='importa vários arquivos em paralelo')
+    p_bat.add_argument('--job', action='append', required=True,
+                       help='"arquivo;empresa[;aba]" (repita para cada arquivo)')
+    p_bat.add_argument('--processos', type=int, default=2, help='processos de leitura (padrão: 2)')
+    p_bat.add_argument('--conexoes', type=int, default=3, help='envios simultâneos (padrão: 3)')
+    p_bat.add_argument('--motor', choices=list(core.MOTORES_INSERCAO), help='motor de inserção (padrão: DB_INSERT_ENGINE)')
+    p_bat.add_argument('--lote', type=int, help='linhas por INSERT (padrão: ajuste automático)')
+    p_bat.add_argument('--commit', choices=list(core.POLITICAS_COMMIT),
+                       help='quando confirmar: chunk, grupo ou lote (padrão: DB_COMMIT_POLICY)')
+    p_bat.add_argument('--duplicados', choices=list(core.POLITICAS_DUPLICADOS),
+                       help='CNJ repetido na planilha (padrão: CNJ_DUPLICADOS do ambiente ou primeira)')
+    p_bat.set_defaults(func=cmd_batch)
+
+    p_wat = sub.add_parser('watch', help='vigia uma pasta e importa cada planilha nova automaticamente')
+    p_wat.add_argument('--pasta', required=True, help='pasta de entrada (cria concluidos/, falhas/, processando/)')
+    p_wat.add_argument('--processos', type=int, default=2, help='processos de leitura (padrão: 2)')
+    p_wat.add_argument('--conexoes', type=int, default=3, help='envios simultâneos (padrão: 3)')
+    p_wat.add_argument('--motor', choices=list(core.MOTORES_INSERCAO), help='motor de inserção (padrão: DB_INSERT_ENGINE)')
+    p_wat.add_argument('--lote', type=int, help='linhas por INSERT (padrão: ajuste automático)')
+    p_wat.add_argument('--commit', choices=list(core.POLITICAS_COMMIT),
+                       help='quando confirmar: chunk, grupo ou lote (padrão: DB_COMMIT_POLICY)')
+    p_wat.add_argument('--duplicados', choices=list(core.POLITICAS_DUPLICADOS),
+                       help='CNJ repetido na planilha (padrão: CNJ_DUPLICADOS do ambiente ou primeira)')
+    p_wat.add_argument('--intervalo', type=float, default=5.0, help='segundos entre varreduras (padrão: 5)')
+    p_wat.add_argument('--estabilidade', type=float, default=10.0,
+                       help='segundos sem mudança antes de pegar um arquivo (padrão: 10)')
+    p_wat.set_defaults(func=cmd_watch)
+
+    p_exp = sub.add_parser('export', help='exporta as linhas de um ou mais cod_lote (xlsx, csv ou parquet)')
+    p_exp.add_argument('--cod-lote', action='append', help='cod_lote a exportar (repita para vários)')
+    p_exp.add_argument('--de', type=_data_br, help='inclui os lotes com data_exportacao a partir de dd/mm/aaaa')
+    p_exp.add_argument('--ate', type=_data_br, help='... até dd/mm/aaaa (inclusive)')
+    p_exp.add_argument('--saida', required=True,
+                       help='arquivo (um lote), pasta (um arquivo por lote) ou .zip com --zip')
+    p_exp.add_argument('--formato', choices=list(core.FORMATOS_EXPORTACAO), help='padrão: pela extensão de --saida (xlsx para vários lotes)')
+    p_exp.add_argument('--colunas', help='colunas separadas por vírgula (padrão: todas)')
+    p_exp.add_argument('--zip', action='store_true', help='um único .zip particionado por cod_lote')
+    p_exp.add_argument('--paralelos', type=int, help='lotes exportados ao mesmo tempo (padrão: metade do pool)')
+    p_exp.set_defaults(func=cmd_export)
+
+    p_emp = sub.add_parser('empresas', help='lista as empresas (presets) disponíveis')
+    p_emp.set_defaults(func=cmd_empresas)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = criar_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s %(levelname)s %(message)s',
+    )
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    sys.exit(main())
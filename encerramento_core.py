@@ -0,0 +1,3553 @@
+"""Núcleo do importador de encerramentos: configuração, banco e pipeline da planilha.
+
+Não depende do tkinter, para ser usado tanto pela janela (EncerramentoExecutavel2.py)
+quanto pela linha de comando (encerramento_cli.py).
+"""
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unicodedata
+import warnings
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import repeat
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+import mysql.connector
+
+from pathlib import Path
+import sys
+
+log = logging.getLogger('encerramento')
+
+LAST_ENV_PATH = None  # para debug
+
+# =========================
+# Config & Banco
+# =========================
+def carregar_variaveis_ambiente():
+    global LAST_ENV_PATH
+    load_dotenv(override=False)
+
+    paths: List[Path] = []
+    try:
+        if getattr(sys, 'frozen', False):
+            base_dir = Path(sys.executable).parent
+            meipass = Path(getattr(sys, '_MEIPASS', base_dir))
+            paths += [base_dir / '.env', meipass / '.env']
+        else:
+            base_dir = Path(__file__).parent
+            paths += [base_dir / '.env']
+    except Exception:
+        pass
+
+    paths.append(Path.cwd() / '.env')
+
+    for p in paths:
+        if p.exists():
+            load_dotenv(dotenv_path=p, override=True)
+            LAST_ENV_PATH = str(p)
+            break
+
+def obter_config_banco() -> dict:
+    carregar_variaveis_ambiente()
+    cfg = {
+        'host': os.getenv('DB_HOST', ''),
+        'user': os.getenv('DB_USER', ''),
+        'password': os.getenv('DB_PASSWORD', ''),
+        'database': os.getenv('DB_DATABASE', ''),
+        'port': int(os.getenv('DB_PORT', '3306')),
+        'timeout': int(os.getenv('DB_TIMEOUT', '15')),
+        'pool_tamanho': int(os.getenv('DB_POOL_SIZE', '5')),
+        'pool_ocioso': int(os.getenv('DB_POOL_IDLE', '300')),
+        'pool_ping': int(os.getenv('DB_POOL_PING', '10')),
+        'pool_espera': int(os.getenv('DB_POOL_WAIT', '30')),
+        'motor_insercao': os.getenv('DB_INSERT_ENGINE', 'executemany').strip().lower() or 'executemany',
+        'local_infile': os.getenv('DB_LOCAL_INFILE', '1').strip().lower() not in ('0', 'false', 'nao', 'não', 'no'),
+        'politica_commit': os.getenv('DB_COMMIT_POLICY', 'chunk').strip().lower() or 'chunk',
+        'commit_linhas': int(os.getenv('DB_COMMIT_ROWS', '50000')),
+        'commit_segundos': float(os.getenv('DB_COMMIT_SECONDS', '5')),
+        'conexoes_envio': int(os.getenv('DB_INSERT_CONNECTIONS', '1')),
+    }
+
+    auth_plugin = os.getenv('DB_AUTH_PLUGIN', '').strip()
+    if auth_plugin:
+        cfg['auth_plugin'] = auth_plugin
+    ssl_ca = os.getenv('DB_SSL_CA', '').strip()
+    ssl_cert = os.getenv('DB_SSL_CERT', '').strip()
+    ssl_key = os.getenv('DB_SSL_KEY', '').strip()
+    if ssl_ca:
+        cfg['ssl_ca'] = ssl_ca
+    if ssl_cert:
+        cfg['ssl_cert'] = ssl_cert
+    if ssl_key:
+        cfg['ssl_key'] = ssl_key
+    return cfg
+
+colunas_encerramento = [
+    'cnj',
+    'valor_causa', 'valor_final_causa',
+    'data_fase', 'fase',
+    'data_status', 'status',
+    'data_resultado', 'tipo_resultado',
+    'parecer_processo',
+    'verificado_encerramento',
+    'encerramento_exportado',
+    'cod_lote', 'cod_usuario_exportador',
+    'carteira', 'cliente',
+    'cod_status', 'cod_fase',
+    'justificativa',
+    'cod_usuario_encerrador',
+    'cod_usuario_envio',
+    'data_exportacao',
+    'dataEnvio',
+    'data_submit',
+    'dataAtualizacao', 'codUsuarioAtualizacao',
+    'codMotivo', 'motivo',
+    'encerrado', 'exportado',
+]
+
+RENAME_MAP = {
+    'Nº do Processo CNJ': 'cnj',
+    'Cliente': 'cliente',
+    'Valor da Causa': 'valor_causa',
+    'Valor Final da Causa': 'valor_final_causa',
+    'Data da Fase': 'data_fase',
+    'Fase': 'fase',
+    'Data do Status': 'data_status',
+    'Status': 'status',
+    'Data do Resultado': 'data_resultado',
+    'Tipo de Resultado': 'tipo_resultado',
+    'Parecer do Processo': 'parecer_processo',
+}
+
+TODAY_STR = datetime.now().strftime('%d/%m/%Y')
+COMPANY_PRESETS: Dict[str, Dict[str, object]] = {
+    'STONE MIDDLE': {
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'STONE MIDDLE {TODAY_STR}',
+        'carteira': '58',
+    },
+    'STONE PASSIVO': {
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'STONE PASSIVO {TODAY_STR}',
+        'carteira': '49',
+    },
+    'AMBEV CIVEL':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'AMBEV CIVEL {TODAY_STR}',
+        'carteira': '1',
+    },
+    'AMBEV TRABALHISTA':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'AMBEV TRABALHISTA {TODAY_STR}',
+        'carteira': '36',
+    },
+    'ANCAR':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'ANCAR {TODAY_STR}',
+        'carteira': '3',
+    },
+    'ATIVOS':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'ATIVOS {TODAY_STR}',
+        'carteira': '44',
+    },
+    'BRE - TRAB GERAL':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'BRE - TRAB GERAL {TODAY_STR}',
+        'carteira': '33',
+    },
+    'BRE - CIVEL GERAL':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'BRE - CIVEL GERAL {TODAY_STR}',
+        'carteira': '33',
+    },
+
+    'CB - TRAB':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'CB - TRAB {TODAY_STR}',
+        'carteira': '33',
+    },
+
+    'CB - CIVEL':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'CB - CIVEL {TODAY_STR}',
+        'carteira': '33',
+    },
+
+    'IMC - TRAB':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'IMC - TRAB {TODAY_STR}',
+        'carteira': '33',
+    },
+
+    'IMC - CIVEL':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'IMC - CIVEL {TODAY_STR}',
+        'carteira': '33',
+    },
+
+    'CAGECE':{
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'CAGECE {TODAY_STR}',
+        'carteira': '6',
+    },
+
+
+    'CIVEL':{
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'CIVEL {TODAY_STR}',
+            'carteira': '42',
+    },
+
+    'CIVEL -  CACAU SHOW':{
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'CIVEL -  CACAU SHOW {TODAY_STR}',
+            'carteira': '42',
+    },
+
+    'COBRANÇA JUDICIAL': {
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'COBRANÇA JUDICIAL {TODAY_STR}',
+        'carteira': '41',
+    },
+
+    'CONTRATOS': {
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'CONTRATOS  {TODAY_STR}',
+        'carteira': '51',
+    },
+
+    'DIREITO MUNICIPAL': {
+        'dataEnvio': TODAY_STR,
+        'cod_usuario_envio': '222',
+        'cod_lote': f'DIREITO MUNICIPAL  {TODAY_STR}',
+        'carteira': '54',
+    },
+
+    'DIREITO PENAL': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'DIREITO PENAL  {TODAY_STR}',
+            'carteira': '56',
+        },
+
+    'DIREITO TRIBUTARIO': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'DIREITO TRIBUTARIO  {TODAY_STR}',
+            'carteira': '46',
+    },
+
+    'EDUCACIONAL - CIVEL': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'EDUCACIONAL - CIVEL  {TODAY_STR}',
+            'carteira': '39',
+    },
+
+    'EDUCACIONAL - TRAB': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'EDUCACIONAL - TRAB  {TODAY_STR}',
+            'carteira': '39',
+    },
+
+   'EGP': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'EGP  {TODAY_STR}',
+            'carteira': '108',
+    },
+
+    'ENEL RJ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'ENEL RJ  {TODAY_STR}',
+            'carteira': '101',
+    },
+
+    'ESTRATEGICOS': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'ESTRATEGICOS  {TODAY_STR}',
+            'carteira': '45',
+    },
+
+    'IMOBILIARIO - CONTENCIOSO ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'IMOBILIARIO CONTENCIOSO {TODAY_STR}',
+            'carteira': '43',
+    },
+
+    'TLSA - IMOBILIARIO': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'TLSA - IMOBILIARIO{TODAY_STR}',
+            'carteira': '112',
+    },
+
+
+'ISGH - CIVEL': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'ISGH -CIVEL{TODAY_STR}',
+            'carteira': '38',
+    },
+
+'ISGH - TRABALHISTA': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'ISGH - TRABALHISTA {TODAY_STR}',
+            'carteira': '47',
+    },
+
+'LICITAÇÕES': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'LICITAÇÕES {TODAY_STR}',
+            'carteira': '53',
+    },
+
+'MOVIDA PASSIVO': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'MOVIDA PASSIVO {TODAY_STR}',
+            'carteira': '62',
+    },
+
+'NOTREDAME - CIVEL': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'NOTREDAME CIVEL {TODAY_STR}',
+            'carteira': '21',
+    },
+'NOTREDAME - ESTRATEGICO': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'NOTREDAME ESTRATEGICO{TODAY_STR}',
+            'carteira': '52',
+    },
+'NOTREDAME - TRABALHISTA ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'NOTREDAME TRABALHISTA{TODAY_STR}',
+            'carteira': '48',
+    },
+'DEXCO':{
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'DEXCO {TODAY_STR}',
+            'carteira': '48',
+},
+
+'ORIGINAL ATIVO':{
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'ORIGINAL ATIVO {TODAY_STR}',
+            'carteira': '61',
+},
+
+'ORIGINAL PASSIVO ':{
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'ORIGINAL PASSIVO {TODAY_STR}',
+            'carteira': '60',
+},
+
+'PAGUE MENOS - CIVEL ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'PAGUE MENOS CIVEL{TODAY_STR}',
+            'carteira': '29',
+    },
+
+'PAGUE MENOS - TRABALHISTA ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'PAGUE MENOS - TRABALHISTA{TODAY_STR}',
+            'carteira': '35',
+    },
+
+'PICPAY PASSIVO  ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'PICPAY PASSIVO{TODAY_STR}',
+            'carteira': '63',
+    },
+
+'PICPAY ATIVO  ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'PICPAY ATIVO{TODAY_STR}',
+            'carteira': '66',
+    },
+
+'PORTO SEGURO ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'PORTO SEGURO{TODAY_STR}',
+            'carteira': '27',
+    },
+
+'PUBLICO ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'PUBLICO{TODAY_STR}',
+            'carteira': '55',
+    },
+
+'RD ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'RD{TODAY_STR}',
+            'carteira': '59',
+    },
+
+'SERVIÇOS ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'SERVIÇOS{TODAY_STR}',
+            'carteira': '32',
+    },
+
+'SOLAR BR - CIVEL': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'SOLAR BR - CIVEL{TODAY_STR}',
+            'carteira': '31',
+    },
+
+'SOLAR BR - TRABALHISTA ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'SOLAR BR - TRABALHISTA {TODAY_STR}',
+            'carteira': '37',
+    },
+
+'TLSA - CIVEL ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'TLSA - CIVEL {TODAY_STR}',
+            'carteira': '28',
+    },
+
+'TLSA - TRAB ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'TLSA - TRAB {TODAY_STR}',
+            'carteira': '34',
+    },
+
+'TRABALHISTA - GERAL': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'TRABALHISTA - GERAL {TODAY_STR}',
+            'carteira': '40',
+    },
+
+
+'VALE CIVEL': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'VALE CIVEL {TODAY_STR}',
+            'carteira': '30',
+    },
+
+'VERZANI': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'VERZANI {TODAY_STR}',
+            'carteira': '57',
+    },
+
+'RJ E FALENCIA ': {
+            'dataEnvio': TODAY_STR,
+            'cod_usuario_envio': '222',
+            'cod_lote': f'RJ E FALENCIA  {TODAY_STR}',
+            'carteira': '64',
+    },
+
+}
+COMMON_DEFAULTS = {
+    'verificado_encerramento': 0,
+    'encerramento_exportado': 0,
+    'encerrado': None,
+    'exportado': 0,
+}
+
+
+# Colunas constantes (defaults e valores do preset) não viram colunas do DataFrame: ficam uma
+# vez só em df.attrs['constantes'] e valem para todas as linhas. iterar_registros e a grade as
+# expandem na hora; expandir_constantes() materializa quando alguém precisar do DataFrame completo.
+def constantes_de(df: pd.DataFrame) -> Dict[str, object]:
+    return df.attrs.get('constantes', {})
+
+def _definir_constantes(df: pd.DataFrame, valores: Dict[str, object]) -> None:
+    # dicionário novo a cada vez: attrs pode ser compartilhado com o DataFrame de origem
+    df.attrs['constantes'] = {**constantes_de(df), **valores}
+
+def colunas_disponiveis(df: pd.DataFrame) -> List[str]:
+    """Colunas do DataFrame seguidas das constantes que não são colunas de verdade."""
+    reais = list(df.columns)
+    return reais + [c for c in constantes_de(df) if c not in df.columns]
+
+def expandir_constantes(df: pd.DataFrame) -> pd.DataFrame:
+    """Cópia de `df` com as constantes como colunas comuns (O(linhas x constantes) de memória)."""
+    constantes = constantes_de(df)
+    if not constantes:
+        return df
+    completo = df.assign(**constantes)
+    completo.attrs = {k: v for k, v in df.attrs.items() if k != 'constantes'}
+    return completo
+
+@lru_cache(maxsize=64)
+def _data_envio(texto: str):
+    try:
+        return pd.to_datetime(texto, dayfirst=True, errors='coerce').date()
+    except Exception:
+        return date.today()
+
+def aplicar_presets(df: pd.DataFrame, empresa: str) -> pd.DataFrame:
+    """Aplica COMMON_DEFAULTS e o preset da empresa como constantes (sem copiar os dados)."""
+    df = df.copy(deep=False)  # copy-on-write: os dados da planilha não são duplicados
+    preset = COMPANY_PRESETS.get(empresa, {})
+    constantes: Dict[str, object] = {k: v for k, v in COMMON_DEFAULTS.items() if k not in df.columns}
+
+    for col in ['cod_lote', 'cod_usuario_envio', 'carteira']:
+        val = preset.get(col)
+        if val is not None:
+            constantes[col] = val
+
+    data_envio = preset.get('dataEnvio')
+    if data_envio:
+        constantes['data_exportacao'] = _data_envio(data_envio)
+    elif 'data_exportacao' not in df.columns:
+        constantes['data_exportacao'] = None
+
+    # o preset prevalece sobre uma coluna de mesmo nome vinda da planilha
+    sobrepostas = [c for c in constantes if c in df.columns]
+    if sobrepostas:
+        df = df.drop(columns=sobrepostas)
+    _definir_constantes(df, constantes)
+    return df
+
+def teste_tcp(host: str, port: int, timeout: float = 3.0) -> Tuple[bool, str]:
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True, ""
+    except Exception as e:
+        return False, str(e)
+
+# Quem exibe erros das rotinas de banco. Sem interface vão para o log; a janela
+# principal registra uma versão que mostra o diálogo na thread do Tk.
+_NOTIFICADOR_ERRO = None
+
+def definir_notificador_erro(fn) -> None:
+    global _NOTIFICADOR_ERRO
+    _NOTIFICADOR_ERRO = fn
+
+# Captura por thread (ex.: cada tarefa da fila guarda o próprio erro), tem prioridade sobre o global.
+_CAPTURA_ERROS = threading.local()
+
+@contextmanager
+def capturando_erros(fn):
+    """Dentro do bloco, os erros notificados *nesta thread* vão para `fn(titulo, mensagem)`."""
+    anterior = getattr(_CAPTURA_ERROS, 'fn', None)
+    _CAPTURA_ERROS.fn = fn
+    try:
+        yield
+    finally:
+        _CAPTURA_ERROS.fn = anterior
+
+def notificar_erro(titulo: str, mensagem: str) -> None:
+    captura = getattr(_CAPTURA_ERROS, 'fn', None)
+    if captura is not None:
+        captura(titulo, mensagem)
+    elif _NOTIFICADOR_ERRO is not None:
+        _NOTIFICADOR_ERRO(titulo, mensagem)
+    else:
+        log.error('%s: %s', titulo, mensagem)
+
+class ErroConexao(Exception):
+    """Falha ao abrir conexão com o banco (título + mensagem prontos para exibir)."""
+
+    def __init__(self, titulo: str, mensagem: str):
+        super().__init__(mensagem)
+        self.titulo = titulo
+        self.mensagem = mensagem
+
+# Códigos de erro do cliente MySQL que indicam conexão perdida
+# (2006 = server has gone away, 2013 = lost connection during query, 2055 = lost connection).
+ERROS_CONEXAO_PERDIDA = {2006, 2013, 2055}
+
+def _codigo_erro(exc: BaseException) -> Optional[int]:
+    """Extrai o código numérico de um erro do mysql.connector ou do PyMySQL."""
+    errno = getattr(exc, 'errno', None)
+    if isinstance(errno, int):
+        return errno
+    args = getattr(exc, 'args', ())
+    if args and isinstance(args[0], int):
+        return args[0]
+    return None
+
+def _abrir_conexao_fisica(cfg: dict) -> object:
+    """Abre uma conexão nova (mysql.connector, com fallback PyMySQL). Levanta ErroConexao em falha."""
+    ok, err = teste_tcp(cfg['host'], cfg['port'], timeout=min(cfg.get('timeout', 15), 5))
+    if not ok:
+        raise ErroConexao(
+            'Rede/Porta fechada',
+            f"Não foi possível abrir TCP para {cfg['host']}:{cfg['port']}\n"
+            f"Motivo: {err}\n\nVerifique firewall/NAT/segurança do servidor e se o MySQL está escutando."
+        )
+
+    def base_kwargs_connector():
+        kw = dict(
+            host=cfg['host'],
+            user=cfg['user'],
+            password=cfg['password'],
+            database=cfg['database'],
+            port=cfg['port'],
+            connection_timeout=cfg.get('timeout', 15),
+            use_pure=True,
+            allow_local_infile=cfg.get('local_infile', False),
+        )
+        for k in ('ssl_ca', 'ssl_cert', 'ssl_key'):
+            if k in cfg:
+                kw[k] = cfg[k]
+        return kw
+
+    try:
+        return mysql.connector.connect(**base_kwargs_connector())
+    except mysql.connector.Error as err1:
+        msg1 = str(err1).lower()
+        if 'authentication plugin' in msg1 and 'mysql_native_password' in msg1 and 'not supported' in msg1:
+            try:
+                import pymysql
+            except ImportError:
+                raise ErroConexao(
+                    'Dependência ausente',
+                    'PyMySQL não está instalado.\n\nRode:\n'
+                    '"C:\\Users\\Renan Farias\\AppData\\Local\\Programs\\Python\\Python313\\python.exe" -m pip install PyMySQL'
+                )
+            try:
+                ssl_params = None
+                if 'ssl_ca' in cfg or 'ssl_cert' in cfg or 'ssl_key' in cfg:
+                    ssl_params = {}
+                    if 'ssl_ca' in cfg:   ssl_params['ca']   = cfg['ssl_ca']
+                    if 'ssl_cert' in cfg: ssl_params['cert'] = cfg['ssl_cert']
+                    if 'ssl_key' in cfg:  ssl_params['key']  = cfg['ssl_key']
+
+                return pymysql.connect(
+                    host=cfg['host'],
+                    user=cfg['user'],
+                    password=cfg['password'],
+                    database=cfg['database'],
+                    port=cfg['port'],
+                    connect_timeout=cfg.get('timeout', 15),
+                    ssl=ssl_params,
+                    local_infile=cfg.get('local_infile', False)
+                )
+            except Exception as err2:
+                raise ErroConexao(
+                    'Erro PyMySQL',
+                    f'Falha no fallback PyMySQL:\n{err2}\n\n'
+                    f'Host={cfg.get("host")}\nDB={cfg.get("database")}\nPort={cfg.get("port")}\n'
+                    f'.env usado: {LAST_ENV_PATH or "NÃO ENCONTRADO"}'
+                )
+        raise ErroConexao(
+            'Erro MySQL',
+            f"{err1}\n\nHost={cfg.get('host')}\nDB={cfg.get('database')}\nPort={cfg.get('port')}\n"
+            f".env usado: {LAST_ENV_PATH or 'NÃO ENCONTRADO'}"
+        )
+    except Exception as e:
+        raise ErroConexao('Erro inesperado', str(e))
+
+def _eh_leitura(sql: str) -> bool:
+    partes = sql.split(None, 1)
+    return not partes or partes[0].upper() in ('SELECT', 'SHOW')
+
+class CursorPooled:
+    """Cursor que refaz a conexão e repete o comando uma vez em erros 2006/2013,
+    desde que não haja escrita pendente (não confirmada) na transação."""
+
+    def __init__(self, conexao: 'ConexaoPooled', kwargs: dict):
+        self._conexao = conexao
+        self._kwargs = kwargs
+        self._cur = conexao._bruta.cursor(**kwargs)
+
+    def execute(self, sql, params=None):
+        return self._executar('execute', sql, params)
+
+    def executemany(self, sql, seq_params):
+        return self._executar('executemany', sql, seq_params)
+
+    def _executar(self, metodo: str, sql, params):
+        leitura = _eh_leitura(sql)
+        try:
+            resultado = getattr(self._cur, metodo)(sql, params)
+        except Exception as e:
+            if _codigo_erro(e) not in ERROS_CONEXAO_PERDIDA:
+                raise
+            if self._conexao._escrita_pendente:
+                self._conexao._quebrada = True
+                raise
+            self._conexao._reconectar()
+            self._cur = self._conexao._bruta.cursor(**self._kwargs)
+            resultado = getattr(self._cur, metodo)(sql, params)
+        self._conexao._marcar_execucao(leitura)
+        return resultado
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __getattr__(self, nome):
+        return getattr(self._cur, nome)
+
+class ConexaoPooled:
+    """Conexão emprestada do pool; close() devolve ao pool em vez de fechar o socket."""
+
+    def __init__(self, pool: 'PoolConexoes', bruta: object, geracao: int):
+        self._pool = pool
+        self._bruta = bruta
+        self._geracao = geracao
+        self._transacao_aberta = False
+        self._escrita_pendente = False
+        self._quebrada = False
+        self._devolvida = False
+
+    def cursor(self, **kwargs) -> CursorPooled:
+        return CursorPooled(self, kwargs)
+
+    def commit(self):
+        self._bruta.commit()
+        self._transacao_aberta = self._escrita_pendente = False
+
+    def rollback(self):
+        self._bruta.rollback()
+        self._transacao_aberta = self._escrita_pendente = False
+
+    def close(self):
+        if self._devolvida:
+            return
+        self._devolvida = True
+        self._pool.devolver(self)
+
+    def _marcar_execucao(self, leitura: bool):
+        self._transacao_aberta = True
+        if not leitura:
+            self._escrita_pendente = True
+
+    def _reconectar(self):
+        try:
+            self._bruta.close()
+        except Exception:
+            pass
+        self._bruta = self._pool._abrir_fisica()
+        self._transacao_aberta = self._escrita_pendente = False
+        self._quebrada = False
+        self._pool._contar_reconexao()
+
+    def __getattr__(self, nome):
+        return getattr(self._bruta, nome)
+
+class PoolConexoes:
+    """Pool de conexões MySQL compartilhado por todo o processo.
+
+    - tamanho máximo limitado (DB_POOL_SIZE); quem pede além disso espera até DB_POOL_WAIT s;
+    - conexões paradas há mais de DB_POOL_PING s são testadas com ping antes do empréstimo;
+    - conexões ociosas há mais de DB_POOL_IDLE s são fechadas;
+    - conexões perdidas (2006/2013) são refeitas.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._cfg: Optional[dict] = None
+        self._geracao = 0
+        self._livres: List[Tuple[object, float]] = []  # (conexão bruta, instante da devolução)
+        self._em_uso = 0
+        self._abrindo = 0
+        self._abertas = 0
+        self._criadas = 0
+        self._reaproveitadas = 0
+        self._reconexoes = 0
+        self._zelador: Optional[threading.Thread] = None
+
+    # ---- configuração ----
+    def _config(self) -> dict:
+        if self._cfg is None:
+            self._cfg = obter_config_banco()
+        return self._cfg
+
+    @property
+    def tamanho_max(self) -> int:
+        return max(1, int(self._config().get('pool_tamanho', 5)))
+
+    def redefinir(self):
+        """Fecha as conexões livres e relê o .env na próxima conexão."""
+        with self._cond:
+            livres, self._livres = self._livres, []
+            self._abertas -= len(livres)
+            self._cfg = None
+            self._geracao += 1
+            self._cond.notify_all()
+        for bruta, _ in livres:
+            self._fechar_bruta(bruta)
+
+    # ---- empréstimo ----
+    def adquirir(self, espera: Optional[float] = None) -> ConexaoPooled:
+        """Empresta uma conexão; espera até `espera` segundos (padrão: DB_POOL_WAIT) por uma livre."""
+        cfg = self._config()
+        espera = float(cfg.get('pool_espera', 30)) if espera is None else espera
+        ping_apos = float(cfg.get('pool_ping', 10))
+        limite = time.monotonic() + espera
+        while True:
+            with self._cond:
+                self._garantir_zelador()
+                while not self._livres and self._abertas + self._abrindo >= self.tamanho_max:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise ErroConexao(
+                            'Pool esgotado',
+                            f'Todas as {self.tamanho_max} conexões estão em uso há mais de {espera:.0f}s.'
+                        )
+                    self._cond.wait(restante)
+                if self._livres:
+                    bruta, devolvida_em = self._livres.pop()
+                    self._em_uso += 1
+                    abrir_nova = False
+                else:
+                    self._abrindo += 1
+                    abrir_nova = True
+
+            if abrir_nova:
+                try:
+                    bruta = self._abrir_fisica()
+                except BaseException:
+                    with self._cond:
+                        self._abrindo -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._abrindo -= 1
+                    self._abertas += 1
+                    self._em_uso += 1
+                    geracao = self._geracao
+                return ConexaoPooled(self, bruta, geracao)
+
+            if time.monotonic() - devolvida_em < ping_apos or self._ping(bruta):
+                with self._cond:
+                    self._reaproveitadas += 1
+                    geracao = self._geracao
+                return ConexaoPooled(self, bruta, geracao)
+
+            # conexão morta: descarta e tenta de novo
+            self._fechar_bruta(bruta)
+            with self._cond:
+                self._em_uso -= 1
+                self._abertas -= 1
+                self._cond.notify()
+
+    def devolver(self, conexao: ConexaoPooled):
+        bruta = conexao._bruta
+        descartar = conexao._quebrada
+        if not descartar and conexao._transacao_aberta:
+            # encerra a transação/snapshot para a próxima consulta enxergar dados novos
+            try:
+                bruta.rollback()
+            except Exception:
+                descartar = True
+        with self._cond:
+            descartar = descartar or conexao._geracao != self._geracao
+            self._em_uso -= 1
+            if descartar:
+                self._abertas -= 1
+            else:
+                self._livres.append((bruta, time.monotonic()))
+            self._cond.notify()
+        if descartar:
+            self._fechar_bruta(bruta)
+
+    # ---- manutenção ----
+    def limpar_ociosas(self):
+        ocioso_max = float(self._config().get('pool_ocioso', 300))
+        agora = time.monotonic()
+        with self._cond:
+            velhas = [(b, t) for b, t in self._livres if agora - t >= ocioso_max]
+            self._livres = [(b, t) for b, t in self._livres if agora - t < ocioso_max]
+            self._abertas -= len(velhas)
+        for bruta, _ in velhas:
+            self._fechar_bruta(bruta)
+
+    def fechar_todas(self):
+        with self._cond:
+            livres, self._livres = self._livres, []
+            self._abertas -= len(livres)
+        for bruta, _ in livres:
+            self._fechar_bruta(bruta)
+
+    def estatisticas(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                'em_uso': self._em_uso,
+                'livres': len(self._livres),
+                'abertas': self._abertas,
+                'maximo': self.tamanho_max if self._cfg is not None else 0,
+                'criadas': self._criadas,
+                'reaproveitadas': self._reaproveitadas,
+                'reconexoes': self._reconexoes,
+            }
+
+    # ---- internos ----
+    def _abrir_fisica(self) -> object:
+        bruta = _abrir_conexao_fisica(self._config())
+        with self._cond:
+            self._criadas += 1
+        return bruta
+
+    def _contar_reconexao(self):
+        with self._cond:
+            self._reconexoes += 1
+
+    @staticmethod
+    def _ping(bruta) -> bool:
+        try:
+            bruta.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _fechar_bruta(bruta):
+        try:
+            bruta.close()
+        except Exception:
+            pass
+
+    def _garantir_zelador(self):
+        if self._zelador is not None and self._zelador.is_alive():
+            return
+
+        def zelar():
+            while True:
+                time.sleep(15)
+                try:
+                    self.limpar_ociosas()
+                except Exception:
+                    pass
+
+        self._zelador = threading.Thread(target=zelar, name='pool-zelador', daemon=True)
+        self._zelador.start()
+
+POOL_CONEXOES = PoolConexoes()
+
+def conectar_ao_mysql() -> Tuple[Optional[object], Optional[object]]:
+    """Empresta uma conexão do pool. `conn.close()` devolve a conexão ao pool."""
+    try:
+        conn = POOL_CONEXOES.adquirir()
+        return conn, conn.cursor()
+    except ErroConexao as e:
+        notificar_erro(e.titulo, e.mensagem)
+        return None, None
+    except Exception as e:
+        notificar_erro('Erro inesperado', str(e))
+        return None, None
+
+# Formatos de data em texto, na ordem de preferência (dia antes do mês, como nas planilhas)
+FORMATOS_DATA = ('%d/%m/%Y', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', 'ISO8601', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y')
+AMOSTRA_FORMATO_DATA = 200
+# Números de série do Excel aceitos como data (01/01/1900 a 31/12/2199)
+SERIAL_EXCEL_MIN, SERIAL_EXCEL_MAX = 2, 109574
+
+def _serial_excel(valores: pd.Series) -> pd.DatetimeIndex:
+    numeros = pd.to_numeric(valores, errors='coerce').astype('float64')
+    numeros = numeros.where((numeros >= SERIAL_EXCEL_MIN) & (numeros <= SERIAL_EXCEL_MAX))
+    return pd.DatetimeIndex(pd.to_datetime(numeros, unit='D', origin='1899-12-30'))
+
+def _detectar_formato_data(textos: pd.Series) -> Optional[str]:
+    """Formato de FORMATOS_DATA que mais converte uma amostra dos textos (None se nenhum converte)."""
+    amostra = textos.iloc[:AMOSTRA_FORMATO_DATA]
+    melhor, convertidos = None, 0
+    for formato in FORMATOS_DATA:
+        n = int(pd.to_datetime(amostra, format=formato, errors='coerce').notna().sum())
+        if n > convertidos:
+            melhor, convertidos = formato, n
+            if n == len(amostra):
+                break
+    return melhor
+
+def _converter_textos_data(textos: pd.Series) -> pd.Series:
+    """Converte com o formato detectado; o que sobrar tenta os outros formatos e, por fim, a inferência do pandas."""
+    resultado = pd.Series(pd.NaT, index=textos.index, dtype='datetime64[ns]')
+    restantes = textos
+    formato = _detectar_formato_data(textos)
+    formatos = [formato] + [f for f in FORMATOS_DATA if f != formato] if formato else []
+    for formato in formatos:
+        convertidos = pd.to_datetime(restantes, format=formato, errors='coerce')
+        ok = convertidos.notna()
+        resultado[ok[ok].index] = convertidos[ok]
+        restantes = restantes[~ok]
+        if restantes.empty:
+            return resultado
+    # seriais do Excel gravados como texto ("45123")
+    seriais = pd.Series(_serial_excel(restantes), index=restantes.index)
+    ok = seriais.notna()
+    resultado[ok[ok].index] = seriais[ok]
+    restantes = restantes[~ok]
+    if not restantes.empty:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)  # "Could not infer format": é justamente o caso
+            resultado[restantes.index] = pd.to_datetime(restantes, errors='coerce', dayfirst=True)
+    return resultado
+
+def _datas_python(convertidos: pd.Series) -> pd.Series:
+    """datetime64 -> `date` criando um objeto por dia distinto, não por célula (NaT continua NaT)."""
+    codigos, dias = pd.factorize(convertidos.dt.normalize())
+    datas = np.append(pd.DatetimeIndex(dias).date, pd.NaT)  # posição extra: código -1 (NaT)
+    return pd.Series(datas[codigos], index=convertidos.index, dtype=object)
+
+def _parse_data_series(s: pd.Series) -> Tuple[pd.Series, int]:
+    """Converte uma coluna de datas para `date`, devolvendo também quantas células não converteram.
+
+    Cada valor distinto é convertido uma única vez (factorize) e o resultado é espalhado de
+    volta por índice. O formato é decidido pelo tipo dos valores: datetime já pronto, número
+    de série do Excel ou texto, cujo formato é detectado uma vez por coluna (FORMATOS_DATA) e
+    aplicado explicitamente, sem a inferência elemento a elemento do pandas.
+    """
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return _datas_python(s), 0
+    tipo = pd.api.types.infer_dtype(s, skipna=True)
+    if tipo in ('datetime', 'datetime64', 'date'):
+        # coluna só de datetime (openpyxl/calamine): conversão direta, sem passar pelos distintos
+        convertidos = pd.to_datetime(s, errors='coerce')
+        return _datas_python(convertidos), int((convertidos.isna() & s.notna()).sum())
+    if tipo in ('integer', 'floating', 'mixed-integer-float', 'decimal'):
+        convertidos = pd.Series(_serial_excel(s), index=s.index)
+        return _datas_python(convertidos), int((convertidos.isna() & s.notna()).sum())
+    codigos, unicos = pd.factorize(s)
+    if not len(unicos):
+        return pd.Series(pd.NaT, index=s.index, dtype=object), 0
+    unicos = pd.Series(unicos, dtype=object)
+
+    convertidos = pd.Series(pd.NaT, index=unicos.index, dtype='datetime64[ns]')
+    e_data = unicos.map(lambda v: isinstance(v, (datetime, date, np.datetime64)))
+    e_numero = unicos.map(lambda v: isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, bool))
+    textos = unicos[~e_data & ~e_numero].astype(str).str.strip()
+    vazios = textos.eq('') | textos.str.lower().isin(('nan', 'nat', 'none', '-'))
+    textos = textos[~vazios]
+
+    if e_data.any():
+        convertidos[e_data] = pd.to_datetime(unicos[e_data], errors='coerce')
+    if e_numero.any():
+        convertidos[e_numero] = _serial_excel(unicos[e_numero]).to_numpy()
+    if not textos.empty:
+        convertidos[textos.index] = _converter_textos_data(textos)
+
+    validos = unicos.index.difference(vazios[vazios].index)
+    falhas_unicas = convertidos[validos].isna().to_numpy()
+    invalidas = int(np.isin(codigos, validos[falhas_unicas]).sum()) if falhas_unicas.any() else 0
+
+    por_celula = np.append(convertidos.to_numpy(), np.datetime64('NaT'))[codigos]  # código -1 (vazio) -> NaT
+    return _datas_python(pd.Series(por_celula, index=s.index)), invalidas
+
+# Textos com poucos valores distintos (cod_lote é constante por arquivo): ficam como
+# categóricos do preview até iterar_registros, que só então expande para str por célula.
+COLUNAS_TEXTO_CATEGORICAS = ('fase', 'status', 'tipo_resultado', 'parecer_processo', 'cliente', 'justificativa',
+                             'motivo', 'cod_lote')
+
+def _texto_categorico(s: pd.Series) -> pd.Series:
+    """Mesmo resultado de `s.astype(str).str.strip()`, mas como categórico e com um strip por valor distinto."""
+    codigos, unicos = pd.factorize(s)
+    limpos = pd.Series(unicos, dtype=object).astype(str).str.strip()
+    # ' A' e 'A' viram a mesma categoria depois do strip
+    codigos_limpos, categorias = pd.factorize(limpos)
+    mapa = np.append(codigos_limpos, -1)  # código -1 (vazio) continua vazio
+    return pd.Series(pd.Categorical.from_codes(mapa[codigos], categories=categorias), index=s.index, name=s.name)
+
+def _colunas_de_data(df: pd.DataFrame) -> List[str]:
+    return [c for c in df.columns if isinstance(c, str) and (c.startswith('data_') or c in ('dataAtualizacao',))]
+
+def formatar_datas_e_numeros(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte valores e datas e limpa os textos.
+
+    As células de data que não converteram (ficam NULL) são contadas por coluna em
+    `df.attrs['datas_invalidas']` e registradas no log.
+    """
+    df = df.copy(deep=False)  # copy-on-write: só as colunas reatribuídas abaixo ganham memória nova
+    for campo in ['valor_causa', 'valor_final_causa']:
+        if campo in df.columns:
+            df[campo] = pd.to_numeric(df[campo], errors='coerce').fillna(0.0)
+    invalidas: Dict[str, int] = {}
+    for c in _colunas_de_data(df):
+        df[c], n = _parse_data_series(df[c])
+        if n:
+            invalidas[c] = n
+    if invalidas:
+        log.warning('Datas que não puderam ser lidas (irão como NULL): %s',
+                    ', '.join(f'{c}={n}' for c, n in invalidas.items()))
+    df.attrs['datas_invalidas'] = invalidas
+    if 'cnj' in df.columns:
+        df['cnj'] = df['cnj'].astype(str).str.strip()
+    for c in COLUNAS_TEXTO_CATEGORICAS:
+        if c in df.columns:
+            df[c] = _texto_categorico(df[c])
+    constantes = constantes_de(df)
+    textos = {c: str(v).strip() for c, v in constantes.items()
+              if c in COLUNAS_TEXTO_CATEGORICAS and v is not None}
+    if textos:
+        _definir_constantes(df, textos)
+    return df
+
+def validar_colunas_para_insercao(df: pd.DataFrame) -> Tuple[bool, List[str]]:
+    presentes = set(colunas_disponiveis(df))
+    faltando = [c for c in colunas_encerramento if c not in presentes]
+    return (len(faltando) == 0), faltando
+
+def iterar_registros(df: pd.DataFrame) -> Iterator[Tuple]:
+    """Gera as tuplas de inserção coluna a coluna (sem iterrows).
+
+    Segue a ordem de `colunas_encerramento`: constantes (df.attrs['constantes']) e colunas
+    ausentes entram como um único valor repetido; as demais são convertidas para objetos
+    Python coluna a coluna, trocando NaN/NaT por None em bloco.
+    """
+    constantes = constantes_de(df)
+    n = len(df)
+    colunas: List[Iterable] = []
+    for coluna in colunas_encerramento:
+        if coluna in constantes or coluna not in df.columns:
+            valor = constantes.get(coluna)
+            colunas.append(repeat(None if valor is None or pd.isna(valor) else valor, n))
+            continue
+        serie = df[coluna]
+        valores = serie.to_numpy(dtype=object)
+        nulos = serie.isna().to_numpy()
+        if nulos.any():
+            # np.where devolve array novo: nunca altera o buffer do próprio DataFrame
+            valores = np.where(nulos, None, valores)
+        colunas.append(valores)
+    return zip(*colunas)
+
+def montar_registros(df: pd.DataFrame) -> List[Tuple]:
+    return list(iterar_registros(df))
+
+class OperacaoCancelada(Exception):
+    """Levantada dentro de um worker quando o usuário cancela (ou substitui) a operação."""
+
+# =========================
+# Validação de CNJ (NNNNNNN-DD.AAAA.J.TR.OOOO, Resolução CNJ 65/2008)
+# =========================
+MOTIVO_CNJ_VAZIO = 'CNJ vazio'
+MOTIVO_CNJ_FORMATO = 'formato inválido (esperados 20 dígitos)'
+MOTIVO_CNJ_EXCEL = 'convertido em número pelo Excel (dígitos perdidos)'
+MOTIVO_CNJ_DIGITO = 'dígito verificador inválido'
+
+# posição de cada dígito na máscara canônica e os separadores entre eles
+_MASCARA_CNJ = 'NNNNNNN-DD.AAAA.J.TR.OOOO'
+_POSICOES_DIGITOS_CNJ = [i for i, c in enumerate(_MASCARA_CNJ) if c.isalpha()]
+_SEPARADORES_CNJ = [(i, ord(c)) for i, c in enumerate(_MASCARA_CNJ) if not c.isalpha()]
+# peso (10^k mod 97) de cada um dos 20 dígitos no número N7 A4 J TR O4 00; DD fica fora (peso 0)
+_PESOS_MODULO_CNJ = np.array([pow(10, 19 - k, 97) for k in range(7)] + [0, 0]
+                             + [pow(10, 19 - k, 97) for k in range(7, 18)], dtype=np.int32)
+# textos maiores que isto não são CNJ (a máscara tem 25 caracteres)
+LARGURA_CNJ = 32
+
+class RelatorioRejeicoes:
+    """Linhas retiradas da planilha antes do envio: linha (cabeçalho = linha 1), CNJ lido e motivo.
+
+    Vai em df.attrs e é imutável; por isso é compartilhado (não copiado) quando o pandas
+    propaga os attrs para um DataFrame derivado.
+    """
+    COLUNAS = ['linha', 'cnj', 'motivo']
+
+    def __init__(self, linhas: Optional[pd.DataFrame] = None):
+        self.linhas = linhas if linhas is not None else pd.DataFrame(columns=self.COLUNAS)
+
+    def __len__(self) -> int:
+        return len(self.linhas)
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def por_motivo(self) -> Dict[str, int]:
+        return self.linhas['motivo'].value_counts().to_dict() if len(self) else {}
+
+    @classmethod
+    def juntar(cls, relatorios: Iterable['RelatorioRejeicoes']) -> 'RelatorioRejeicoes':
+        partes = [r.linhas for r in relatorios if len(r)]
+        return cls(pd.concat(partes, ignore_index=True)) if partes else cls()
+
+    def salvar(self, path: str) -> None:
+        """Grava o relatório em .csv ou .xlsx (pela extensão)."""
+        if Path(path).suffix.lower() == '.csv':
+            self.linhas.to_csv(path, index=False, encoding='utf-8-sig')
+        else:
+            self.linhas.to_excel(path, index=False)
+
+def _digitos_cnj(codigos: np.ndarray, e_digito: np.ndarray, n_digitos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Matriz (linhas x 20) com os dígitos de cada linha (o que faltar à esquerda vira 0, como
+    zfill) e a máscara das linhas que já estavam exatamente na máscara canônica."""
+    valores = np.zeros((len(codigos), 20), dtype=np.uint8)
+    na_mascara = np.zeros(len(codigos), dtype=bool)
+    if codigos.shape[1] >= len(_MASCARA_CNJ):
+        na_mascara = n_digitos == 20
+        for posicao, sep in _SEPARADORES_CNJ:
+            na_mascara &= codigos[:, posicao] == sep
+        if codigos.shape[1] > len(_MASCARA_CNJ):
+            na_mascara &= codigos[:, len(_MASCARA_CNJ)] == 0
+        valores[na_mascara] = codigos[:, _POSICOES_DIGITOS_CNJ][na_mascara] - 48
+    # só dígitos, sem pontuação (célula numérica ou texto cru): basta alinhar à direita
+    so_digitos = ~na_mascara & (e_digito | (codigos == 0)).all(axis=1)
+    for faltam in np.unique(20 - n_digitos[so_digitos]):
+        linhas = np.flatnonzero(so_digitos & (n_digitos == 20 - faltam))
+        valores[linhas, faltam:] = codigos[linhas, :20 - faltam] - 48
+    resto = np.flatnonzero(~na_mascara & ~so_digitos)
+    if len(resto):
+        digitos = e_digito[resto]
+        destino = np.cumsum(digitos, axis=1) - 1 + (20 - n_digitos[resto])[:, None]
+        linhas, origem = np.nonzero(digitos)
+        parcial = np.zeros((len(resto), 20), dtype=np.uint8)
+        parcial[linhas, destino[linhas, origem]] = codigos[resto][linhas, origem] - 48
+        valores[resto] = parcial
+    return valores, na_mascara
+
+def _confere_digito_cnj(valores: np.ndarray) -> np.ndarray:
+    """DD == 98 - (N7 A4 J TR O4 00 mod 97), com os pesos já reduzidos mod 97 (uma soma por linha)."""
+    resto = (valores @ _PESOS_MODULO_CNJ) % 97
+    dd = valores[:, 7].astype(np.int32) * 10 + valores[:, 8]
+    return 98 - resto == dd
+
+def normalizar_cnjs(s: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Coloca os CNJs na máscara canônica e confere o dígito verificador (módulo 97), tudo vetorizado.
+
+    Aceita a máscara (ou outra pontuação com espaço, '.', '-' ou '/'), só dígitos (zeros à
+    esquerda perdidos pelo Excel são repostos) e números com '.0'. Os textos viram uma
+    matriz de code points (linhas x caracteres) e todas as etapas são operações NumPy sobre
+    ela. Retorna (cnj canônico, motivo): nas linhas inválidas o CNJ fica NaN e o motivo diz
+    por quê; nas válidas o motivo é None.
+    """
+    n = len(s)
+    # sem .str.strip()/regex por célula: espaços são só mais um separador aceito na matriz
+    texto = s.astype('str')
+    comprimentos = texto.str.len().fillna(0).to_numpy()
+    longo = comprimentos > LARGURA_CNJ
+    largura = int(min(LARGURA_CNJ, max(1, comprimentos.max() if n else 1)))
+
+    objetos = texto.fillna('').to_numpy(dtype=object)
+    codigos = objetos.astype(f'U{largura}').view(np.uint32).reshape(n, largura)
+    # um byte por caractere: as etapas abaixo varrem 4x menos memória. Fora do Latin-1 vira 255,
+    # que (como todo caractere acima de 127) não é dígito nem separador aceito
+    codigos = np.minimum(codigos, 255).astype(np.uint8)
+    branco = (codigos | 32) == 32  # fim do texto (0) ou espaço
+    vazio = branco.all(axis=1) & ~longo
+    curtas = np.flatnonzero(~vazio & (comprimentos <= 6))
+    if len(curtas):
+        vazio[curtas] = texto.iloc[curtas].str.strip().str.lower().isin(('nan', 'none')).to_numpy()
+    # célula numérica no Excel: '1.23456789012345e+19' já perdeu dígitos, não há o que recuperar
+    cientifica = np.zeros(n, dtype=bool)
+    com_e = np.flatnonzero(((codigos | 32) == 101).any(axis=1))  # 'e' ou 'E'
+    if len(com_e):
+        cientifica[com_e] = texto.iloc[com_e].str.strip().str.fullmatch(
+            r'\d+(?:\.\d+)?[eE]\+?\d+', na=False).to_numpy(dtype=bool)
+    e_digito = (codigos - 48) < 10  # uint8: abaixo de '0' dá a volta e fica grande
+    # separadores aceitos: fim do texto (0), espaço, '-', '.', '/'
+    aceito = e_digito | branco | ((codigos - 45) < 3)
+
+    # '1234...0001.0' (número no Excel): ignora o '.0...' final quando é o único separador
+    ponto = codigos == 46
+    candidatas = np.flatnonzero(ponto.sum(axis=1) == 1)
+    if len(candidatas):
+        trecho = codigos[candidatas]
+        depois = np.arange(largura) > ponto[candidatas].argmax(axis=1)[:, None]
+        so_zeros = ((trecho == 48) | (trecho == 0) | ~depois).all(axis=1)
+        so_digitos_antes = (e_digito[candidatas] | ponto[candidatas] | (trecho == 0)).all(axis=1)
+        decimal_zero = candidatas[so_zeros & so_digitos_antes]
+        e_digito[decimal_zero] &= ~depois[so_zeros & so_digitos_antes]
+
+    n_digitos = e_digito.view(np.uint8).sum(axis=1, dtype=np.uint8).astype(np.intp)
+    valido = aceito.all(axis=1) & (n_digitos >= 14) & (n_digitos <= 20) & ~cientifica & ~longo & ~vazio
+
+    motivo = np.full(n, None, dtype=object)
+    motivo[~vazio & ~valido] = MOTIVO_CNJ_FORMATO
+    motivo[cientifica] = MOTIVO_CNJ_EXCEL
+    motivo[vazio] = MOTIVO_CNJ_VAZIO
+    canonico = np.full(n, np.nan, dtype=object)
+
+    posicoes = np.flatnonzero(valido)
+    if len(posicoes):
+        valores, na_mascara = _digitos_cnj(codigos[posicoes], e_digito[posicoes], n_digitos[posicoes])
+        confere = _confere_digito_cnj(valores)
+        motivo[posicoes[~confere]] = MOTIVO_CNJ_DIGITO
+
+        # quem já estava na máscara fica com o próprio texto; os demais são remontados
+        prontas = posicoes[confere & na_mascara]
+        canonico[prontas] = objetos[prontas]  # na máscara: já sem espaços
+        remontar = confere & ~na_mascara
+        if remontar.any():
+            mascarado = np.empty((int(remontar.sum()), len(_MASCARA_CNJ)), dtype=np.uint8)
+            mascarado[:, _POSICOES_DIGITOS_CNJ] = valores[remontar] + 48
+            for posicao, sep in _SEPARADORES_CNJ:
+                mascarado[:, posicao] = sep
+            canonico[posicoes[remontar]] = mascarado.view(f'S{len(_MASCARA_CNJ)}').ravel().astype(str).astype(object)
+    return pd.Series(canonico, index=s.index, name=s.name), pd.Series(motivo, index=s.index, name='motivo')
+
+def formas_cnjs(cnjs: Iterable[str]) -> Dict[str, str]:
+    """Grafias com que cada CNJ pode estar gravado no banco -> o CNJ como foi informado.
+
+    Linhas gravadas antes da normalização podem ter o CNJ só com os 20 dígitos; as novas vêm
+    na máscara canônica. Para cada valor entram o próprio texto, a máscara e os 20 dígitos
+    (os dois últimos só se o CNJ for válido). Outras grafias antigas (pontuação diferente,
+    zeros à esquerda perdidos) não são cobertas.
+    """
+    cnjs = list(cnjs)
+    canonicos, _ = normalizar_cnjs(pd.Series(cnjs, dtype='str'))
+    formas: Dict[str, str] = {}
+    for original, canonico in zip(cnjs, canonicos.to_numpy(dtype=object)):
+        formas.setdefault(original, original)
+        if isinstance(canonico, str):
+            formas.setdefault(canonico, original)
+            formas.setdefault(canonico.replace('-', '').replace('.', ''), original)
+    return formas
+
+def _linhas_excel(df: pd.DataFrame, posicoes: np.ndarray) -> np.ndarray:
+    """Número da linha na aba (cabeçalho = linha 1) das `posicoes` de df."""
+    # o índice da leitura é a posição na aba sem o cabeçalho: linha do Excel = índice + 2
+    if pd.api.types.is_integer_dtype(df.index):
+        return np.asarray(df.index[posicoes]) + 2
+    return np.asarray(posicoes) + 2
+
+def separar_cnjs_invalidos(df: pd.DataFrame) -> Tuple[pd.DataFrame, RelatorioRejeicoes]:
+    """Normaliza a coluna cnj e tira as linhas com CNJ inválido, devolvendo-as num RelatorioRejeicoes."""
+    if 'cnj' not in df.columns:
+        return df, RelatorioRejeicoes()
+    canonico, motivo = normalizar_cnjs(df['cnj'])
+    invalidas = motivo.notna().to_numpy()
+    relatorio = RelatorioRejeicoes()
+    if invalidas.any():
+        posicoes = np.flatnonzero(invalidas)
+        relatorio = RelatorioRejeicoes(pd.DataFrame({
+            'linha': _linhas_excel(df, posicoes),
+            'cnj': df['cnj'].iloc[posicoes].to_numpy(dtype=object),
+            'motivo': motivo.iloc[posicoes].to_numpy(),
+        }))
+        log.warning('%d linha(s) com CNJ inválido retiradas do envio: %s', len(relatorio),
+                    ', '.join(f'{m}={n}' for m, n in relatorio.por_motivo().items()))
+        df = df[~invalidas]
+        canonico = canonico[~invalidas]
+    df = df.copy(deep=False)
+    df['cnj'] = canonico.to_numpy()
+    return df, relatorio
+
+# =========================
+# CNJs repetidos dentro da mesma planilha
+# =========================
+POLITICAS_DUPLICADOS = {
+    'primeira': 'mantém a primeira linha de cada CNJ',
+    'ultima': 'mantém a última linha de cada CNJ',
+    'data_status': 'mantém a linha com a data_status mais recente (empate: a última)',
+    'rejeitar': 'não envia nenhuma linha de um CNJ repetido',
+    'manter': 'envia todas as linhas (comportamento antigo)',
+}
+
+# No streaming um bloco enviado não volta atrás: só dá para manter a primeira ocorrência (ou todas)
+POLITICAS_DUPLICADOS_STREAMING = ('primeira', 'manter')
+
+MOTIVO_CNJ_REPETIDO = 'CNJ repetido na planilha'
+MOTIVO_CNJ_REPETIDO_REJEITADO = 'CNJ repetido na planilha (todas as ocorrências rejeitadas)'
+MOTIVO_CNJ_REPETIDO_ENVIADO = 'CNJ repetido em bloco já enviado'
+
+def politica_duplicados(valor: Optional[str] = None) -> str:
+    """Resolve a política de CNJs repetidos: `valor` ou CNJ_DUPLICADOS do ambiente (padrão 'primeira')."""
+    politica = (valor or os.getenv('CNJ_DUPLICADOS', '') or 'primeira').strip().lower()
+    if politica not in POLITICAS_DUPLICADOS:
+        log.warning('Política de CNJs repetidos desconhecida %r; usando primeira.', politica)
+        politica = 'primeira'
+    return politica
+
+def _chave_data_status(df: pd.DataFrame, posicoes: np.ndarray) -> np.ndarray:
+    """data_status das `posicoes` como int64 ordenável (vazia = menor que qualquer data)."""
+    constantes = constantes_de(df)
+    if 'data_status' in constantes or 'data_status' not in df.columns:
+        return np.zeros(len(posicoes), dtype=np.int64)
+    datas = pd.to_datetime(df['data_status'].iloc[posicoes], errors='coerce')
+    return datas.to_numpy(dtype='datetime64[ns]').view(np.int64)  # NaT = int64 mínimo
+
+def colapsar_cnjs_repetidos(df: pd.DataFrame, politica: Optional[str] = None) -> Tuple[pd.DataFrame, RelatorioRejeicoes]:
+    """Deixa no máximo uma linha por CNJ conforme a política (ver POLITICAS_DUPLICADOS).
+
+    Os CNJs são agrupados por hash (pd.factorize) e só as linhas de CNJs que aparecem mais de
+    uma vez são ordenadas. As linhas retiradas vão para um RelatorioRejeicoes com a coluna
+    extra `linha_mantida` (vazia na política 'rejeitar').
+    """
+    politica = politica_duplicados(politica)
+    if politica == 'manter' or 'cnj' not in df.columns or len(df) < 2:
+        return df, RelatorioRejeicoes()
+    codigos, unicos = pd.factorize(df['cnj'])
+    if len(unicos) == len(df):
+        return df, RelatorioRejeicoes()
+
+    contagem = np.bincount(codigos[codigos >= 0], minlength=len(unicos))
+    repetidas = np.flatnonzero((codigos >= 0) & (contagem[np.maximum(codigos, 0)] > 1))
+    grupo = codigos[repetidas]
+    if politica == 'rejeitar':
+        retiradas = repetidas
+        mantidas = np.full(len(retiradas), -1)
+        motivo = MOTIVO_CNJ_REPETIDO_REJEITADO
+    else:
+        # lexsort: a última chave é a principal; dentro do CNJ a vencedora fica na ponta do grupo
+        if politica == 'data_status':
+            ordem = np.lexsort((repetidas, _chave_data_status(df, repetidas), grupo))
+        else:
+            ordem = np.lexsort((repetidas, grupo))
+        ordenado = grupo[ordem]
+        if politica == 'primeira':
+            ponta = np.r_[True, ordenado[1:] != ordenado[:-1]]
+        else:
+            ponta = np.r_[ordenado[1:] != ordenado[:-1], True]
+        vencedora = np.empty(len(unicos), dtype=np.int64)
+        vencedora[ordenado[ponta]] = repetidas[ordem[ponta]]
+        retiradas = np.sort(repetidas[ordem[~ponta]])
+        mantidas = vencedora[codigos[retiradas]]
+        motivo = MOTIVO_CNJ_REPETIDO
+
+    linha_mantida = pd.array(_linhas_excel(df, np.maximum(mantidas, 0)), dtype='Int64')
+    linha_mantida[mantidas < 0] = pd.NA
+    relatorio = RelatorioRejeicoes(pd.DataFrame({
+        'linha': _linhas_excel(df, retiradas),
+        'cnj': df['cnj'].iloc[retiradas].to_numpy(dtype=object),
+        'motivo': motivo,
+        'linha_mantida': linha_mantida,
+    }))
+    log.warning('%d linha(s) com CNJ repetido na planilha retiradas do envio (política %s).',
+                len(relatorio), politica)
+    manter = np.ones(len(df), dtype=bool)
+    manter[retiradas] = False
+    return df[manter], relatorio
+
+class FiltroCnjsEnviados:
+    """Lembra os CNJs dos blocos já enviados no streaming, pelo hash de 64 bits de cada um,
+    e retira dos blocos seguintes as linhas desses CNJs (política 'primeira' entre blocos).
+    """
+
+    def __init__(self):
+        self._vistos: set = set()
+
+    def filtrar(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, RelatorioRejeicoes]:
+        if 'cnj' not in df.columns or not len(df):
+            return df, RelatorioRejeicoes()
+        hashes = pd.util.hash_array(df['cnj'].to_numpy(dtype=object), categorize=False)
+        lista = hashes.tolist()
+        vistos = self._vistos
+        if vistos.isdisjoint(lista) and len(set(lista)) == len(lista):
+            vistos.update(lista)  # caso comum: nada repetido, sem teste linha a linha
+            return df, RelatorioRejeicoes()
+        repetidas = (pd.Series(hashes).duplicated().to_numpy()
+                     | np.fromiter((h in vistos for h in lista), dtype=bool, count=len(lista)))
+        vistos.update(lista)
+        posicoes = np.flatnonzero(repetidas)
+        relatorio = RelatorioRejeicoes(pd.DataFrame({
+            'linha': _linhas_excel(df, posicoes),
+            'cnj': df['cnj'].iloc[posicoes].to_numpy(dtype=object),
+            'motivo': MOTIVO_CNJ_REPETIDO_ENVIADO,
+        }))
+        log.warning('%d linha(s) com CNJ já enviado num bloco anterior retiradas do envio.', len(relatorio))
+        return df[~repetidas], relatorio
+
+def preparar_planilha(df: pd.DataFrame, empresa: str, ao_etapa=None,
+                      duplicados: Optional[str] = None) -> pd.DataFrame:
+    """Renomeia, aplica presets e formatação e completa as colunas de `colunas_encerramento`.
+
+    Presets e colunas ausentes ficam em df.attrs['constantes'] (ver constantes_de). Linhas com
+    CNJ inválido são retiradas e descritas em df.attrs['cnjs_rejeitados'] (RelatorioRejeicoes);
+    as repetições de um mesmo CNJ são resolvidas pela política `duplicados` (ver
+    POLITICAS_DUPLICADOS) e descritas em df.attrs['cnjs_repetidos'].
+
+    `ao_etapa(descricao)` é chamado antes de cada etapa e pode levantar OperacaoCancelada.
+    """
+    df = df.rename(columns=RENAME_MAP)
+    if ao_etapa:
+        ao_etapa('Aplicando presets...')
+    df = aplicar_presets(df, empresa)
+    if ao_etapa:
+        ao_etapa('Formatando datas e números...')
+    df = formatar_datas_e_numeros(df)
+    if ao_etapa:
+        ao_etapa('Validando CNJs...')
+    df, rejeitados = separar_cnjs_invalidos(df)
+    if ao_etapa:
+        ao_etapa('Procurando CNJs repetidos...')
+    df, repetidos = colapsar_cnjs_repetidos(df, duplicados)
+    df.attrs['cnjs_rejeitados'] = rejeitados
+    df.attrs['cnjs_repetidos'] = repetidos
+    ausentes = {col: None for col in colunas_encerramento if col not in colunas_disponiveis(df)}
+    if ausentes:
+        _definir_constantes(df, ausentes)
+    return df
+
+# Cabeçalhos que o importador realmente usa; as demais colunas da planilha nem são lidas.
+COLUNAS_UTEIS = frozenset(RENAME_MAP) | frozenset(colunas_encerramento)
+
+# Motores de leitura: calamine (Rust, via python-calamine) quando instalado;
+# senão openpyxl em modo read_only para .xlsx/.xlsm e o leitor padrão do pandas para .xls.
+MOTORES_LEITURA = ('calamine', 'openpyxl', 'pandas')
+
+def _calamine_disponivel() -> bool:
+    try:
+        import python_calamine  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def escolher_motor_leitura(path: str, preferido: Optional[str] = None) -> str:
+    """Resolve o motor de leitura: `preferido` (ou EXCEL_ENGINE no ambiente) se servir, senão o mais rápido disponível."""
+    preferido = (preferido or os.getenv('EXCEL_ENGINE', '')).strip().lower()
+    xlsx = Path(path).suffix.lower() in ('.xlsx', '.xlsm')
+    if preferido == 'calamine' and _calamine_disponivel():
+        return 'calamine'
+    if preferido == 'openpyxl' and xlsx:
+        return 'openpyxl'
+    if preferido == 'pandas':
+        return 'pandas'
+    if _calamine_disponivel():
+        return 'calamine'
+    return 'openpyxl' if xlsx else 'pandas'
+
+def _pasta_cache_padrao() -> Path:
+    base = os.getenv('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(base) / 'Encerramento' / 'cache'
+
+class CachePlanilhas:
+    """Cache das abas já lidas (DataFrame bruto, antes de rename/presets/formatação).
+
+    A chave combina caminho absoluto, tamanho, mtime, aba e colunas lidas; se o arquivo
+    for alterado a chave muda e a entrada antiga simplesmente deixa de ser usada.
+    Fica em memória (LRU limitada por `max_memoria_mb`) e em disco como pickle
+    (LRU por data de acesso, limitada por `max_disco_mb`). As listas de abas também ficam em memória.
+    """
+
+    def __init__(self, pasta: Optional[Path] = None, max_memoria_mb: int = 512, max_disco_mb: int = 2048):
+        self.pasta = Path(pasta) if pasta else _pasta_cache_padrao()
+        self.max_memoria = max_memoria_mb * 1024 * 1024
+        self.max_disco = max_disco_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._memoria: 'OrderedDict[str, Tuple[pd.DataFrame, int]]' = OrderedDict()
+        self._bytes_memoria = 0
+        self._abas: Dict[str, List[str]] = {}
+
+    @classmethod
+    def do_ambiente(cls) -> 'CachePlanilhas':
+        return cls(
+            pasta=os.getenv('CACHE_PLANILHAS_DIR') or None,
+            max_memoria_mb=int(os.getenv('CACHE_PLANILHAS_MEMORIA_MB', '512')),
+            max_disco_mb=int(os.getenv('CACHE_PLANILHAS_DISCO_MB', '2048')),
+        )
+
+    @staticmethod
+    def _assinatura(path: str) -> Optional[str]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return f'{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}'
+
+    def chave(self, path: str, sheet, colunas: Optional[Iterable[str]]) -> Optional[str]:
+        assinatura = self._assinatura(path)
+        if assinatura is None:
+            return None
+        cols = '*' if colunas is None else '\x1f'.join(sorted(map(str, colunas)))
+        bruto = f'{assinatura}|{sheet!r}|{cols}'
+        return hashlib.sha1(bruto.encode('utf-8')).hexdigest()
+
+    # ---- abas ----
+    def abas(self, path: str) -> Optional[List[str]]:
+        assinatura = self._assinatura(path)
+        with self._lock:
+            return self._abas.get(assinatura) if assinatura else None
+
+    def guardar_abas(self, path: str, abas: List[str]):
+        assinatura = self._assinatura(path)
+        if assinatura:
+            with self._lock:
+                self._abas[assinatura] = list(abas)
+
+    # ---- DataFrames ----
+    def obter(self, path: str, sheet, colunas: Optional[Iterable[str]]) -> Optional[pd.DataFrame]:
+        chave = self.chave(path, sheet, colunas)
+        if chave is None:
+            return None
+        with self._lock:
+            item = self._memoria.get(chave)
+            if item is not None:
+                self._memoria.move_to_end(chave)
+                return item[0]
+        arquivo = self.pasta / f'{chave}.pkl'
+        try:
+            df = pd.read_pickle(arquivo)
+            os.utime(arquivo)  # marca como usado recentemente (LRU em disco)
+        except Exception:
+            return None
+        self._guardar_memoria(chave, df)
+        return df
+
+    def guardar(self, path: str, sheet, colunas: Optional[Iterable[str]], df: pd.DataFrame):
+        chave = self.chave(path, sheet, colunas)
+        if chave is None:
+            return
+        self._guardar_memoria(chave, df)
+        try:
+            self.pasta.mkdir(parents=True, exist_ok=True)
+            temporario = self.pasta / f'{chave}.tmp'
+            df.to_pickle(temporario)
+            os.replace(temporario, self.pasta / f'{chave}.pkl')
+            self._podar_disco()
+        except Exception:
+            pass  # cache em disco é só otimização
+
+    def limpar(self):
+        with self._lock:
+            self._memoria.clear()
+            self._bytes_memoria = 0
+            self._abas.clear()
+        for arq in self.pasta.glob('*.pkl'):
+            try:
+                arq.unlink()
+            except OSError:
+                pass
+
+    def _guardar_memoria(self, chave: str, df: pd.DataFrame):
+        tamanho = int(df.memory_usage(index=True, deep=True).sum())
+        if tamanho > self.max_memoria:
+            return
+        with self._lock:
+            antigo = self._memoria.pop(chave, None)
+            if antigo is not None:
+                self._bytes_memoria -= antigo[1]
+            self._memoria[chave] = (df, tamanho)
+            self._bytes_memoria += tamanho
+            while self._bytes_memoria > self.max_memoria and self._memoria:
+                _, (_, t) = self._memoria.popitem(last=False)
+                self._bytes_memoria -= t
+
+    def _podar_disco(self):
+        arquivos = []
+        for arq in self.pasta.glob('*.pkl'):
+            try:
+                st = arq.stat()
+            except OSError:
+                continue
+            arquivos.append((st.st_mtime, st.st_size, arq))
+        total = sum(t for _, t, _ in arquivos)
+        for _, t, arq in sorted(arquivos):
+            if total <= self.max_disco:
+                break
+            try:
+                arq.unlink()
+                total -= t
+            except OSError:
+                pass
+
+CACHE_PLANILHAS = CachePlanilhas.do_ambiente()
+
+class LeitorEmBlocos:
+    """Lê uma aba da planilha em blocos de `tamanho_bloco` linhas (DataFrames pequenos).
+
+    O motor é escolhido por `escolher_motor_leitura`. No openpyxl (`read_only`) a leitura é
+    em streaming e a memória fica limitada ao bloco atual; calamine e pandas leem a aba
+    inteira (bem mais rápido no caso do calamine) e ela é fatiada.
+    Com `colunas`, só os cabeçalhos listados são lidos (se nenhum bater, lê todos).
+    `total_estimado` vem da dimensão declarada na aba e pode ser None.
+    """
+
+    def __init__(self, path: str, sheet=0, tamanho_bloco: int = 5000,
+                 colunas: Optional[Iterable[str]] = COLUNAS_UTEIS, motor: Optional[str] = None,
+                 cache: Optional[CachePlanilhas] = None):
+        self.path = path
+        self.sheet = sheet
+        self.tamanho_bloco = max(1, tamanho_bloco)
+        self.colunas = frozenset(colunas) if colunas is not None else None
+        self.motor = escolher_motor_leitura(path, motor)
+        self.total_estimado: Optional[int] = None
+        # aba já lida antes: vem do cache e o motor passa a ser 'cache'
+        self._em_cache = cache.obter(path, sheet, self.colunas) if cache is not None else None
+        if self._em_cache is not None:
+            self.motor = 'cache'
+            self.total_estimado = len(self._em_cache)
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        if self._em_cache is not None:
+            return self._fatiar(self._em_cache)
+        if self.motor == 'openpyxl':
+            return self._iterar_openpyxl()
+        return self._iterar_pandas()
+
+    def _fatiar(self, df: pd.DataFrame) -> Iterator[pd.DataFrame]:
+        for i in range(0, len(df), self.tamanho_bloco):
+            yield df.iloc[i:i + self.tamanho_bloco]
+
+    def _usar_coluna(self, nome) -> bool:
+        return self.colunas is None or nome in self.colunas
+
+    def _iterar_openpyxl(self) -> Iterator[pd.DataFrame]:
+        import openpyxl
+
+        wb = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[self.sheet] if isinstance(self.sheet, int) else wb[self.sheet]
+            if ws.max_row:
+                self.total_estimado = max(ws.max_row - 1, 0)
+            linhas = ws.iter_rows(values_only=True)
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                return
+            todas = [c if c is not None else f'Unnamed: {i}' for i, c in enumerate(cabecalho)]
+            indices = [i for i, c in enumerate(todas) if self._usar_coluna(c)] or list(range(len(todas)))
+            colunas = [todas[i] for i in indices]
+            largura = len(todas)
+            bloco: List[tuple] = []
+            inicio = 0  # índice contínuo entre blocos, como no leitor do pandas
+            for linha in linhas:
+                if len(linha) != largura:
+                    linha = (tuple(linha) + (None,) * largura)[:largura]
+                valores = tuple(linha[i] for i in indices)
+                if all(v is None for v in valores):
+                    continue
+                bloco.append(valores)
+                if len(bloco) >= self.tamanho_bloco:
+                    yield pd.DataFrame(bloco, columns=colunas, index=range(inicio, inicio + len(bloco)))
+                    inicio += len(bloco)
+                    bloco = []
+            if bloco:
+                yield pd.DataFrame(bloco, columns=colunas, index=range(inicio, inicio + len(bloco)))
+        finally:
+            wb.close()
+
+    def _iterar_pandas(self) -> Iterator[pd.DataFrame]:
+        engine = 'calamine' if self.motor == 'calamine' else None
+        usecols = self._usar_coluna if self.colunas is not None else None
+        df = pd.read_excel(self.path, sheet_name=self.sheet, engine=engine, usecols=usecols)
+        if usecols is not None and len(df.columns) == 0:
+            # nenhum cabeçalho conhecido: só neste caso raro a aba é lida de novo, inteira
+            df = pd.read_excel(self.path, sheet_name=self.sheet, engine=engine)
+        self.total_estimado = len(df)
+        yield from self._fatiar(df)
+
+def _ler_nomes_abas(path: str) -> List[str]:
+    """Nomes das abas sem carregar as planilhas: calamine se houver, senão openpyxl read_only (.xlsx)."""
+    if _calamine_disponivel():
+        from python_calamine import CalamineWorkbook
+
+        wb = CalamineWorkbook.from_path(path)
+        try:
+            return list(wb.sheet_names)
+        finally:
+            wb.close()
+    if Path(path).suffix.lower() in ('.xlsx', '.xlsm'):
+        import openpyxl
+
+        wb = openpyxl.load_workbook(path, read_only=True)
+        try:
+            return list(wb.sheetnames)
+        finally:
+            wb.close()
+    with pd.ExcelFile(path) as xl:  # .xls sem calamine: leitor padrão do pandas
+        return list(xl.sheet_names)
+
+def listar_abas(path: str) -> List[str]:
+    abas = CACHE_PLANILHAS.abas(path)
+    if abas is None:
+        abas = _ler_nomes_abas(path)
+        CACHE_PLANILHAS.guardar_abas(path, abas)
+    return abas
+
+def registros_em_blocos(leitor: Iterable[pd.DataFrame], empresa: str,
+                        ao_rejeitar=None, duplicados: Optional[str] = None) -> Iterator[List[Tuple]]:
+    """Aplica rename/presets/formatação a cada bloco lido e gera as tuplas de inserção do bloco.
+
+    Só aceita as políticas de POLITICAS_DUPLICADOS_STREAMING (ValueError nas demais, antes de
+    ler o primeiro bloco): com 'primeira', um CNJ que já foi enviado é retirado dos blocos
+    seguintes (ver FiltroCnjsEnviados). `ao_rejeitar(relatorio)` recebe cada
+    RelatorioRejeicoes não vazio (CNJs inválidos e repetidos).
+    """
+    politica = politica_duplicados(duplicados)
+    if politica not in POLITICAS_DUPLICADOS_STREAMING:
+        raise ValueError(
+            f"A política de CNJs repetidos '{politica}' não é possível no envio em blocos: um bloco já "
+            f"enviado não pode ser desfeito. Use {' ou '.join(POLITICAS_DUPLICADOS_STREAMING)}, "
+            "ou envie sem blocos."
+        )
+    return _registros_em_blocos(leitor, empresa, ao_rejeitar, politica)
+
+def _registros_em_blocos(leitor: Iterable[pd.DataFrame], empresa: str, ao_rejeitar,
+                         politica: str) -> Iterator[List[Tuple]]:
+    enviados = FiltroCnjsEnviados() if politica != 'manter' else None
+    for bloco in leitor:
+        df = preparar_planilha(bloco, empresa, duplicados=politica)
+        relatorios = [df.attrs.get('cnjs_rejeitados'), df.attrs.get('cnjs_repetidos')]
+        if enviados is not None:
+            df, ja_enviados = enviados.filtrar(df)
+            relatorios.append(ja_enviados)
+        if ao_rejeitar:
+            for relatorio in relatorios:
+                if relatorio:
+                    ao_rejeitar(relatorio)
+        yield montar_registros(df)
+
+# Abaixo deste número de CNJs um único IN (...) é mais barato que criar a tabela temporária
+LIMITE_IN_DIRETO = 1000
+
+def _cnjs_existentes_tabela_temp(cur, cnjs: List[str]) -> List[str]:
+    """Carrega os CNJs numa tabela temporária da sessão e faz o JOIN com encerramento.
+
+    A tabela é criada com `CREATE ... SELECT cnj FROM encerramento LIMIT 0` para herdar
+    exatamente o tipo e a collation da coluna (evita 'Illegal mix of collations' no JOIN).
+    """
+    cur.execute("DROP TEMPORARY TABLE IF EXISTS tmp_cnjs_entrada")
+    cur.execute(f"CREATE TEMPORARY TABLE tmp_cnjs_entrada SELECT cnj FROM {TABELA_DESTINO} LIMIT 0")
+    try:
+        unicos = list(dict.fromkeys(cnjs))
+        for i in range(0, len(unicos), 5000):
+            cur.executemany(
+                "INSERT INTO tmp_cnjs_entrada (cnj) VALUES (%s)",
+                [(c,) for c in unicos[i:i + 5000]]
+            )
+        cur.execute(f"""
+            SELECT DISTINCT t.cnj
+            FROM tmp_cnjs_entrada t
+            JOIN {TABELA_DESTINO} e ON e.cnj = t.cnj
+        """)
+        return [row[0] for row in cur.fetchall()]
+    finally:
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS tmp_cnjs_entrada")
+
+def _cnjs_existentes_in_fatiado(cur, cnjs: List[str]) -> List[str]:
+    """IN (...) em fatias dimensionadas pelo max_allowed_packet do servidor."""
+    try:
+        cur.execute("SELECT @@max_allowed_packet")
+        pacote = int(cur.fetchone()[0])
+    except Exception:
+        pacote = 4 * 1024 * 1024
+    unicos = list(dict.fromkeys(cnjs))
+    tam_medio = max(len(str(c)) for c in unicos) + 4  # aspas, vírgula e espaço
+    fatia = max(100, min(10_000, (pacote // 2) // tam_medio))
+    existentes: List[str] = []
+    for i in range(0, len(unicos), fatia):
+        parte = unicos[i:i + fatia]
+        placeholders = ", ".join(["%s"] * len(parte))
+        cur.execute(f"SELECT DISTINCT cnj FROM {TABELA_DESTINO} WHERE cnj IN ({placeholders})", parte)
+        existentes.extend(row[0] for row in cur.fetchall())
+    return existentes
+
+def _de_volta(formas: Dict[str, str], encontradas: Iterable[str]) -> List[str]:
+    """CNJs informados (sem repetir) correspondentes às grafias `encontradas` no banco."""
+    return list(dict.fromkeys(formas.get(f, f) for f in encontradas))
+
+class ErroVerificacaoCnjs(Exception):
+    """A consulta de CNJs existentes falhou: sem ela não se sabe o que já está no banco.
+
+    Guarda o código do erro original em `errno`, para que `_erro_transitorio` reconheça uma
+    queda de conexão e o envio tente de novo.
+    """
+
+    def __init__(self, erro: BaseException):
+        super().__init__(f'Falha ao verificar CNJs existentes: {erro}')
+        self.errno = _codigo_erro(erro)
+
+def verificar_cnjs_existentes(cnjs: List[str], conn=None) -> List[str]:
+    """Verifica quais CNJs já existem no banco (gravados na máscara ou só com os dígitos, ver
+    `formas_cnjs`); devolve os CNJs como foram informados.
+
+    Listas grandes vão para uma tabela temporária + JOIN; se o usuário não puder criar
+    tabelas temporárias, cai no IN (...) fatiado. `conn` permite reaproveitar uma conexão
+    já emprestada do pool (ela não é devolvida aqui).
+    Se a consulta falhar levanta ErroVerificacaoCnjs: devolver [] faria o envio tratar como
+    novos CNJs que talvez já tenham sido gravados.
+    """
+    if not cnjs:
+        return []
+    propria = conn is None
+    if propria:
+        conn, cur = conectar_ao_mysql()
+        if not conn:
+            raise ErroVerificacaoCnjs(ErroConexao('Erro de conexão', 'sem conexão com o MySQL'))
+    else:
+        cur = conn.cursor()
+    formas = formas_cnjs(cnjs)
+    try:
+        if len(formas) <= LIMITE_IN_DIRETO:
+            return _de_volta(formas, _cnjs_existentes_in_fatiado(cur, list(formas)))
+        # a conexão pode ser a do envio, com linhas ainda não confirmadas (políticas 'grupo'/'lote'):
+        # uma falha aqui desfaz só até o SAVEPOINT, nunca a transação de quem chamou
+        cur.execute('SAVEPOINT verificar_cnjs')
+        try:
+            existentes = _cnjs_existentes_tabela_temp(cur, list(formas))
+        except Exception as e:
+            if _codigo_erro(e) in ERROS_CONEXAO_PERDIDA:
+                raise
+            # sem privilégio CREATE TEMPORARY TABLES: mesmo resultado por IN fatiado
+            log.info('Tabela temporária indisponível (%s); verificando CNJs por IN fatiado.', e)
+            cur.execute('ROLLBACK TO SAVEPOINT verificar_cnjs')
+            existentes = _cnjs_existentes_in_fatiado(cur, list(formas))
+        cur.execute('RELEASE SAVEPOINT verificar_cnjs')
+        return _de_volta(formas, existentes)
+    except Exception as e:
+        raise ErroVerificacaoCnjs(e) from e
+    finally:
+        try:
+            cur.close()
+            if propria:
+                conn.close()
+        except Exception:
+            pass
+
+
+def _separar_duplicados(registros: List[Tuple], conn=None) -> Tuple[List[int], List[str]]:
+    """Separa os registros cujo CNJ ainda não existe no banco. Retorna (posições_válidas, cnjs_duplicados)."""
+    # CNJ é o primeiro campo de cada tupla
+    cnjs_duplicados = verificar_cnjs_existentes([reg[0] for reg in registros if reg[0]], conn)
+    cnjs_duplicados_set = set(cnjs_duplicados)
+    return [i for i, reg in enumerate(registros) if reg[0] not in cnjs_duplicados_set], cnjs_duplicados
+
+# Tabela que recebe os INSERT/LOAD DATA do envio (os benchmarks apontam para uma cópia de rascunho)
+TABELA_DESTINO = 'encerramento'
+
+def _sql_insert() -> str:
+    cols = ", ".join(colunas_encerramento)
+    ph = ", ".join(["%s"] * len(colunas_encerramento))
+    return f"INSERT INTO {TABELA_DESTINO} ({cols}) VALUES ({ph})"
+
+# Motores de inserção disponíveis (DB_INSERT_ENGINE no .env ou combo "Motor" na tela)
+MOTORES_INSERCAO = {
+    'executemany': 'INSERT multi-linha (executemany)',
+    'load_data': 'LOAD DATA LOCAL INFILE (arquivo TSV temporário)',
+}
+
+# Erros que indicam LOAD DATA LOCAL desabilitado no servidor/cliente
+# (1148 = comando não permitido, 2068 = arquivo recusado pelo cliente, 3948 = local_infile desligado).
+ERROS_LOCAL_INFILE = {1148, 2068, 3948}
+
+# Linhas por arquivo TSV no motor load_data (cada arquivo = 1 comando LOAD DATA + commit)
+LINHAS_POR_ARQUIVO_TSV = 50_000
+
+def motor_insercao_padrao() -> str:
+    motor = obter_config_banco().get('motor_insercao', 'executemany')
+    return motor if motor in MOTORES_INSERCAO else 'executemany'
+
+def _local_infile_recusado(exc: BaseException) -> bool:
+    if _codigo_erro(exc) in ERROS_LOCAL_INFILE:
+        return True
+    msg = str(exc).lower()
+    return 'local infile' in msg or 'local data' in msg
+
+_ESCAPES_TSV = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+def _valor_tsv(v) -> str:
+    """Serializa um valor no formato padrão do LOAD DATA (\\N = NULL, escapes com barra invertida)."""
+    if v is None:
+        return '\\N'
+    if isinstance(v, bool):
+        return '1' if v else '0'
+    if isinstance(v, datetime):
+        return v.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, float):
+        return repr(v)
+    return str(v).translate(_ESCAPES_TSV)
+
+def _escrever_tsv(registros: List[Tuple]) -> str:
+    arq = tempfile.NamedTemporaryFile(
+        mode='w', encoding='utf-8', newline='', suffix='.tsv', prefix='encerramento_', delete=False
+    )
+    with arq:
+        for reg in registros:
+            arq.write('\t'.join(_valor_tsv(v) for v in reg))
+            arq.write('\n')
+    return arq.name
+
+def _sql_load_data() -> str:
+    cols = ", ".join(colunas_encerramento)
+    return (
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE {TABELA_DESTINO} "
+        "CHARACTER SET utf8mb4 "
+        "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' "
+        "LINES TERMINATED BY '\\n' "
+        f"({cols})"
+    )
+
+POLITICAS_COMMIT = {
+    'chunk': 'COMMIT a cada chunk (uma falha deixa o lote parcial, retomável)',
+    'grupo': 'COMMIT a cada N linhas ou S segundos (DB_COMMIT_ROWS / DB_COMMIT_SECONDS)',
+    'lote': 'uma transação por envio/cod_lote (tudo ou nada)',
+}
+
+@dataclass(frozen=True)
+class PoliticaCommit:
+    """Quando confirmar (COMMIT) durante um envio; ver POLITICAS_COMMIT.
+
+    'chunk' força um flush do redo log por chunk; 'lote' faz um só, mas segura os locks e o
+    undo até o fim e uma falha desfaz tudo; 'grupo' fica no meio.
+    """
+    modo: str = 'chunk'
+    linhas: int = 50000
+    segundos: float = 5.0
+
+    @classmethod
+    def de(cls, valor) -> 'PoliticaCommit':
+        """Aceita uma PoliticaCommit, um nome de POLITICAS_COMMIT ou None (padrão do .env)."""
+        if isinstance(valor, cls):
+            return valor
+        cfg = obter_config_banco()
+        modo = (valor or cfg.get('politica_commit') or 'chunk').strip().lower()
+        if modo not in POLITICAS_COMMIT:
+            log.warning('Política de commit desconhecida %r; usando chunk.', modo)
+            modo = 'chunk'
+        return cls(modo, linhas=cfg.get('commit_linhas', 50000), segundos=cfg.get('commit_segundos', 5.0))
+
+class _ControleCommit:
+    """Estado da PoliticaCommit durante um envio (um objeto por envio, não compartilhar entre threads).
+
+    Os `ao_confirmar` dos chunks enviados ficam pendentes até o COMMIT que os cobre, de modo
+    que diário e contagens só enxergam o que de fato está no banco.
+    """
+
+    def __init__(self, politica: Optional[PoliticaCommit] = None, ao_enviar=None):
+        self.politica = politica or PoliticaCommit()
+        self.ao_enviar = ao_enviar
+        self.enviadas = 0          # linhas enviadas que valem (confirmadas + pendentes)
+        self.nao_confirmadas = 0
+        self._externas = 0         # pendentes de trechos anteriores (ex.: blocos já enviados no streaming)
+        self._pendentes: List = []
+        self._desde = time.monotonic()
+        self.commits = 0           # COMMITs efetivamente emitidos neste envio
+
+    def iniciar_trecho(self):
+        self._externas = self.nao_confirmadas
+
+    @property
+    def perderia_externas(self) -> bool:
+        """Um ROLLBACK agora desfaria linhas de trechos anteriores, que não dá para reenviar daqui."""
+        return self._externas > 0
+
+    def enviado(self, conn, linhas: int, ao_confirmar=None):
+        self.enviadas += linhas
+        self.nao_confirmadas += linhas
+        if ao_confirmar:
+            self._pendentes.append(ao_confirmar)
+        if self.ao_enviar:
+            self.ao_enviar(self.enviadas)
+        p = self.politica
+        if p.modo == 'chunk' or (p.modo == 'grupo' and (
+                self.nao_confirmadas >= p.linhas or time.monotonic() - self._desde >= p.segundos)):
+            self.confirmar(conn)
+
+    def confirmar(self, conn):
+        if not self.nao_confirmadas and not self._pendentes:
+            return
+        conn.commit()
+        self.commits += 1
+        pendentes, self._pendentes = self._pendentes, []
+        self.nao_confirmadas = self._externas = 0
+        self._desde = time.monotonic()
+        for ao_confirmar in pendentes:
+            ao_confirmar()
+
+    def descartar(self):
+        """Depois de um ROLLBACK (ou de perder a conexão): esquece o que não foi confirmado."""
+        self.enviadas -= self.nao_confirmadas
+        self.nao_confirmadas = self._externas = 0
+        self._pendentes = []
+        self._desde = time.monotonic()
+
+ERROS_PACOTE_GRANDE = {1153, 2020}  # ER_NET_PACKET_TOO_LARGE (servidor) / CR_NET_PACKET_TOO_LARGE (cliente)
+
+class LoteAdaptativo:
+    """Escolhe o tamanho de cada chunk do INSERT multi-linha enquanto o envio acontece.
+
+    O teto vem do max_allowed_packet do servidor (metade dele, pelo tamanho médio de uma
+    linha). Enquanto a vazão (linhas/s) melhora, o chunk dobra; quando para de melhorar,
+    volta ao melhor tamanho visto e fica nele, tentando crescer de novo a cada
+    RETESTAR_A_CADA chunks. O RTT medido separa o custo fixo do custo por linha, para que
+    nenhum chunk passe de ALVO_MAX_S (lock wait timeout em links lentos). Erros cortam pela metade.
+    """
+    MINIMO = 50
+    MAXIMO = 20000
+    ALVO_MAX_S = 2.0
+    FRACAO_PACOTE = 0.5
+    GANHO_MINIMO = 1.05
+    RETESTAR_A_CADA = 20
+
+    def __init__(self, inicial: int = 500, rtt: float = 0.0, bytes_por_linha: Optional[int] = None,
+                 max_pacote: Optional[int] = None):
+        self.rtt = rtt
+        self.bytes_por_linha = bytes_por_linha
+        self.max_pacote = max_pacote
+        self.teto = self.MAXIMO
+        if max_pacote and bytes_por_linha:
+            self.teto = max(self.MINIMO, min(self.MAXIMO, int(max_pacote * self.FRACAO_PACOTE / bytes_por_linha)))
+        self.tamanho = max(self.MINIMO, min(inicial, self.teto))
+        self.crescendo = True
+        self.melhor: Tuple[int, float] = (self.tamanho, 0.0)  # (tamanho, linhas/s)
+        self._estavel_ha = 0
+        self.historico: List[Tuple[int, float]] = []  # (tamanho, linhas/s) de cada chunk
+
+    @classmethod
+    def para_conexao(cls, cur, registros: List[Tuple], inicial: int = 500) -> 'LoteAdaptativo':
+        """Mede RTT e max_allowed_packet na conexão de `cur` e o tamanho médio das linhas."""
+        rtt = float('inf')
+        for _ in range(3):
+            t0 = time.perf_counter()
+            cur.execute('SELECT 1')
+            cur.fetchall()
+            rtt = min(rtt, time.perf_counter() - t0)
+        max_pacote = None
+        try:
+            cur.execute('SELECT @@max_allowed_packet')
+            linha = cur.fetchone()
+            max_pacote = int(linha[0]) if linha and linha[0] else None
+        except Exception as e:
+            log.info('max_allowed_packet indisponível: %s', e)
+        amostra = registros[:200]
+        bytes_por_linha = None
+        if amostra:
+            # ~ como o conector serializa: texto entre aspas, vírgulas e parênteses
+            media = sum(sum(len(str(v)) + 3 for v in reg) for reg in amostra) / len(amostra)
+            bytes_por_linha = int(media * 1.2) + 2
+        lote = cls(inicial, rtt=rtt, bytes_por_linha=bytes_por_linha, max_pacote=max_pacote)
+        log.info('Lote adaptativo: RTT %.1f ms, ~%s bytes/linha, max_allowed_packet %s -> começa com %d (teto %d).',
+                 rtt * 1000, bytes_por_linha, max_pacote, lote.tamanho, lote.teto)
+        return lote
+
+    def registrar(self, linhas: int, segundos: float):
+        """Chamado após cada chunk confirmado; ajusta `tamanho` para o próximo."""
+        if linhas <= 0 or segundos <= 0:
+            return
+        vazao = linhas / segundos
+        self.historico.append((linhas, vazao))
+        if linhas < self.tamanho:
+            return  # último chunk (menor): não diz nada sobre o tamanho atual
+        custo_linha = max(segundos - self.rtt, segundos * 0.1) / linhas
+        limite_tempo = max(self.MINIMO, int((self.ALVO_MAX_S - self.rtt) / custo_linha))
+        if self.crescendo:
+            if vazao > self.melhor[1] * self.GANHO_MINIMO:
+                self.melhor = (self.tamanho, vazao)
+                novo = min(self.tamanho * 2, self.teto, limite_tempo)
+                self.crescendo = novo > self.tamanho
+            else:
+                novo = self.melhor[0] if self.melhor[1] >= vazao else self.tamanho
+                self.crescendo = False
+            self._estavel_ha = 0
+        else:
+            self._estavel_ha += 1
+            novo = min(self.tamanho, limite_tempo)
+            if self._estavel_ha >= self.RETESTAR_A_CADA and novo < self.teto:
+                self.melhor = (novo, vazao)
+                novo = min(novo * 2, self.teto, limite_tempo)
+                self.crescendo = novo > self.tamanho
+                self._estavel_ha = 0
+        novo = max(self.MINIMO, novo)
+        if novo != self.tamanho:
+            log.info('Lote adaptativo: %d -> %d (%.0f linhas/s, %.0f ms/chunk).',
+                     self.tamanho, novo, vazao, segundos * 1000)
+            self.tamanho = novo
+
+    def falhou(self, exc: BaseException):
+        novo = max(self.MINIMO, self.tamanho // 2)
+        if _codigo_erro(exc) in ERROS_PACOTE_GRANDE:
+            self.teto = novo  # não volta a crescer acima do que estourou o pacote
+        log.warning('Lote adaptativo: %d -> %d após erro (%s).', self.tamanho, novo, exc)
+        self.tamanho = novo
+        self.melhor = (novo, 0.0)
+        self.crescendo = False
+        self._estavel_ha = 0
+
+    def resumo(self) -> str:
+        if not self.historico:
+            return 'nenhum chunk enviado'
+        tamanhos = sorted({n for n, _ in self.historico})
+        melhor = max(self.historico, key=lambda h: h[1])
+        return (f'{len(self.historico)} chunks, tamanhos {tamanhos[0]}–{tamanhos[-1]}, '
+                f'melhor {melhor[0]} linhas ({melhor[1]:,.0f} linhas/s)')
+
+def _gravar_executemany(conn, cur, registros: List[Tuple], lote, ao_confirmar=None, controle=None) -> int:
+    """INSERT multi-linha: o executemany do conector agrupa cada chunk em um único INSERT ... VALUES (...), (...).
+
+    `lote` é um tamanho fixo ou um LoteAdaptativo (consultado a cada chunk).
+    `controle` (_ControleCommit) decide depois de cada chunk se já é hora do COMMIT.
+    """
+    sql = _sql_insert()
+    controle = controle or _ControleCommit()
+    adaptativo = isinstance(lote, LoteAdaptativo)
+    total = 0
+    i = 0
+    while i < len(registros):
+        chunk = registros[i:i + (lote.tamanho if adaptativo else lote)]
+        t0 = time.perf_counter()
+        cur.executemany(sql, chunk)
+        total += cur.rowcount or 0
+        i += len(chunk)
+        controle.enviado(conn, len(chunk), ao_confirmar and (lambda t=total, c=i: ao_confirmar(t, c)))
+        if adaptativo:
+            lote.registrar(len(chunk), time.perf_counter() - t0)
+    return total
+
+def _gravar_load_data(conn, cur, registros: List[Tuple], ao_confirmar=None, controle=None) -> int:
+    sql = _sql_load_data()
+    controle = controle or _ControleCommit()
+    total = 0
+    for i in range(0, len(registros), LINHAS_POR_ARQUIVO_TSV):
+        parte = registros[i:i + LINHAS_POR_ARQUIVO_TSV]
+        caminho = _escrever_tsv(parte)
+        try:
+            cur.execute(sql, (caminho,))
+            total += cur.rowcount or 0
+        finally:
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+        fim = i + len(parte)
+        controle.enviado(conn, len(parte), ao_confirmar and (lambda t=total, c=fim: ao_confirmar(t, c)))
+    return total
+
+def _gravar_registros(conn, cur, registros: List[Tuple], lote, motor: str, ao_confirmar=None, controle=None):
+    """Grava `registros` com o motor escolhido e devolve (inseridos, cursor, motor_usado).
+
+    `ao_confirmar(inseridos, confirmados)` é chamado após cada COMMIT (ver `controle`).
+    Se o servidor/cliente recusar LOAD DATA LOCAL, a conexão é refeita e os registros ainda
+    não confirmados seguem pelo INSERT multi-linha. O cursor devolvido pode ser novo nesse caso.
+    """
+    controle = controle or _ControleCommit()
+    if motor != 'load_data':
+        return _gravar_executemany(conn, cur, registros, lote, ao_confirmar, controle), cur, motor
+    feitos = [0, 0]
+
+    def confirmou(inseridos, confirmados):
+        feitos[:] = [inseridos, confirmados]
+        if ao_confirmar:
+            ao_confirmar(inseridos, confirmados)
+
+    try:
+        return _gravar_load_data(conn, cur, registros, confirmou, controle), cur, motor
+    except Exception as e:
+        if not _local_infile_recusado(e) or controle.perderia_externas:
+            raise
+    # a recusa deixa o protocolo em estado incerto: troca a conexão física antes de seguir
+    try:
+        cur.close()
+    except Exception:
+        pass
+    controle.descartar()
+    conn._reconectar()
+    cur = conn.cursor()
+    base_ins, base_conf = feitos
+    if lote is None:
+        lote = LoteAdaptativo.para_conexao(cur, registros[base_conf:])
+
+    def confirmou_insert(inseridos, confirmados):
+        if ao_confirmar:
+            ao_confirmar(base_ins + inseridos, base_conf + confirmados)
+
+    inseridos = _gravar_executemany(conn, cur, registros[base_conf:], lote, confirmou_insert, controle)
+    return base_ins + inseridos, cur, 'executemany'
+
+# =========================
+# Retomada de envios (checkpoints e novas tentativas)
+# =========================
+ERROS_TRANSITORIOS = ERROS_CONEXAO_PERDIDA | {1040, 1205, 1213, 2003}  # + too many connections, lock wait, deadlock
+TENTATIVAS_ENVIO = 5
+ESPERA_INICIAL_S = 1.0
+ESPERA_MAXIMA_S = 30.0
+
+def _pasta_diarios_padrao() -> Path:
+    return Path(os.getenv('DB_CHECKPOINT_DIR') or _pasta_cache_padrao().parent / 'checkpoints')
+
+# Linhas acrescentadas ao diário antes de regravar o retrato (ver DiarioEnvio)
+DIARIO_LINHAS_COMPACTAR = 10_000
+
+def hash_arquivo(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+class DiarioEnvio:
+    """Diário (checkpoint) de um envio: quais posições de registros já foram confirmadas no banco.
+
+    A chave é o hash do conteúdo da planilha + aba + cod_lote, e as posições são índices na
+    lista de registros montada a partir dela (antes do filtro de duplicados). Reenviar a mesma
+    planilha com o mesmo preset pula o que já entrou e segue do primeiro chunk não confirmado.
+
+    Em memória é um mapa de bits (uma posição por byte), então marcar e consultar custam o
+    tamanho do chunk, mesmo com as partições intercaladas do envio paralelo. No disco, a
+    primeira linha é um retrato {'total', 'faixas'} e cada `registrar` só acrescenta as faixas
+    contíguas novas ([ini, fim] por linha); o retrato é regravado quando o acréscimo passa de
+    DIARIO_LINHAS_COMPACTAR e do dobro das faixas do retrato. O arquivo é apagado quando o
+    envio termina sem erro.
+    """
+
+    def __init__(self, chave: str, total: Optional[int] = None, pasta: Optional[Path] = None):
+        self.chave = chave
+        self.total = total
+        self.caminho = Path(pasta or _pasta_diarios_padrao()) / f'{chave}.json'
+        self._mapa = np.zeros(total or 0, dtype=bool)
+        self._confirmados = 0
+        self._faixas_retrato = 0
+        self._linhas_acrescentadas = 0
+        self._lock = threading.Lock()
+        self._carregar()
+
+    @classmethod
+    def para_planilha(cls, path: str, sheet, empresa: str, total: Optional[int] = None,
+                      pasta: Optional[Path] = None, duplicados: Optional[str] = None) -> 'DiarioEnvio':
+        """Diário do envio de `path`/`sheet` com o preset `empresa` (o cod_lote vem do preset).
+
+        A política de CNJs repetidos (`duplicados`, ver `politica_duplicados`) entra na chave: com
+        'primeira' e 'ultima' a contagem é a mesma mas as linhas não, então as posições de um
+        diário não valem para um envio com outra política.
+        `total` (quantidade de registros) é conferido contra o diário salvo, quando conhecido.
+        """
+        cod_lote = COMPANY_PRESETS.get(empresa, {}).get('cod_lote') or empresa
+        bruto = f'{hash_arquivo(path)}|{sheet!r}|{cod_lote}|{politica_duplicados(duplicados)}'
+        return cls(hashlib.sha1(bruto.encode('utf-8')).hexdigest(), total=total, pasta=pasta)
+
+    def _carregar(self):
+        try:
+            with open(self.caminho, encoding='utf-8') as f:
+                linhas = f.read().splitlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            log.warning('Checkpoint ilegível (%s), ignorando: %s', self.caminho, e)
+            return
+        try:
+            dados = json.loads(linhas[0]) if linhas else {}
+        except ValueError as e:
+            log.warning('Checkpoint ilegível (%s), ignorando: %s', self.caminho, e)
+            return
+        if self.total is not None and dados.get('total') not in (None, self.total):
+            log.warning('Checkpoint %s é de %s registros, não %s; ignorando.', self.chave, dados.get('total'), self.total)
+            return
+        faixas = [tuple(f) for f in dados.get('faixas', [])]
+        for linha in linhas[1:]:
+            try:
+                faixas.append(tuple(json.loads(linha)))
+            except ValueError:
+                break  # última linha cortada por uma queda no meio da escrita
+        if faixas:
+            inicios, fins = np.asarray(faixas, dtype=np.int64).T
+            # +1 no início e -1 no fim de cada faixa: a soma acumulada > 0 cobre todas de uma vez
+            cobertura = np.zeros(int(fins.max()) + 1, dtype=np.int64)
+            np.add.at(cobertura, inicios, 1)
+            np.add.at(cobertura, fins, -1)
+            self._garantir(len(cobertura) - 1)
+            self._mapa[:len(cobertura) - 1] = np.cumsum(cobertura[:-1]) > 0
+            self._confirmados = int(np.count_nonzero(self._mapa))
+        self._faixas_retrato = len(dados.get('faixas', []))
+        self._linhas_acrescentadas = len(faixas) - self._faixas_retrato
+
+    def _garantir(self, tamanho: int):
+        if tamanho > len(self._mapa):
+            # no streaming o total não é conhecido: cresce dobrando
+            maior = np.zeros(max(tamanho, 2 * len(self._mapa)), dtype=bool)
+            maior[:len(self._mapa)] = self._mapa
+            self._mapa = maior
+
+    @property
+    def faixas(self) -> List[List[int]]:
+        """Faixas [ini, fim) confirmadas, ordenadas e disjuntas."""
+        bordas = np.flatnonzero(np.diff(np.concatenate(([False], self._mapa, [False])).view(np.int8)))
+        return bordas.reshape(-1, 2).tolist()
+
+    def _salvar(self):
+        """Regrava o retrato (faixas atuais) e zera o acréscimo."""
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        faixas = self.faixas
+        tmp = self.caminho.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'total': self.total, 'faixas': faixas, 'atualizado': datetime.now().isoformat()}, f)
+            f.write('\n')
+        os.replace(tmp, self.caminho)
+        self._faixas_retrato = len(faixas)
+        self._linhas_acrescentadas = 0
+
+    def _acrescentar(self, faixas: List[List[int]]):
+        if not self.caminho.exists():
+            self._salvar()
+            return
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            f.write(''.join(f'[{ini}, {fim}]\n' for ini, fim in faixas))
+        self._linhas_acrescentadas += len(faixas)
+        if self._linhas_acrescentadas > max(DIARIO_LINHAS_COMPACTAR, 2 * self._faixas_retrato):
+            self._salvar()
+
+    @property
+    def confirmados(self) -> int:
+        return self._confirmados
+
+    def ja_confirmado(self, posicao: int) -> bool:
+        return posicao < len(self._mapa) and bool(self._mapa[posicao])
+
+    def pendentes(self, inicio: int, fim: int) -> List[int]:
+        """Posições de [inicio, fim) que ainda não foram confirmadas."""
+        conhecidas = self._mapa[inicio:fim]
+        pendentes = (np.flatnonzero(~conhecidas) + inicio).tolist()
+        pendentes.extend(range(max(inicio, len(self._mapa)), fim))
+        return pendentes
+
+    def registrar(self, posicoes: Iterable[int]):
+        """Marca posições como gravadas (já commitadas) e acrescenta as faixas novas ao diário."""
+        novas = np.unique(np.fromiter(posicoes, dtype=np.int64))
+        if not len(novas):
+            return
+        # posições seguidas viram uma faixa só
+        quebras = np.flatnonzero(np.diff(novas) != 1) + 1
+        inicios = novas[np.r_[0, quebras]]
+        fins = novas[np.r_[quebras - 1, len(novas) - 1]] + 1
+        with self._lock:
+            self._garantir(int(fins[-1]))
+            self._confirmados += len(novas) - int(np.count_nonzero(self._mapa[novas]))
+            self._mapa[novas] = True
+            try:
+                self._acrescentar(np.column_stack((inicios, fins)).tolist())
+            except OSError as e:
+                log.warning('Não foi possível gravar o checkpoint %s: %s', self.caminho, e)
+
+    def concluir(self):
+        with self._lock:
+            self._mapa = np.zeros(0, dtype=bool)
+            self._confirmados = 0
+            try:
+                self.caminho.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                log.warning('Não foi possível apagar o checkpoint %s: %s', self.caminho, e)
+
+def abrir_diario(path: Optional[str], sheet, empresa: str, total: Optional[int] = None,
+                 duplicados: Optional[str] = None) -> Optional[DiarioEnvio]:
+    """DiarioEnvio da planilha, ou None (sem retomada) se o arquivo não puder ser lido."""
+    if not path:
+        return None
+    try:
+        return DiarioEnvio.para_planilha(path, sheet, empresa, total=total, duplicados=duplicados)
+    except OSError as e:
+        log.warning('Sem checkpoint para %s: %s', path, e)
+        return None
+
+def _erro_transitorio(exc: BaseException) -> bool:
+    return isinstance(exc, ErroConexao) or _codigo_erro(exc) in ERROS_TRANSITORIOS
+
+def _gravar_com_retentativas(conn, cur, registros: List[Tuple], lote, motor: str, ao_confirmar=None,
+                             controle: Optional[_ControleCommit] = None, confirmar_no_fim: bool = True):
+    """Como `_gravar_registros`, mas sobrevive a erros transitórios do MySQL.
+
+    Numa queda de conexão, lock wait timeout ou deadlock o chunk corrente é desfeito e, após
+    1s, 2s, 4s... (até TENTATIVAS_ENVIO vezes seguidas sem progresso), o envio continua do
+    primeiro chunk não confirmado.
+    Se a conexão caiu durante um COMMIT, os CNJs já presentes no banco no início do restante
+    são contados como gravados em vez de serem reenviados. Com LoteAdaptativo, cada erro
+    (inclusive max_allowed_packet estourado) também reduz o chunk.
+    Se o ROLLBACK desfizer linhas de trechos anteriores ainda não confirmados (política 'lote'
+    ou 'grupo' no streaming), não há como reenviá-las daqui e o erro sobe. Com `confirmar_no_fim`,
+    o COMMIT das linhas que a política deixou pendentes também faz parte das tentativas.
+    `ao_confirmar(inseridos, confirmados)`: `confirmados` = quantos registros do início da lista já estão no banco.
+    Retorna (inseridos, cursor, motor_usado).
+    """
+    controle = controle or _ControleCommit()
+    controle.iniciar_trecho()
+    inseridos = confirmados = 0
+    tentativa = 0
+    conf_ultima_falha = 0
+    queda = False
+    while True:
+        base_ins, base_conf = inseridos, confirmados
+
+        def confirmou(parcial_ins, parcial_conf):
+            nonlocal inseridos, confirmados
+            inseridos, confirmados = base_ins + parcial_ins, base_conf + parcial_conf
+            if ao_confirmar:
+                ao_confirmar(inseridos, confirmados)
+
+        try:
+            if queda:
+                conn._reconectar()
+                cur = conn.cursor()
+                restante = registros[confirmados:]
+                existentes = set(verificar_cnjs_existentes([r[0] for r in restante if r[0]], conn))
+                em_voo = 0
+                while em_voo < len(restante) and restante[em_voo][0] in existentes:
+                    em_voo += 1
+                if em_voo:
+                    log.warning('%d registro(s) do chunk interrompido já estavam gravados.', em_voo)
+                    confirmou(em_voo, em_voo)
+                    base_ins, base_conf = inseridos, confirmados
+                queda = False
+            parcial, cur, motor = _gravar_registros(conn, cur, registros[confirmados:], lote, motor, confirmou,
+                                                    controle)
+            if confirmar_no_fim:
+                controle.confirmar(conn)
+            return base_ins + parcial, cur, motor
+        except Exception as e:
+            if confirmados > conf_ultima_falha:
+                tentativa = 0  # houve progresso desde a última falha: novo ciclo de esperas
+            conf_ultima_falha = confirmados
+            adaptativo = isinstance(lote, LoteAdaptativo)
+            pacote_grande = adaptativo and _codigo_erro(e) in ERROS_PACOTE_GRANDE and lote.tamanho > lote.MINIMO
+            if not (_erro_transitorio(e) or pacote_grande) or tentativa >= TENTATIVAS_ENVIO \
+                    or controle.perderia_externas:
+                raise
+            controle.descartar()
+            if adaptativo:
+                lote.falhou(e)
+            # o servidor derruba a conexão depois de um pacote grande demais
+            queda = queda or pacote_grande or isinstance(e, ErroConexao) or _codigo_erro(e) in ERROS_CONEXAO_PERDIDA
+            espera = 0.0 if not _erro_transitorio(e) else min(ESPERA_INICIAL_S * 2 ** tentativa, ESPERA_MAXIMA_S)
+            tentativa += 1
+            log.warning('Erro no envio (%s); %d/%d registros confirmados. Tentativa %d/%d em %.0fs.',
+                        e, confirmados, len(registros), tentativa, TENTATIVAS_ENVIO, espera)
+            if not queda:
+                try:
+                    conn.rollback()
+                except Exception:
+                    queda = True
+            time.sleep(espera)
+
+LINHAS_MIN_POR_CONEXAO = 5000  # abaixo disso, abrir outra conexão não compensa
+
+def _particionar_por_cnj(registros: List[Tuple], partes: int) -> List[List[int]]:
+    """Índices de `registros` em até `partes` partições pelo CRC32 do CNJ, mantendo a ordem.
+
+    O mesmo CNJ cai sempre na mesma partição, então duas conexões nunca disputam um CNJ.
+    """
+    particoes: List[List[int]] = [[] for _ in range(partes)]
+    for i, reg in enumerate(registros):
+        particoes[zlib.crc32(str(reg[0] or '').encode('utf-8')) % partes].append(i)
+    return [p for p in particoes if p]
+
+def _conexoes_extras(quantas: int) -> List[ConexaoPooled]:
+    """Até `quantas` conexões a mais do pool, sem esperar: se o pool estiver cheio, usa menos."""
+    extras: List[ConexaoPooled] = []
+    for _ in range(quantas):
+        try:
+            extras.append(POOL_CONEXOES.adquirir(espera=0))
+        except ErroConexao as e:
+            log.info('Envio paralelo com %d conexão(ões) a menos: %s', quantas - len(extras), e.mensagem)
+            break
+    return extras
+
+def inserir_em_lotes(registros: List[Tuple], lote: Optional[int] = None, progress_cb=None,
+                     motor: Optional[str] = None, diario: Optional[DiarioEnvio] = None,
+                     commit=None, conexoes: Optional[int] = None) -> Tuple[int, List[str]]:
+    """Retorna (total_inserido, lista_cnjs_duplicados).
+
+    Com `diario` (ver DiarioEnvio.para_planilha), as posições já gravadas num envio anterior
+    são puladas e cada chunk confirmado é anotado; `total_inserido` inclui as já gravadas antes.
+    Erros transitórios do MySQL são repetidos com espera exponencial (`_gravar_com_retentativas`).
+    Se ainda assim falhar, avisa e devolve o que chegou a ser gravado.
+    Sem `lote`, o tamanho dos chunks é ajustado durante o envio (LoteAdaptativo).
+    `commit` é uma PoliticaCommit ou um nome de POLITICAS_COMMIT (padrão: DB_COMMIT_POLICY).
+
+    Com `conexoes` > 1 (padrão: DB_INSERT_CONNECTIONS), os registros já filtrados são divididos
+    por hash do CNJ e enviados em paralelo, cada partição numa conexão do pool (as que estiverem
+    livres). O filtro de duplicados roda uma vez, antes da divisão. Com a política 'lote' o envio
+    continua numa conexão só, já que uma transação não atravessa conexões.
+    """
+    motor = motor or motor_insercao_padrao()
+    politica = PoliticaCommit.de(commit)
+    if conexoes is None:
+        conexoes = obter_config_banco().get('conexoes_envio', 1)
+    posicoes = diario.pendentes(0, len(registros)) if diario else list(range(len(registros)))
+    ja_gravados = len(registros) - len(posicoes)
+    if ja_gravados:
+        log.info('Retomando envio: %d de %d registros já gravados.', ja_gravados, len(registros))
+    if not posicoes:
+        if diario:
+            diario.concluir()
+        return ja_gravados, []
+    conn, cur = conectar_ao_mysql()
+    if not conn:
+        return ja_gravados, []
+
+    pendentes = [registros[p] for p in posicoes] if ja_gravados else registros
+    try:
+        validas, cnjs_duplicados = _separar_duplicados(pendentes, conn)
+    except ErroVerificacaoCnjs as e:
+        # sem saber o que já existe, enviar às cegas poderia duplicar linhas: nada é enviado
+        try:
+            cur.close()
+            conn.close()
+        except Exception:
+            pass
+        notificar_erro('Erro MySQL', f'{e}\n\nNenhum registro foi enviado; tente novamente.')
+        return ja_gravados, []
+    posicoes = [posicoes[i] for i in validas]
+    registros_validos = [pendentes[i] for i in validas]
+    if not registros_validos:
+        cur.close()
+        conn.close()
+        if diario:
+            diario.concluir()
+        return ja_gravados, cnjs_duplicados
+
+    partes = min(max(1, conexoes), max(1, len(registros_validos) // LINHAS_MIN_POR_CONEXAO))
+    if politica.modo == 'lote':
+        partes = 1
+    extras = _conexoes_extras(partes - 1) if partes > 1 else []
+    particoes = _particionar_por_cnj(registros_validos, len(extras) + 1)
+    if len(particoes) > 1:
+        log.info('Envio paralelo: %d registros em %d conexões (%s).', len(registros_validos), len(particoes),
+                 ', '.join(str(len(p)) for p in particoes))
+
+    lock = threading.Lock()
+    enviadas = [0] * len(particoes)
+    confirmadas = [0] * len(particoes)
+    inseridas = [0] * len(particoes)
+    ultimo_progresso = [0]
+
+    def enviar(n: int, conexao, cursor):
+        """Grava a partição `n` em `conexao`; devolve o cursor (pode ter sido trocado)."""
+        indices = particoes[n]
+        regs = registros_validos if len(particoes) == 1 else [registros_validos[i] for i in indices]
+        pos = posicoes if len(particoes) == 1 else [posicoes[i] for i in indices]
+
+        def ao_confirmar(_total, ate):
+            if diario:
+                diario.registrar(pos[confirmadas[n]:ate])
+            with lock:
+                confirmadas[n] = ate
+
+        def ao_enviar(quantas):
+            # várias threads: soma sob o lock e só publica valores crescentes
+            with lock:
+                enviadas[n] = quantas
+                soma = sum(enviadas)
+                if soma <= ultimo_progresso[0]:
+                    return
+                ultimo_progresso[0] = soma
+                if progress_cb:
+                    progress_cb(ja_gravados + min(soma, len(registros_validos)), len(registros))
+
+        lote_n = lote
+        if lote_n is None and motor != 'load_data':
+            lote_n = LoteAdaptativo.para_conexao(cursor, regs)
+        try:
+            inseridas[n], cursor, _ = _gravar_com_retentativas(conexao, cursor, regs, lote_n, motor, ao_confirmar,
+                                                               _ControleCommit(politica, ao_enviar))
+        except Exception:
+            try:
+                conexao.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            if isinstance(lote_n, LoteAdaptativo):
+                log.info('Lote adaptativo%s: %s.', f' [{n + 1}/{len(particoes)}]' if len(particoes) > 1 else '',
+                         lote_n.resumo())
+        return cursor
+
+    def enviar_em_extra(n: int):
+        conexao = extras[n - 1]
+        cursor = conexao.cursor()
+        try:
+            cursor = enviar(n, conexao, cursor)
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    erros: List[BaseException] = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(extras)), thread_name_prefix='envio') as executor:
+            futuros = [executor.submit(enviar_em_extra, n) for n in range(1, len(particoes))]
+            try:
+                cur = enviar(0, conn, cur)
+            except (mysql.connector.Error, ErroConexao, ErroVerificacaoCnjs) as e:
+                erros.append(e)
+            for fut in futuros:
+                try:
+                    fut.result()
+                except (mysql.connector.Error, ErroConexao, ErroVerificacaoCnjs) as e:
+                    erros.append(e)
+    finally:
+        for extra in extras:
+            extra.close()
+        try:
+            cur.close()
+            conn.close()
+        except Exception:
+            pass
+
+    gravados = ja_gravados + sum(confirmadas)
+    if erros:
+        if gravados:
+            aviso = (f'\n\n{gravados} de {len(registros)} registro(s) já estão gravados; '
+                     'reenvie a mesma planilha para continuar do próximo lote.')
+        else:
+            aviso = '\n\nNenhum registro foi gravado (a transação foi desfeita).'
+        notificar_erro('Erro MySQL', f'Falha ao inserir registros:\n{erros[0]}{aviso}')
+        return gravados, cnjs_duplicados
+
+    # conferência: cada partição deve ter inserido exatamente o que enviou
+    total = sum(inseridas)
+    if total != len(registros_validos):
+        log.warning('Conferência do envio: %d inseridos para %d enviados (por conexão: %s).',
+                    total, len(registros_validos),
+                    ', '.join(f'{i}/{len(p)}' for i, p in zip(inseridas, particoes)))
+    if diario:
+        diario.concluir()
+    return ja_gravados + total, cnjs_duplicados
+
+def inserir_em_streaming(blocos: Iterable[List[Tuple]], lote: Optional[int] = None, progress_cb=None,
+                         motor: Optional[str] = None, diario: Optional[DiarioEnvio] = None,
+                         commit=None) -> Tuple[int, List[str]]:
+    """Insere registros que chegam em blocos (ver `registros_em_blocos`), à medida que são produzidos.
+
+    A verificação de duplicados é feita bloco a bloco e a mesma conexão do pool é usada
+    do começo ao fim. `progress_cb(inseridos, lidos)` é chamado a cada chunk enviado.
+    Com `diario`, as posições (contadas desde a primeira linha lida) já gravadas são puladas.
+    Com a política de commit 'lote' a planilha inteira vai numa transação só.
+    Retorna (total_inserido, lista_cnjs_duplicados), como `inserir_em_lotes`.
+    """
+    motor = motor or motor_insercao_padrao()
+    total = 0
+    lidos = 0
+    gravados = [0]  # só o que já está no banco (confirmado ou pulado pelo diário)
+    cnjs_duplicados: List[str] = []
+    controle = _ControleCommit(PoliticaCommit.de(commit))
+    conn, cur = conectar_ao_mysql()
+    if not conn:
+        return 0, []
+
+    def anotar_bloco(posicoes: List[int], base: int):
+        # com commit 'grupo'/'lote' o ao_confirmar de um bloco pode rodar só durante um bloco seguinte
+        anotados = [0]
+
+        def ao_confirmar(parcial, confirmados):
+            if diario:
+                diario.registrar(posicoes[anotados[0]:confirmados])
+            anotados[0] = confirmados
+            gravados[0] = max(gravados[0], base + parcial)
+        return ao_confirmar
+
+    try:
+        for registros in blocos:
+            inicio_bloco = lidos
+            lidos += len(registros)
+            posicoes = list(range(inicio_bloco, lidos))
+            if diario:
+                posicoes = diario.pendentes(inicio_bloco, lidos)
+                total += len(registros) - len(posicoes)
+                gravados[0] += len(registros) - len(posicoes)
+                registros = [registros[p - inicio_bloco] for p in posicoes]
+            validas, dups = _separar_duplicados(registros, conn)
+            cnjs_duplicados.extend(dups)
+            posicoes = [posicoes[i] for i in validas]
+            registros_validos = [registros[i] for i in validas]
+            if not registros_validos:
+                if progress_cb:
+                    progress_cb(total, lidos)
+                continue
+
+            base = total
+            ao_confirmar = anotar_bloco(posicoes, base)
+            enviadas_antes = controle.enviadas
+
+            def ao_enviar(enviadas):
+                if progress_cb:
+                    progress_cb(base + enviadas - enviadas_antes, lidos)
+
+            controle.ao_enviar = ao_enviar
+
+            if lote is None and motor != 'load_data':
+                lote = LoteAdaptativo.para_conexao(cur, registros_validos)  # segue aprendendo entre os blocos
+            # depois de uma recusa do LOAD DATA os blocos seguintes já vão direto pelo INSERT
+            inseridos, cur, motor = _gravar_com_retentativas(conn, cur, registros_validos, lote, motor, ao_confirmar,
+                                                             controle, confirmar_no_fim=False)
+            total += inseridos
+        controle.confirmar(conn)
+        if diario:
+            diario.concluir()
+        return total, cnjs_duplicados
+    except (mysql.connector.Error, ErroConexao, ErroVerificacaoCnjs) as err:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        notificar_erro(
+            'Erro MySQL',
+            f'Falha ao inserir registros:\n{err}\n\n{gravados[0]} registro(s) já haviam sido gravados antes da falha.'
+            + ('\nReenvie a mesma planilha para continuar do próximo lote.' if diario and gravados[0] else '')
+        )
+        return gravados[0], cnjs_duplicados
+    finally:
+        if isinstance(lote, LoteAdaptativo):
+            log.info('Lote adaptativo: %s.', lote.resumo())
+        try:
+            cur.close()
+            conn.close()
+        except Exception:
+            pass
+
+# =========================
+# Fila de importação (vários arquivos)
+# =========================
+@dataclass
+class TarefaImportacao:
+    """Um arquivo da fila: (planilha, aba, empresa) e o andamento/resultado da importação."""
+    path: str
+    empresa: str
+    sheet: object = 0
+    estado: str = 'pendente'  # pendente, lendo, enviando, concluida, falhou
+    lidas: int = 0
+    inseridas: int = 0
+    duplicados: List[str] = field(default_factory=list)
+    erro: Optional[str] = None
+    inicio: Optional[float] = None
+    fim: Optional[float] = None
+
+    @property
+    def segundos(self) -> float:
+        if self.inicio is None:
+            return 0.0
+        return (self.fim or time.monotonic()) - self.inicio
+
+    @property
+    def linhas_por_segundo(self) -> float:
+        return self.inseridas / self.segundos if self.segundos else 0.0
+
+def _registros_da_planilha(path: str, sheet, empresa: str, duplicados: Optional[str] = None) -> List[Tuple]:
+    """Lê e prepara uma planilha inteira. Roda num processo separado (precisa ser picklável)."""
+    leitor = LeitorEmBlocos(path, sheet, cache=CACHE_PLANILHAS)
+    blocos = list(leitor)
+    df = pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame()
+    del blocos
+    if leitor.motor != 'cache':
+        CACHE_PLANILHAS.guardar(path, sheet, leitor.colunas, df)
+    return montar_registros(preparar_planilha(df, empresa, duplicados=duplicados))
+
+class FilaImportacao:
+    """Processa várias tarefas (arquivo, aba, empresa) em paralelo.
+
+    A leitura/preparação roda em `processos` processos (pandas/openpyxl não liberam o GIL)
+    e os envios em até `conexoes` threads, cada uma com uma conexão do POOL_CONEXOES.
+    `ao_atualizar(tarefa)` é chamado (de threads de trabalho) a cada mudança de estado ou progresso.
+
+    Obs.: a checagem de CNJs duplicados é por tarefa; o mesmo CNJ em duas planilhas
+    enviadas ao mesmo tempo pode passar pelas duas checagens.
+    """
+
+    def __init__(self, processos: int = 2, conexoes: int = 3, lote: Optional[int] = None,
+                 motor: Optional[str] = None, ao_atualizar=None, commit=None, duplicados: Optional[str] = None):
+        self.processos = max(1, processos)
+        self.conexoes = max(1, conexoes)
+        self.lote = lote
+        self.motor = motor
+        self.commit = commit
+        self.duplicados = duplicados
+        self.ao_atualizar = ao_atualizar
+        self.tarefas: List[TarefaImportacao] = []
+        self.inicio: Optional[float] = None
+        self.fim: Optional[float] = None
+
+    def adicionar(self, path: str, empresa: str, sheet=0) -> TarefaImportacao:
+        tarefa = TarefaImportacao(path=path, empresa=empresa, sheet=sheet)
+        self.tarefas.append(tarefa)
+        return tarefa
+
+    # ---- totais ----
+    @property
+    def inseridas(self) -> int:
+        return sum(t.inseridas for t in self.tarefas)
+
+    @property
+    def linhas_por_segundo(self) -> float:
+        if self.inicio is None:
+            return 0.0
+        decorrido = (self.fim or time.monotonic()) - self.inicio
+        return self.inseridas / decorrido if decorrido else 0.0
+
+    def resumo(self) -> str:
+        linhas = []
+        for t in self.tarefas:
+            nome = os.path.basename(t.path)
+            if t.estado == 'falhou':
+                linhas.append(f'{nome} [{t.empresa.strip()}]: FALHOU – {t.erro}')
+            else:
+                linhas.append(f'{nome} [{t.empresa.strip()}]: {t.inseridas} inseridos, '
+                              f'{len(t.duplicados)} CNJ(s) duplicados ({t.segundos:.1f}s)')
+        linhas.append(f'Total: {self.inseridas} inseridos · {self.linhas_por_segundo:,.0f} linhas/s')
+        return '\n'.join(linhas)
+
+    # ---- execução ----
+    def _mudar(self, tarefa: TarefaImportacao, **campos):
+        for k, v in campos.items():
+            setattr(tarefa, k, v)
+        if self.ao_atualizar:
+            self.ao_atualizar(tarefa)
+
+    def _enviar(self, tarefa: TarefaImportacao, registros: List[Tuple]):
+        def progress_cb(feito, _total):
+            self._mudar(tarefa, inseridas=feito)
+
+        def registrar_erro(titulo, mensagem):
+            tarefa.erro = f'{titulo}: {mensagem}'
+
+        self._mudar(tarefa, estado='enviando', lidas=len(registros))
+        try:
+            with capturando_erros(registrar_erro):
+                diario = abrir_diario(tarefa.path, tarefa.sheet, tarefa.empresa, total=len(registros),
+                                      duplicados=self.duplicados)
+                total, duplicados = inserir_em_lotes(registros, lote=self.lote, progress_cb=progress_cb,
+                                                     motor=self.motor, diario=diario, commit=self.commit)
+        except Exception as e:
+            self._mudar(tarefa, estado='falhou', erro=f'Envio: {e}', fim=time.monotonic())
+            return
+        self._mudar(tarefa, inseridas=total, duplicados=duplicados, fim=time.monotonic(),
+                    estado='falhou' if tarefa.erro else 'concluida')
+
+    def _agendar(self, tarefa: TarefaImportacao, leitores: ProcessPoolExecutor,
+                 envios: ThreadPoolExecutor) -> Future:
+        """Submete a leitura da tarefa; ao terminar, o envio entra em `envios`.
+
+        Retorna um Future que completa (com a própria tarefa) quando ela termina, com sucesso ou falha.
+        """
+        pronta: Future = Future()
+        self._mudar(tarefa, estado='lendo', inicio=time.monotonic())
+        leitura = leitores.submit(_registros_da_planilha, tarefa.path, tarefa.sheet, tarefa.empresa,
+                                  self.duplicados)
+
+        def lida(fut: Future):
+            try:
+                registros = fut.result()
+            except Exception as e:
+                self._mudar(tarefa, estado='falhou', erro=f'Leitura: {e}', fim=time.monotonic())
+                pronta.set_result(tarefa)
+                return
+            envio = envios.submit(self._enviar, tarefa, registros)
+            envio.add_done_callback(lambda _f: pronta.set_result(tarefa))
+
+        leitura.add_done_callback(lida)
+        return pronta
+
+    def executar(self) -> List[TarefaImportacao]:
+        """Roda todas as tarefas pendentes e só retorna quando todas terminarem."""
+        pendentes = [t for t in self.tarefas if t.estado == 'pendente']
+        self.inicio = time.monotonic()
+        self.fim = None
+        with ProcessPoolExecutor(max_workers=self.processos) as leitores, \
+                ThreadPoolExecutor(max_workers=self.conexoes, thread_name_prefix='fila-envio') as envios:
+            wait([self._agendar(t, leitores, envios) for t in pendentes])
+        self.fim = time.monotonic()
+        return pendentes
+
+# =========================
+# Pasta monitorada (importação automática)
+# =========================
+EXTENSOES_PLANILHA = ('.xlsx', '.xlsm', '.xls')
+
+def _normalizar_nome(texto: str) -> str:
+    """'Cível - Cacau_Show' -> 'civel cacau show' (sem acentos, só letras/dígitos separados por espaço)."""
+    sem_acento = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(re.findall(r'[a-z0-9]+', sem_acento.casefold()))
+
+def inferir_empresa(path: str) -> Tuple[Optional[str], object]:
+    """Descobre (chave de COMPANY_PRESETS, aba) de um arquivo deixado na pasta monitorada.
+
+    1) Arquivo lateral `<nome>.json` (ou `<nome>.xlsx.json`) com {"empresa": "...", "aba": "..."};
+    2) senão, o preset cujo nome aparece no nome do arquivo (o mais longo vence;
+       empate entre presets diferentes = ambíguo, retorna None).
+    """
+    base, _ext = os.path.splitext(path)
+    for lateral in (base + '.json', path + '.json'):
+        if os.path.exists(lateral):
+            with open(lateral, encoding='utf-8') as f:
+                dados = json.load(f)
+            nome = str(dados.get('empresa') or '')
+            alvo = _normalizar_nome(nome)
+            chave = next((k for k in COMPANY_PRESETS if _normalizar_nome(k) == alvo), None)
+            return chave, dados.get('aba') or 0
+
+    nome_arquivo = f' {_normalizar_nome(os.path.basename(base))} '
+    candidatos = [(len(_normalizar_nome(k)), k) for k in COMPANY_PRESETS
+                  if f' {_normalizar_nome(k)} ' in nome_arquivo]
+    if not candidatos:
+        return None, 0
+    candidatos.sort(reverse=True)
+    if len(candidatos) > 1 and candidatos[0][0] == candidatos[1][0]:
+        return None, 0
+    return candidatos[0][1], 0
+
+def _mover_para(path: str, pasta: str) -> str:
+    """Move `path` (e seus .json laterais) para `pasta`, sem sobrescrever nada que já esteja lá."""
+    os.makedirs(pasta, exist_ok=True)
+    destino = os.path.join(pasta, os.path.basename(path))
+    if os.path.exists(destino):
+        base, ext = os.path.splitext(destino)
+        destino = f'{base}_{datetime.now():%Y%m%d_%H%M%S}{ext}'
+    base_origem = os.path.splitext(path)[0]
+    for lateral in (base_origem + '.json', path + '.json'):
+        if os.path.exists(lateral):
+            shutil.move(lateral, os.path.splitext(destino)[0] + lateral[len(base_origem):])
+    shutil.move(path, destino)
+    return destino
+
+class MonitorPasta:
+    """Vigia uma pasta e importa automaticamente cada planilha nova que aparecer nela.
+
+    Um arquivo só é pego depois de ficar `estabilidade` segundos sem mudar de tamanho/mtime
+    (cópias pela rede chegam aos poucos). Ele vai para `processando/` enquanto é importado
+    e depois para `concluidos/` ou `falhas/` (com um `.erro.txt` explicando o motivo).
+    As importações usam a mesma FilaImportacao/POOL_CONEXOES: no máximo `processos` leituras
+    e `conexoes` envios ao mesmo tempo, sem abrir uma conexão nova por arquivo.
+    """
+
+    def __init__(self, pasta: str, processos: int = 2, conexoes: int = 3, lote: Optional[int] = None,
+                 motor: Optional[str] = None, intervalo: float = 5.0, estabilidade: float = 10.0,
+                 ao_atualizar=None, ao_terminar=None, commit=None, duplicados: Optional[str] = None):
+        self.pasta = os.path.abspath(pasta)
+        self.pasta_processando = os.path.join(self.pasta, 'processando')
+        self.pasta_concluidos = os.path.join(self.pasta, 'concluidos')
+        self.pasta_falhas = os.path.join(self.pasta, 'falhas')
+        self.intervalo = intervalo
+        self.estabilidade = estabilidade
+        self.ao_terminar = ao_terminar
+        self.fila = FilaImportacao(processos=processos, conexoes=conexoes, lote=lote, motor=motor,
+                                   ao_atualizar=ao_atualizar, commit=commit, duplicados=duplicados)
+        self._vistos: Dict[str, Tuple[int, float, float]] = {}  # path -> (tamanho, mtime, desde)
+        self._em_andamento: Dict[str, TarefaImportacao] = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+
+    def parar(self):
+        self._parar.set()
+
+    @property
+    def em_andamento(self) -> int:
+        with self._lock:
+            return len(self._em_andamento)
+
+    # ---- varredura ----
+    def _recuperar_interrompidos(self):
+        """Arquivos que ficaram em processando/ (queda do serviço) voltam para a fila.
+
+        Reimportar é seguro: os CNJs que já entraram são descartados como duplicados.
+        """
+        if not os.path.isdir(self.pasta_processando):
+            return
+        for nome in os.listdir(self.pasta_processando):
+            origem = os.path.join(self.pasta_processando, nome)
+            if os.path.isfile(origem) and nome.lower().endswith(EXTENSOES_PLANILHA):
+                log.warning('Retomando %s, interrompido numa execução anterior.', nome)
+                _mover_para(origem, self.pasta)
+
+    def arquivos_estaveis(self) -> List[str]:
+        """Planilhas da pasta que não mudaram nos últimos `estabilidade` segundos."""
+        agora = time.monotonic()
+        estaveis, presentes = [], set()
+        for nome in os.listdir(self.pasta):
+            path = os.path.join(self.pasta, nome)
+            if nome.startswith(('~$', '.')) or not nome.lower().endswith(EXTENSOES_PLANILHA):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # sumiu entre o listdir e o stat
+            if not os.path.isfile(path):
+                continue
+            presentes.add(path)
+            assinatura = (st.st_size, st.st_mtime)
+            anterior = self._vistos.get(path)
+            if anterior is None or anterior[:2] != assinatura:
+                self._vistos[path] = (*assinatura, agora)
+            elif st.st_size > 0 and agora - anterior[2] >= self.estabilidade:
+                estaveis.append(path)
+        for path in list(self._vistos):
+            if path not in presentes:
+                del self._vistos[path]
+        return sorted(estaveis)
+
+    # ---- processamento ----
+    def _falhar(self, path: str, erro: str):
+        destino = _mover_para(path, self.pasta_falhas)
+        with open(destino + '.erro.txt', 'w', encoding='utf-8') as f:
+            f.write(erro + '\n')
+        log.error('%s -> falhas/: %s', os.path.basename(path), erro)
+
+    def _finalizar(self, tarefa: TarefaImportacao):
+        with self._lock:
+            self._em_andamento.pop(tarefa.path, None)
+        try:
+            if tarefa.estado == 'concluida':
+                _mover_para(tarefa.path, self.pasta_concluidos)
+                log.info('%s -> concluidos/: %d inseridos, %d duplicados (%.1fs)',
+                         os.path.basename(tarefa.path), tarefa.inseridas, len(tarefa.duplicados), tarefa.segundos)
+            else:
+                self._falhar(tarefa.path, tarefa.erro or 'falha desconhecida')
+        except OSError as e:
+            log.error('Não foi possível mover %s: %s', tarefa.path, e)
+        if self.ao_terminar:
+            self.ao_terminar(tarefa)
+
+    def _iniciar(self, path: str, leitores: ProcessPoolExecutor, envios: ThreadPoolExecutor):
+        self._vistos.pop(path, None)
+        try:
+            empresa, aba = inferir_empresa(path)
+        except (OSError, ValueError) as e:
+            self._falhar(path, f'Arquivo .json lateral inválido: {e}')
+            return
+        if empresa is None:
+            self._falhar(path, 'Empresa não identificada: inclua o nome do preset no nome do arquivo '
+                               'ou crie um <arquivo>.json com {"empresa": "...", "aba": "..."}.')
+            return
+        tarefa = TarefaImportacao(path=_mover_para(path, self.pasta_processando), empresa=empresa, sheet=aba)
+        with self._lock:
+            self._em_andamento[tarefa.path] = tarefa
+        log.info('Importando %s [%s]', os.path.basename(path), empresa.strip())
+        pronta = self.fila._agendar(tarefa, leitores, envios)
+        pronta.add_done_callback(lambda fut: self._finalizar(fut.result()))
+
+    def executar(self):
+        """Vigia a pasta até `parar()`; ao parar, espera as importações em andamento terminarem."""
+        os.makedirs(self.pasta, exist_ok=True)
+        self._recuperar_interrompidos()
+        limite = self.fila.processos + self.fila.conexoes  # não lota a fila de um arquivo só
+        with ProcessPoolExecutor(max_workers=self.fila.processos) as leitores, \
+                ThreadPoolExecutor(max_workers=self.fila.conexoes, thread_name_prefix='pasta-envio') as envios:
+            while not self._parar.is_set():
+                try:
+                    for path in self.arquivos_estaveis():
+                        if self.em_andamento >= limite:
+                            break
+                        self._iniciar(path, leitores, envios)
+                except OSError as e:
+                    log.error('Falha ao varrer %s: %s', self.pasta, e)
+                self._parar.wait(self.intervalo)
+            while self.em_andamento:
+                time.sleep(0.2)
+
+# =========================
+# Exportação por cod_lote (streaming)
+# =========================
+LINHAS_POR_LEITURA_EXPORTACAO = 2000
+
+def _cursor_servidor(conn):
+    """Cursor sem buffer: as linhas chegam do servidor aos poucos (SSCursor no PyMySQL).
+
+    Enquanto houver linhas não lidas a conexão não aceita outro comando; se a leitura for
+    interrompida, marque a conexão como quebrada para o pool descartá-la.
+    """
+    if type(conn._bruta).__module__.startswith('pymysql'):
+        import pymysql.cursors
+        return conn.cursor(cursor=pymysql.cursors.SSCursor)
+    return conn.cursor(buffered=False)
+
+# Formatos de exportação; parquet só quando o pyarrow estiver instalado (opcional).
+FORMATOS_EXPORTACAO = ('xlsx', 'csv', 'parquet')
+LINHAS_POR_GRUPO_PARQUET = 50000
+
+def _pyarrow_disponivel() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def formatos_exportacao_disponiveis() -> List[str]:
+    return [f for f in FORMATOS_EXPORTACAO if f != 'parquet' or _pyarrow_disponivel()]
+
+def listar_colunas_exportaveis() -> List[str]:
+    """Colunas da tabela encerramento na ordem do banco (ou `colunas_encerramento` sem conexão)."""
+    try:
+        conn = POOL_CONEXOES.adquirir()
+    except Exception:
+        return list(colunas_encerramento)
+    cur = conn.cursor()
+    try:
+        cur.execute('SHOW COLUMNS FROM encerramento')
+        return [linha[0] for linha in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+def _decodificar(v):
+    # colunas TEXT/BLOB podem chegar como bytes dependendo do driver e do charset da conexão
+    return v.decode('utf-8', 'replace') if isinstance(v, (bytes, bytearray)) else v
+
+class _EscritorXlsx:
+    """openpyxl em modo write_only: cada linha vai direto para o XML temporário da aba."""
+
+    def __init__(self, path: str, colunas: List[str], tipos: List[int]):
+        import openpyxl
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        self._ilegais = ILLEGAL_CHARACTERS_RE
+        self.path = path
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.ws = self.wb.create_sheet(title='encerramento')
+        self.ws.append(colunas)
+
+    def escrever(self, linhas):
+        ilegais = self._ilegais
+        for linha in linhas:
+            # caracteres de controle derrubam o openpyxl ("IllegalCharacterError")
+            self.ws.append([ilegais.sub('', v) if isinstance(v, str) else v for v in map(_decodificar, linha)])
+
+    def concluir(self):
+        self.wb.save(self.path)
+
+    def abortar(self):
+        if not self.ws.closed:
+            self.ws.close()
+
+class _EscritorCsv:
+    """CSV UTF-8 com cabeçalho, gravado conforme as linhas chegam."""
+
+    def __init__(self, path: str, colunas: List[str], tipos: List[int]):
+        import csv
+        self._arquivo = open(path, 'w', encoding='utf-8', newline='')
+        self._csv = csv.writer(self._arquivo)
+        self._csv.writerow(colunas)
+
+    def escrever(self, linhas):
+        self._csv.writerows([list(map(_decodificar, linha)) for linha in linhas])
+
+    def concluir(self):
+        self._arquivo.close()
+
+    def abortar(self):
+        self._arquivo.close()
+
+# Tipos do protocolo MySQL (cursor.description[i][1], iguais no mysql.connector e no PyMySQL)
+_MYSQL_INTEIROS = {1, 2, 3, 8, 9, 13, 16}
+_MYSQL_REAIS = {0, 4, 5, 246}
+_MYSQL_DATA = {10}
+_MYSQL_DATA_HORA = {7, 12}
+
+class _EscritorParquet:
+    """Parquet (zstd) com esquema tirado do cursor, em grupos de LINHAS_POR_GRUPO_PARQUET linhas.
+
+    O esquema vem do tipo das colunas no banco e não das primeiras linhas, para que uma
+    coluna toda NULL no começo do lote não trave o tipo errado. DECIMAL vira float64.
+    """
+
+    def __init__(self, path: str, colunas: List[str], tipos: List[int]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+
+        def tipo_arrow(codigo):
+            if codigo in _MYSQL_INTEIROS:
+                return pa.int64()
+            if codigo in _MYSQL_REAIS:
+                return pa.float64()
+            if codigo in _MYSQL_DATA:
+                return pa.date32()
+            if codigo in _MYSQL_DATA_HORA:
+                return pa.timestamp('us')
+            return pa.string()
+
+        self.schema = pa.schema([(c, tipo_arrow(t)) for c, t in zip(colunas, tipos)])
+        self._reais = [t in _MYSQL_REAIS for t in tipos]
+        self._writer = pq.ParquetWriter(path, self.schema, compression='zstd')
+        self._pendentes: List[tuple] = []
+
+    def escrever(self, linhas):
+        self._pendentes.extend(linhas)
+        if len(self._pendentes) >= LINHAS_POR_GRUPO_PARQUET:
+            self._gravar_grupo()
+
+    def _gravar_grupo(self):
+        if not self._pendentes:
+            return
+        pa = self._pa
+        colunas = []
+        for i, campo in enumerate(self.schema):
+            valores = [linha[i] for linha in self._pendentes]
+            if self._reais[i]:
+                valores = [None if v is None else float(v) for v in valores]
+            elif campo.type == pa.string():
+                valores = [None if v is None else str(_decodificar(v)) for v in valores]
+            colunas.append(pa.array(valores, type=campo.type))
+        self._writer.write_table(pa.Table.from_arrays(colunas, schema=self.schema))
+        self._pendentes = []
+
+    def concluir(self):
+        self._gravar_grupo()
+        self._writer.close()
+
+    def abortar(self):
+        self._pendentes = []
+        self._writer.close()
+
+ESCRITORES_EXPORTACAO = {'xlsx': _EscritorXlsx, 'csv': _EscritorCsv, 'parquet': _EscritorParquet}
+
+def formato_pelo_arquivo(path: str) -> str:
+    formato = Path(path).suffix.lower().lstrip('.')
+    return formato if formato in FORMATOS_EXPORTACAO else 'xlsx'
+
+def exportar_lote(cod_lote: str, path: str, formato: Optional[str] = None, colunas: Optional[List[str]] = None,
+                  progress_cb=None, cancelar: Optional[threading.Event] = None) -> int:
+    """Grava em `path` as linhas de `cod_lote` sem carregar o lote na memória.
+
+    `formato` é 'xlsx', 'csv' ou 'parquet' (padrão: pela extensão de `path`); `colunas`
+    limita o SELECT às colunas pedidas (padrão: todas). Lê com cursor do lado do servidor
+    em fatias de LINHAS_POR_LEITURA_EXPORTACAO e escreve conforme as linhas chegam. O
+    arquivo é montado num temporário na mesma pasta e só substitui `path` no fim; se
+    `cancelar` for acionado ou algo falhar, nada fica pela metade e OperacaoCancelada/o erro
+    sobe. `progress_cb(feitas, total)`. Retorna o número de linhas exportadas.
+    """
+    formato = (formato or formato_pelo_arquivo(path)).lower()
+    if formato not in ESCRITORES_EXPORTACAO:
+        raise ValueError(f"Formato de exportação desconhecido: {formato!r} (use {', '.join(FORMATOS_EXPORTACAO)}).")
+    if formato == 'parquet' and not _pyarrow_disponivel():
+        raise RuntimeError("Exportar em Parquet precisa do pacote pyarrow (pip install pyarrow).")
+
+    conn = POOL_CONEXOES.adquirir()
+    cur = None
+    escritor = None
+    pasta = os.path.dirname(os.path.abspath(path))
+    fd, temporario = tempfile.mkstemp(suffix=f'.{formato}', prefix='.exportando_', dir=pasta)
+    os.close(fd)
+    linhas_no_socket = False
+    concluido = False
+    try:
+        cur = conn.cursor()
+        if colunas:
+            cur.execute('SHOW COLUMNS FROM encerramento')
+            existentes = {linha[0] for linha in cur.fetchall()}
+            desconhecidas = [c for c in colunas if c not in existentes]
+            if desconhecidas:
+                raise ValueError(f"Colunas inexistentes na tabela encerramento: {', '.join(desconhecidas)}")
+            lista = ', '.join(f'`{c}`' for c in colunas)
+        else:
+            lista = '*'
+        cur.execute('SELECT COUNT(*) FROM encerramento WHERE cod_lote = %s', (cod_lote,))
+        total = int(cur.fetchone()[0])
+        # o servidor desiste de um cliente lento após net_write_timeout; escrever o arquivo leva tempo
+        cur.execute('SET SESSION net_write_timeout = 600')
+        cur.close()
+
+        cur = _cursor_servidor(conn)
+        cur.execute(f'SELECT {lista} FROM encerramento WHERE cod_lote = %s', (cod_lote,))
+        linhas_no_socket = True
+        escritor = ESCRITORES_EXPORTACAO[formato](temporario, [d[0] for d in cur.description],
+                                                  [d[1] for d in cur.description])
+        feitas = 0
+        while True:
+            if cancelar is not None and cancelar.is_set():
+                raise OperacaoCancelada()
+            linhas = cur.fetchmany(LINHAS_POR_LEITURA_EXPORTACAO)
+            if not linhas:
+                break
+            escritor.escrever(linhas)
+            feitas += len(linhas)
+            if progress_cb:
+                progress_cb(feitas, max(total, feitas))
+        linhas_no_socket = False
+        escritor.concluir()
+        concluido = True
+        os.replace(temporario, path)
+        return feitas
+    finally:
+        if escritor is not None and not concluido:
+            try:
+                escritor.abortar()
+            except Exception:
+                log.debug('Falha ao fechar o arquivo abortado %s', temporario, exc_info=True)
+        if linhas_no_socket:
+            conn._quebrada = True  # resultado pela metade no socket: não volta para o pool
+        if cur is not None:
+            try:
+                cur.close()
+            except Exception:
+                pass
+        conn.close()
+        if os.path.exists(temporario):
+            try:
+                os.remove(temporario)
+            except OSError:
+                pass
+
+# =========================
+# Exportação de vários cod_lote em paralelo
+# =========================
+@dataclass
+class ResultadoExportacao:
+    """Um cod_lote da exportação em massa: arquivo gerado, linhas e erro (se falhou)."""
+    cod_lote: str
+    arquivo: str
+    linhas: int = 0
+    total: int = 0
+    erro: Optional[str] = None
+
+def listar_lotes_por_periodo(inicio: date, fim: date) -> List[str]:
+    """cod_lote distintos com data_exportacao entre `inicio` e `fim` (inclusive)."""
+    conn = POOL_CONEXOES.adquirir()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT DISTINCT cod_lote FROM encerramento "
+            "WHERE data_exportacao >= %s AND data_exportacao < DATE_ADD(%s, INTERVAL 1 DAY) "
+            "AND cod_lote IS NOT NULL AND cod_lote <> '' ORDER BY cod_lote",
+            (inicio, fim)
+        )
+        return [linha[0] for linha in cur.fetchall()]
+    finally:
+        cur.close()
+        conn.close()
+
+def _contar_lotes(cod_lotes: List[str]) -> Dict[str, int]:
+    conn = POOL_CONEXOES.adquirir()
+    cur = conn.cursor()
+    try:
+        ph = ', '.join(['%s'] * len(cod_lotes))
+        cur.execute(f'SELECT cod_lote, COUNT(*) FROM encerramento WHERE cod_lote IN ({ph}) GROUP BY cod_lote',
+                    tuple(cod_lotes))
+        return {linha[0]: int(linha[1]) for linha in cur.fetchall()}
+    finally:
+        cur.close()
+        conn.close()
+
+def nome_arquivo_lote(cod_lote: str, formato: str) -> str:
+    """Nome de arquivo seguro para o cod_lote ('CB - TRAB 01/10/2025' -> 'CB_-_TRAB_01-10-2025.xlsx')."""
+    nome = re.sub(r'[\\/:]+', '-', str(cod_lote).strip())
+    nome = re.sub(r'[<>"|?*\s]+', '_', nome).strip('._') or 'lote'
+    return f'{nome}.{formato}'
+
+def exportar_lotes(cod_lotes: List[str], destino: str, formato: str = 'xlsx', colunas: Optional[List[str]] = None,
+                   zip_unico: bool = False, paralelos: Optional[int] = None, progress_cb=None,
+                   cancelar: Optional[threading.Event] = None) -> List[ResultadoExportacao]:
+    """Exporta vários cod_lote em paralelo, um arquivo por lote.
+
+    `destino` é uma pasta (um arquivo por cod_lote) ou, com `zip_unico`, o caminho do .zip
+    particionado (`cod_lote=<nome>/dados.<formato>`). Cada lote usa uma conexão do pool e uma
+    thread de escrita; `paralelos` limita quantos rodam juntos (padrão: metade do pool, no
+    mínimo 1). Um lote que falha não interrompe os outros: o erro fica no resultado.
+    `progress_cb(feitas, total, detalhe)` soma as linhas de todos os lotes.
+    """
+    cod_lotes = list(dict.fromkeys(cod_lotes))
+    if not cod_lotes:
+        return []
+    if paralelos is None:
+        paralelos = max(1, POOL_CONEXOES.tamanho_max // 2)
+    paralelos = max(1, min(paralelos, len(cod_lotes), POOL_CONEXOES.tamanho_max))
+    totais = _contar_lotes(cod_lotes)
+    total_geral = sum(totais.values())
+
+    if zip_unico:
+        import zipfile
+        pasta_trabalho = tempfile.mkdtemp(prefix='.exportando_', dir=os.path.dirname(os.path.abspath(destino)))
+        # xlsx e parquet já saem comprimidos; só o CSV ganha com deflate
+        compressao = zipfile.ZIP_DEFLATED if formato == 'csv' else zipfile.ZIP_STORED
+        fd, zip_temporario = tempfile.mkstemp(suffix='.zip', prefix='.exportando_', dir=pasta_trabalho)
+        os.close(fd)
+        arquivo_zip = zipfile.ZipFile(zip_temporario, 'w', compression=compressao, allowZip64=True)
+    else:
+        os.makedirs(destino, exist_ok=True)
+        pasta_trabalho = destino
+        arquivo_zip = None
+
+    nomes: List[str] = []
+    for c in cod_lotes:
+        # cod_lote diferentes podem virar o mesmo nome de arquivo ('A/B' e 'A:B')
+        base, ext = os.path.splitext(nome_arquivo_lote(c, formato))
+        nome, n = base, 2
+        while nome in nomes:
+            nome, n = f'{base}_{n}', n + 1
+        nomes.append(nome)
+    resultados = [ResultadoExportacao(c, os.path.join(pasta_trabalho, f'{nome}.{formato}'), total=totais.get(c, 0))
+                  for c, nome in zip(cod_lotes, nomes)]
+    feitas_por_lote = [0] * len(cod_lotes)
+    trava = threading.Lock()
+    concluidos = [0]
+
+    def publicar():
+        if progress_cb:
+            progress_cb(sum(feitas_por_lote), max(total_geral, sum(feitas_por_lote)),
+                        f'{concluidos[0]}/{len(cod_lotes)} lote(s)')
+
+    def exportar(i: int):
+        resultado = resultados[i]
+
+        def progresso(feitas, _total):
+            with trava:
+                feitas_por_lote[i] = feitas
+                publicar()
+
+        try:
+            resultado.linhas = exportar_lote(resultado.cod_lote, resultado.arquivo, formato=formato, colunas=colunas,
+                                             progress_cb=progresso, cancelar=cancelar)
+            if arquivo_zip is not None:
+                interno = f'cod_lote={nomes[i]}/dados.{formato}'
+                with trava:
+                    arquivo_zip.write(resultado.arquivo, interno)
+                os.remove(resultado.arquivo)
+                resultado.arquivo = f'{destino}:{interno}'
+        except OperacaoCancelada:
+            raise
+        except Exception as e:
+            log.warning('Falha ao exportar o cod_lote %s', resultado.cod_lote, exc_info=True)
+            resultado.erro = str(e)
+        finally:
+            with trava:
+                concluidos[0] += 1
+                publicar()
+
+    try:
+        with ThreadPoolExecutor(max_workers=paralelos, thread_name_prefix='exportacao') as executor:
+            futuros = [executor.submit(exportar, i) for i in range(len(cod_lotes))]
+            try:
+                for futuro in futuros:
+                    futuro.result()
+            except BaseException:
+                # cancelamento (ou erro inesperado): não começa os lotes na fila e para os que estão rodando
+                for futuro in futuros:
+                    futuro.cancel()
+                if cancelar is not None:
+                    cancelar.set()
+                raise
+        if arquivo_zip is not None:
+            arquivo_zip.close()
+            arquivo_zip = None
+            os.replace(zip_temporario, destino)
+    finally:
+        if zip_unico:
+            if arquivo_zip is not None:
+                arquivo_zip.close()
+            shutil.rmtree(pasta_trabalho, ignore_errors=True)
+    return resultados
@@ -0,0 +1,69 @@
+"""Conexão MySQL de mentira para os testes: guarda o que foi confirmado e o que ainda está na
+transação, com SAVEPOINT/ROLLBACK como no InnoDB, e nega CREATE TEMPORARY TABLE (usuário sem
+privilégio), o que força a verificação de CNJs pelo IN fatiado.
+"""
+from __future__ import annotations
+
+import mysql.connector
+
+
+class BancoFalso:
+    def __init__(self, confirmados=()):
+        self.confirmados = list(confirmados)
+        self.transacao = []
+        self.savepoints = {}
+
+
+class CursorFalso:
+    def __init__(self, banco: BancoFalso):
+        self.banco = banco
+        self.rowcount = 0
+        self._resultado = []
+
+    def execute(self, sql, params=()):
+        banco = self.banco
+        sql = ' '.join(sql.split())
+        if sql.startswith('SAVEPOINT'):
+            banco.savepoints[sql.split()[-1]] = len(banco.transacao)
+        elif sql.startswith('ROLLBACK TO SAVEPOINT'):
+            del banco.transacao[banco.savepoints[sql.split()[-1]]:]
+        elif sql.startswith('RELEASE SAVEPOINT'):
+            banco.savepoints.pop(sql.split()[-1])
+        elif sql.startswith('CREATE TEMPORARY'):
+            raise mysql.connector.Error(msg='CREATE TEMPORARY TABLES command denied', errno=1044)
+        elif 'max_allowed_packet' in sql:
+            self._resultado = [(4 * 1024 * 1024,)]
+        elif sql.startswith('SELECT DISTINCT cnj'):
+            visiveis = set(banco.confirmados) | set(banco.transacao)
+            self._resultado = [(c,) for c in dict.fromkeys(params) if c in visiveis]
+
+    def executemany(self, sql, registros):
+        self.banco.transacao.extend(r[0] for r in registros)
+        self.rowcount = len(registros)
+
+    def fetchone(self):
+        return self._resultado[0]
+
+    def fetchall(self):
+        return self._resultado
+
+    def close(self):
+        pass
+
+
+class ConexaoFalsa:
+    def __init__(self, banco: BancoFalso):
+        self.banco = banco
+
+    def cursor(self):
+        return CursorFalso(self.banco)
+
+    def commit(self):
+        self.banco.confirmados.extend(self.banco.transacao)
+        self.banco.transacao = []
+
+    def rollback(self):
+        self.banco.transacao = []
+
+    def close(self):
+        pass
@@ -0,0 +1,48 @@
+"""Envio em blocos com políticas de commit que seguram a transação entre blocos.
+
+Roda sem MySQL, sobre a `ConexaoFalsa` (ver conexao_falsa.py).
+
+Uso: python -m unittest discover -s tests
+"""
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+RAIZ = Path(__file__).resolve().parent.parent
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+import encerramento_core as app  # noqa: E402
+from conexao_falsa import BancoFalso, ConexaoFalsa  # noqa: E402
+
+
+def blocos(quantos: int, linhas: int):
+    largura = len(app.colunas_encerramento)
+    for k in range(quantos):
+        yield [(f'{k:07d}-{i:013d}',) + (None,) * (largura - 1) for i in range(linhas)]
+
+
+class TestEnvioStreaming(unittest.TestCase):
+    def enviar(self, commit: str):
+        banco = BancoFalso()
+        conn = ConexaoFalsa(banco)
+        with mock.patch.object(app, 'conectar_ao_mysql', return_value=(conn, conn.cursor())):
+            total, duplicados = app.inserir_em_streaming(blocos(3, 2000), lote=500, motor='executemany',
+                                                         commit=commit)
+        return total, duplicados, banco
+
+    def test_confirmadas_iguais_as_informadas(self):
+        for commit in app.POLITICAS_COMMIT:
+            with self.subTest(commit=commit):
+                total, duplicados, banco = self.enviar(commit)
+                self.assertEqual(duplicados, [])
+                self.assertEqual(banco.transacao, [])
+                self.assertEqual(len(banco.confirmados), 6000)
+                self.assertEqual(total, len(banco.confirmados))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""CNJs já gravados são reconhecidos na máscara canônica e só com os 20 dígitos.
+
+Roda sem MySQL, sobre a `ConexaoFalsa` (ver conexao_falsa.py).
+
+Uso: python -m unittest discover -s tests
+"""
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
+
+import encerramento_core as app  # noqa: E402
+from conexao_falsa import BancoFalso, ConexaoFalsa  # noqa: E402
+
+
+def cnj(numero: int) -> str:
+    """CNJ válido (dígito verificador correto) na máscara canônica."""
+    dd = 98 - int(f'{numero:07d}2023805000100') % 97
+    return f'{numero:07d}-{dd:02d}.2023.8.05.0001'
+
+
+def so_digitos(valor: str) -> str:
+    return valor.replace('-', '').replace('.', '')
+
+
+class TestVerificarCnjsExistentes(unittest.TestCase):
+    def verificar(self, novos: int):
+        banco = BancoFalso([cnj(1), so_digitos(cnj(2))])
+        consultados = [cnj(1), cnj(2), cnj(3)] + [cnj(10 + i) for i in range(novos)]
+        return app.verificar_cnjs_existentes(consultados, ConexaoFalsa(banco))
+
+    def test_in_direto(self):
+        self.assertEqual(self.verificar(0), [cnj(1), cnj(2)])
+
+    def test_lista_grande(self):
+        # acima de LIMITE_IN_DIRETO: tabela temporária negada, cai no IN fatiado
+        self.assertEqual(sorted(self.verificar(app.LIMITE_IN_DIRETO)), [cnj(1), cnj(2)])
+
+    def test_formas_cnjs(self):
+        self.assertEqual(app.formas_cnjs([so_digitos(cnj(5))]),
+                         {so_digitos(cnj(5)): so_digitos(cnj(5)), cnj(5): so_digitos(cnj(5))})
+        self.assertEqual(app.formas_cnjs(['123']), {'123': '123'})
+
+
+if __name__ == '__main__':
+    unittest.main()